@@ -0,0 +1,151 @@
+# ai_service/benchmarks/bench_endpoints.py
+# Latency/throughput benchmark for the AI service endpoints, driven in-process
+# through httpx's ASGI transport. Results are written as JSON and can be
+# compared against a stored baseline to flag regressions.
+#
+#   python benchmarks/bench_endpoints.py                       # run + write results/latest.json
+#   python benchmarks/bench_endpoints.py --save-baseline       # also store as results/baseline.json
+#   python benchmarks/bench_endpoints.py --baseline results/baseline.json --tolerance 0.2
+
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+import platform
+from datetime import datetime, timezone
+
+from common import (RESULTS_DIR, load_vocabulary, synthetic_triage_texts, pill_image_bytes,
+                    report_image_bytes, summarize, asgi_client, write_json, print_table)
+
+ENDPOINTS = ["predict_symptoms", "predict_answer", "identify_pill", "analyze_report"]
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+def ok(resp):
+    return resp.status_code == 200 and resp.json().get("success", False)
+
+async def run_requests(make_request, n, concurrency):
+    """Fire n requests with at most `concurrency` in flight; returns (latencies, errors, wall)."""
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                resp = await make_request(i)
+                good = ok(resp)
+            except Exception:
+                good = False
+            latencies.append(time.perf_counter() - t0)
+            if not good:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, errors, time.perf_counter() - t0
+
+async def bench(args):
+    import main
+
+    rng = random.Random(args.seed)
+    vocab = load_vocabulary()
+    texts = synthetic_triage_texts(args.requests, vocab, rng)
+    pills = [pill_image_bytes(rng) for _ in range(min(args.requests, 16))]
+    reports = [report_image_bytes(rng) for _ in range(min(args.requests, 8))]
+
+    results = {}
+    async with asgi_client(main.app, timeout=120) as client:
+        async def predict_symptoms(i):
+            return await client.post("/predict/symptoms", json={"text": texts[i % len(texts)]})
+
+        # /predict/answer needs live sessions; create them up front so only the answer is timed
+        session_ids = []
+        for i in range(args.requests):
+            resp = await predict_symptoms(i)
+            session_ids.append(resp.json().get("data", {}).get("session_id", "missing"))
+
+        async def predict_answer(i):
+            return await client.post("/predict/answer", data={
+                "session_id": session_ids[i % len(session_ids)],
+                "symptom": rng.choice(vocab),
+                "answer": "true" if i % 2 == 0 else "false",
+            })
+
+        async def identify_pill(i):
+            return await client.post("/identify_pill", files={"file": ("pill.png", pills[i % len(pills)], "image/png")})
+
+        async def analyze_report(i):
+            return await client.post("/analyze_report", files={"file": ("report.png", reports[i % len(reports)], "image/png")})
+
+        calls = {"predict_symptoms": predict_symptoms, "predict_answer": predict_answer,
+                 "identify_pill": identify_pill, "analyze_report": analyze_report}
+        for name in args.endpoints:
+            make_request = calls[name]
+            await run_requests(make_request, args.warmup, 1)
+            latencies, errors, wall = await run_requests(make_request, args.requests, args.concurrency)
+            results[name] = summarize(latencies, wall, errors)
+
+    return results
+
+def compare(results, baseline, tolerance):
+    """Return a list of (endpoint, metric, baseline, current) that got slower than allowed."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric in base and metric in cur and cur[metric] > base[metric] * (1 + tolerance):
+                regressions.append((name, metric, base[metric], cur[metric]))
+        if "throughput_rps" in base and cur.get("throughput_rps", 0) < base["throughput_rps"] * (1 - tolerance):
+            regressions.append((name, "throughput_rps", base["throughput_rps"], cur.get("throughput_rps", 0)))
+    return regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark AI service endpoints in-process")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also write results to results/baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args))
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "endpoints": results,
+    }
+    print_table(results)
+    write_json(args.output, report)
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        write_json(os.path.join(RESULTS_DIR, "baseline.json"), report)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS (tolerance {args.tolerance:.0%}):")
+            for name, metric, base, cur in regressions:
+                print(f"  {name}.{metric}: {base:.3f} -> {cur:.3f}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,115 @@
+# ai_service/benchmarks/bench_fuzzy.py
+# Cost and benefit of typo-tolerant extraction: normalize_text latency with the
+# fuzzy stage off and on for texts from a sentence up to several thousand
+# words, how often the time budget cuts matching short, how many injected
+# misspellings are recovered and how many spurious symptoms appear on clean text.
+#
+#   python benchmarks/bench_fuzzy.py --iterations 300
+
+import os
+import time
+import random
+import argparse
+
+from common import RESULTS_DIR, load_vocabulary, synthetic_triage_texts, summarize, write_json, print_table
+
+FILLER = ("the pain started after lunch and my mother says it is probably something I ate but "
+          "I am not sure because my brother had similar problems last month and went to the clinic "
+          "where they gave him tablets for a week").split()
+
+def misspell(word: str, rng: random.Random) -> str:
+    """One random typo: swap, drop, double or replace a letter (words of 5+ letters only)."""
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    op = rng.choice(("swap", "drop", "double", "replace"))
+    if op == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if op == "drop":
+        return word[:i] + word[i + 1:]
+    if op == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + rng.choice("aeiou") + word[i + 1:]
+
+def typo_case(vocab, rng):
+    """(text, misspelled symptom ids) with three symptoms, each misspelled in one word."""
+    picks = rng.sample(vocab, 3)
+    phrases, targets = [], []
+    for s in picks:
+        words = s.split("_")
+        j = max(range(len(words)), key=lambda n: len(words[n]))
+        typo = misspell(words[j], rng)
+        if typo != words[j]:
+            targets.append(s)
+        words[j] = typo
+        phrases.append(" ".join(words))
+    return f"I have {phrases[0]} and {phrases[1]}, also some {phrases[2]}", targets
+
+def long_text(words: int, vocab, rng) -> str:
+    out = []
+    while len(out) < words:
+        text, _ = typo_case(vocab, rng)
+        out.extend(text.split())
+        out.extend(rng.sample(FILLER, 12))
+    return " ".join(out[:words])
+
+def time_normalize(engine, texts, iterations):
+    latencies = []
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        engine.normalize_text(texts[i % len(texts)])
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark typo-tolerant symptom extraction")
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--budget-ms", type=float, default=2.0)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[20, 200, 1000, 5000])
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "fuzzy.json"))
+    args = parser.parse_args()
+
+    from main import InferenceEngine
+    from modules.metrics import FUZZY
+    rng = random.Random(7)
+    vocab = load_vocabulary()
+    exact = InferenceEngine(fuzzy_budget_ms=0)
+    fuzzy = InferenceEngine(fuzzy_budget_ms=args.budget_ms)
+
+    # Quality: recovered misspellings, spurious matches on clean text
+    cases = [typo_case(vocab, rng) for _ in range(500)]
+    total = sum(len(t) for _, t in cases)
+    recovered = {name: sum(len(set(t) & set(e.normalize_text(text))) for text, t in cases)
+                 for name, e in (("exact", exact), ("fuzzy", fuzzy))}
+    clean = synthetic_triage_texts(500, vocab, rng)
+    spurious = sum(len(set(fuzzy.normalize_text(t)) - set(exact.normalize_text(t))) for t in clean)
+    quality = {
+        "misspelled_symptoms": total,
+        "recall_exact": recovered["exact"] / total,
+        "recall_fuzzy": recovered["fuzzy"] / total,
+        "spurious_per_clean_text": spurious / len(clean),
+    }
+    print(quality)
+
+    rows, results = {}, {"quality": quality, "latency": {}}
+    for n in args.lengths:
+        texts = [long_text(n, vocab, rng) for _ in range(20)]
+        iterations = max(3 * len(texts), args.iterations * 20 // max(n, 20))
+        base = time_normalize(exact, texts, iterations)
+        exceeded_before = FUZZY.get("budget_exceeded")
+        fuzzy.fuzzy_index._memo.clear()  # first pass pays for every lookup
+        cold = time_normalize(fuzzy, texts, len(texts))
+        warm = time_normalize(fuzzy, texts, iterations)
+        exceeded = FUZZY.get("budget_exceeded") - exceeded_before
+        results["latency"][str(n)] = {"exact": base, "fuzzy_cold": cold, "fuzzy_warm": warm,
+                                      "budget_exceeded": exceeded, "calls": len(texts) + iterations}
+        rows[f"{n} words"] = {"exact_p50_ms": base["p50_ms"], "exact_p95_ms": base["p95_ms"],
+                     "cold_p95_ms": cold["p95_ms"], "warm_p50_ms": warm["p50_ms"],
+                     "warm_p95_ms": warm["p95_ms"], "budget_hit": exceeded}
+
+    print_table(rows, cols=["exact_p50_ms", "exact_p95_ms", "cold_p95_ms", "warm_p50_ms", "warm_p95_ms",
+                            "budget_hit"])
+    write_json(args.output, results)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,167 @@
+# ai_service/benchmarks/bench_image_workers.py
+# Image workloads in the API process (MEDICORE_IMAGE_WORKERS=0) against the
+# sidecar image workers (modules/image_workers.py), each layout in a fresh
+# interpreter after warm-up and a round of pill / report requests:
+#   - API process RSS / USS, image worker RSS, and the cost of forking the API
+#     process (what prefork.py and the bulk job pool pay per child),
+#   - /identify_pill and /analyze_report latency, and /predict/symptoms latency
+#     while image requests run alongside,
+#   - the handoff itself: image bytes pickled through a pipe vs copied into the
+#     worker's shared memory slab, per image size.
+#
+#   python benchmarks/bench_image_workers.py --requests 100 --workers 2
+
+import os
+import sys
+import json
+import time
+import pickle
+import random
+import argparse
+import tempfile
+import subprocess
+
+from common import SERVICE_DIR, RESULTS_DIR, pill_image_bytes, report_image_bytes, summarize, write_json, print_table
+
+CHILD = """
+import os, sys, json, time, pickle, random, threading, statistics
+sys.path.insert(0, "benchmarks")
+from common import synthetic_triage_texts, load_vocabulary, summarize
+import main
+from modules.memstats import read_memory
+from fastapi.testclient import TestClient
+
+n = int(sys.argv[1])
+with open(sys.argv[2], "rb") as f:
+    pills, reports = pickle.load(f)  # drawn by the parent, so PIL is only imported here if the layout does
+texts = synthetic_triage_texts(n, load_vocabulary(), random.Random(7))
+
+def timed(client, fn, count):
+    out = []
+    for i in range(count):
+        t0 = time.perf_counter()
+        assert fn(client, i).status_code == 200
+        out.append(time.perf_counter() - t0)
+    return out
+
+pill = lambda c, i: c.post("/identify_pill", files={"file": ("p.png", pills[i % len(pills)], "image/png")})
+report = lambda c, i: c.post("/analyze_report", files={"file": ("r.png", reports[i % len(reports)], "image/png")})
+triage = lambda c, i: c.post("/predict/symptoms", json={"text": texts[i % len(texts)]})
+
+with TestClient(main.app) as client:
+    main.warm_up()
+    if main.IMAGE_WORKERS:
+        # wait for the workers to finish loading so the first timings are not start-up
+        main.image_workers.get().run("memory", b"")
+    timed(client, pill, 4); timed(client, report, 4); timed(client, triage, 20)
+    out = {"pill": summarize(timed(client, pill, n)), "report": summarize(timed(client, report, n)),
+           "triage": summarize(timed(client, triage, n))}
+    stop = threading.Event()
+    def image_load():
+        i = 0
+        while not stop.is_set():
+            (pill if i % 2 else report)(client, i)
+            i += 1
+    threads = [threading.Thread(target=image_load) for _ in range(2)]
+    for t in threads: t.start()
+    out["triage_under_image_load"] = summarize(timed(client, triage, n))
+    stop.set()
+    for t in threads: t.join()
+
+    api = read_memory()
+    forks = []
+    for _ in range(20):
+        t0 = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0)
+        os.waitpid(pid, 0)
+        forks.append(time.perf_counter() - t0)
+    out["memory"] = {"api_rss": api.get("rss"), "api_uss": api.get("uss"),
+                     "fork_ms": statistics.median(forks) * 1000,
+                     "heavy_modules_in_api": sorted(m for m in ("torch", "torchvision", "cv2", "pytesseract", "PIL.Image")
+                                                    if m in sys.modules)}
+    if main.IMAGE_WORKERS:
+        workers = main.image_workers.get().stats()["workers"]
+        out["memory"]["worker_rss"] = sum(w["rss"] or 0 for w in workers)
+        out["memory"]["worker_uss"] = sum(w["uss"] or 0 for w in workers)
+print("BENCH" + json.dumps(out))
+"""
+
+def run_layout(workers, n, images_path):
+    env = {**os.environ, "MEDICORE_WARMUP": "0", "MEDICORE_IMAGE_WORKERS": str(workers), "MEDICORE_ADMISSION": "0"}
+    proc = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD, str(n), images_path], cwd=SERVICE_DIR,
+                          capture_output=True, text=True, env=env)
+    line = [l for l in proc.stdout.splitlines() if l.startswith("BENCH")]
+    if not line:
+        raise RuntimeError(proc.stderr[-3000:])
+    return json.loads(line[0][5:])
+
+def _echo(conn):
+    from modules.memstats import read_memory
+    while True:
+        try:
+            data = conn.recv()
+        except EOFError:
+            return
+        conn.send(read_memory() if data is not None else None)
+
+def handoff(sizes, reps):
+    """Round trip of one image to a worker process: pickled through a Pipe vs shared memory slab."""
+    import multiprocessing
+    from modules.image_workers import ImageWorkerPool
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_echo, args=(child,), daemon=True)
+    proc.start()
+    pool = ImageWorkerPool(1).start()
+    pool.run("memory", b"")
+    rows = {}
+    try:
+        for size in sizes:
+            data = os.urandom(size)
+            for label, call in (("pickled pipe", lambda: (parent.send(data), parent.recv())),
+                                ("shared memory", lambda: pool.run("memory", data))):
+                call()
+                times = []
+                for _ in range(reps):
+                    t0 = time.perf_counter()
+                    call()
+                    times.append(time.perf_counter() - t0)
+                rows[f"{size // 1024}KB {label}"] = summarize(times)
+    finally:
+        parent.close()
+        proc.join(5)
+        pool.close()
+    return rows
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark image work in-process vs in sidecar workers")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2, help="image workers in the sidecar layout")
+    parser.add_argument("--handoff-sizes", type=int, nargs="+", default=[256 * 1024, 2 * 1024 * 1024, 8 * 1024 * 1024])
+    parser.add_argument("--handoff-reps", type=int, default=50)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "image_workers.json"))
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.NamedTemporaryFile(suffix=".pkl") as images:
+        pickle.dump(([pill_image_bytes(rng) for _ in range(8)], [report_image_bytes(rng) for _ in range(4)]), images)
+        images.flush()
+        layouts = {"in-process": run_layout(0, args.requests, images.name),
+                   f"{args.workers} workers": run_layout(args.workers, args.requests, images.name)}
+    latency, memory = {}, {}
+    for name, r in layouts.items():
+        for ep in ("pill", "report", "triage", "triage_under_image_load"):
+            latency[f"{name} {ep}"] = r[ep]
+        memory[name] = {k: (v / 2**20 if k.endswith(("rss", "uss")) and v is not None else v)
+                        for k, v in r["memory"].items() if k != "heavy_modules_in_api"}
+        memory[name]["heavy_in_api"] = ",".join(r["memory"]["heavy_modules_in_api"]) or "-"
+    print_table(latency, cols=("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"))
+    print_table(memory, cols=("api_rss", "api_uss", "worker_rss", "worker_uss", "fork_ms", "heavy_in_api"))
+    transfer = handoff(args.handoff_sizes, args.handoff_reps)
+    print_table(transfer, cols=("count", "mean_ms", "p50_ms", "p95_ms"))
+    write_json(args.output, {"args": vars(args), "layouts": layouts, "handoff": transfer})
+
+if __name__ == "__main__":
+    main_cli()
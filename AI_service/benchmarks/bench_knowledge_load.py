@@ -0,0 +1,158 @@
+# ai_service/benchmarks/bench_knowledge_load.py
+# Startup cost of the knowledge files: building RedFlagGuard + InferenceEngine from
+# the JSON files against from the precompiled bundle, each in a fresh interpreter
+# (after `import main`), for the service's knowledge/ and for a synthetic knowledge
+# base --scale times larger. Also times the exact-match extraction stages per
+# request: the old loops over the raw structures vs the precompiled term pairs.
+#
+#   python benchmarks/bench_knowledge_load.py --runs 5 --scale 50
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from common import SERVICE_DIR, RESULTS_DIR, synthetic_triage_texts, summarize, write_json, print_table
+
+CHILD = """
+import sys, time, json
+import main
+from modules.knowledge_bundle import KnowledgeBundle
+import joblib
+mode, kdir, bundle_path = sys.argv[1:4]
+joblib.load(f"{main.KNOW_PATH}/medicore_model_v4.pkl")  # scikit-learn imports aren't what's measured
+t0 = time.perf_counter()
+bundle = None
+if mode == "bundle":
+    bundle = KnowledgeBundle.load(bundle_path)
+    assert not bundle.stale_sources(kdir)
+t_bundle = time.perf_counter() - t0
+guard = main.RedFlagGuard(red_flags_path=f"{kdir}/red_flags.json", knowledge=bundle)
+t_guard = time.perf_counter() - t0
+engine = main.InferenceEngine(red_flag_scanner=guard.scanner, knowledge=bundle,
+                              synonyms_path=f"{kdir}/synonyms.json", symptom_list=f"{kdir}/symptom_list.json",
+                              medicine_rules=f"{kdir}/medicine_rules.json")
+t_total = time.perf_counter() - t0
+t1 = time.perf_counter()
+engine._load_model()
+t_model = time.perf_counter() - t1
+print("BENCH" + json.dumps({"bundle_load_s": t_bundle, "guard_s": t_guard, "total_s": t_total,
+                            "knowledge_s": t_total - t_model,
+                            "symptoms": len(engine.symptom_list)}))
+"""
+
+def scaled_knowledge(src, dst, scale, rng):
+    """Copy of knowledge/ with the symptom list, synonyms, red flags and medicine rules scale x larger."""
+    os.makedirs(dst, exist_ok=True)
+    with open(os.path.join(src, "symptom_list.json")) as f:
+        base = json.load(f)
+    words = sorted({w for s in base for w in s.split("_")})
+    symptoms = list(base)
+    seen = set(symptoms)
+    while len(symptoms) < len(base) * scale:
+        s = "_".join(rng.sample(words, rng.choice([2, 2, 3])))
+        if s not in seen:
+            seen.add(s)
+            symptoms.append(s)
+    synonyms = {s.replace("_", " "): [" ".join(rng.sample(words, 2)) for _ in range(3)]
+                for s in rng.sample(symptoms, len(symptoms) // 4)}
+    red_flags = {s.replace("_", " "): f"Urgent: {s}" for s in rng.sample(symptoms, max(5, len(symptoms) // 50))}
+    medicine = {f"Disease {i}": [f"Advice {rng.randrange(500)}" for _ in range(5)] for i in range(len(symptoms) // 10)}
+    for name, data in (("symptom_list.json", symptoms), ("synonyms.json", synonyms),
+                       ("red_flags.json", red_flags), ("medicine_rules.json", medicine)):
+        with open(os.path.join(dst, name), "w") as f:
+            json.dump(data, f)
+    return dst
+
+def build(kdir, path):
+    subprocess.run([sys.executable, os.path.join(SERVICE_DIR, "training_scripts", "build_knowledge_bundle.py"),
+                    "--knowledge-dir", kdir, "--output", path], cwd=SERVICE_DIR, check=True, capture_output=True)
+    return os.path.getsize(path)
+
+def startup(mode, kdir, bundle_path, runs):
+    out = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD, mode, kdir, bundle_path], cwd=SERVICE_DIR,
+                              capture_output=True, text=True, env={**os.environ, "MEDICORE_WARMUP": "0"})
+        line = [l for l in proc.stdout.splitlines() if l.startswith("BENCH")]
+        if not line:
+            raise RuntimeError(proc.stderr[-2000:])
+        out.append(json.loads(line[0][5:]))
+    return {k: statistics.median(r[k] for r in out) for k in out[0]}
+
+def per_request(kdir, n):
+    """normalize_text stages 1-2: raw-structure loops (before) vs precompiled term pairs."""
+    from main import InferenceEngine
+    engine = InferenceEngine(synonyms_path=f"{kdir}/synonyms.json", symptom_list=f"{kdir}/symptom_list.json",
+                             fuzzy_budget_ms=0)
+    texts = [t.lower() for t in synthetic_triage_texts(n, engine.symptom_list, random.Random(5))]
+
+    def legacy(text_low):
+        found = set()
+        for s in engine.symptom_list:
+            readable = s.replace("_", " ")
+            if readable in text_low or s in text_low:
+                found.add(s)
+        for canon, variants in engine.synonyms.items():
+            for v in variants + [canon]:
+                if v in text_low:
+                    found.add(canon)
+        return found
+
+    def compiled(text_low):
+        found = set()
+        for term, symptom in engine.match_terms:
+            if term in text_low:
+                found.add(symptom)
+        return found
+
+    out = {}
+    for label, fn in (("raw structures", legacy), ("precompiled terms", compiled)):
+        times = []
+        for t in texts:
+            t0 = time.perf_counter()
+            fn(t)
+            times.append(time.perf_counter() - t0)
+        out[label] = summarize(times)
+    assert all(legacy(t) == compiled(t) for t in texts[:200])
+    return out
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark knowledge loading: JSON files vs bundle")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per configuration")
+    parser.add_argument("--scale", type=int, default=50, help="size multiplier for the synthetic knowledge base")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "knowledge_load.json"))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="medicore-knowledge-")
+    results, startup_rows, request_rows = {}, {}, {}
+    try:
+        service_kdir = os.path.join(SERVICE_DIR, "knowledge")
+        scaled_kdir = scaled_knowledge(service_kdir, os.path.join(workdir, "scaled"), args.scale, random.Random(3))
+        for label, kdir in (("service", service_kdir), (f"x{args.scale}", scaled_kdir)):
+            bundle_path = os.path.join(workdir, f"{label}.bundle")
+            size = build(kdir, bundle_path)
+            rows = {mode: startup(mode, kdir, bundle_path, args.runs) for mode in ("json", "bundle")}
+            for mode, r in rows.items():
+                startup_rows[f"{label} {mode}"] = {**r, "bundle_bytes": size if mode == "bundle" else ""}
+            req = per_request(kdir, args.requests)
+            for name, r in req.items():
+                request_rows[f"{label} {name}"] = r
+            results[label] = {"bundle_bytes": size, "startup": rows, "per_request": req,
+                              "startup_saved_s": rows["json"]["knowledge_s"] - rows["bundle"]["knowledge_s"]}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(startup_rows, cols=("symptoms", "bundle_load_s", "knowledge_s", "total_s", "bundle_bytes"))
+    print_table(request_rows, cols=("count", "mean_ms", "p50_ms", "p99_ms"))
+    write_json(args.output, {"args": vars(args), "results": results})
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,66 @@
+# ai_service/benchmarks/bench_red_flags.py
+# Emergency fast-path latency: the precompiled red-flag scan on raw text versus
+# the full extraction + prediction path it pre-empts, plus the end-to-end
+# /predict/symptoms latency for emergency and non-emergency texts.
+#
+#   python benchmarks/bench_red_flags.py --iterations 2000
+
+import os
+import time
+import random
+import asyncio
+import argparse
+
+from common import RESULTS_DIR, load_vocabulary, synthetic_triage_texts, summarize, asgi_client, write_json, print_table
+
+EMERGENCY_TEXTS = [
+    "I suddenly have chest pain spreading to my arm and I'm sweating a lot",
+    "my father is unconscious and not responding",
+    "breath shortness since this morning, getting worse",
+    "Chest_pain and vision_blur after climbing stairs",
+]
+
+def time_calls(fn, inputs, iterations):
+    latencies = []
+    for i in range(iterations):
+        x = inputs[i % len(inputs)]
+        t0 = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies)
+
+async def endpoint_latency(app, texts, iterations):
+    latencies = []
+    async with asgi_client(app) as client:
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            await client.post("/predict/symptoms", json={"text": texts[i % len(texts)]})
+            latencies.append(time.perf_counter() - t0)
+    return summarize(latencies)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the red-flag emergency fast path")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "red_flags.json"))
+    args = parser.parse_args()
+
+    import main
+    main.warm_up()
+    guard, engine = main.guard.get(), main.engine.get()
+    normal_texts = synthetic_triage_texts(200, load_vocabulary(), random.Random(1))
+    # Keep only texts that really take the model path
+    normal_texts = [t for t in normal_texts if not guard.scan(t)]
+
+    results = {
+        "scan(emergency text)": time_calls(guard.scan, EMERGENCY_TEXTS, args.iterations),
+        "scan(normal text)": time_calls(guard.scan, normal_texts, args.iterations),
+        "start_session(emergency)": time_calls(engine.start_session, EMERGENCY_TEXTS, args.iterations),
+        "endpoint(emergency)": asyncio.run(endpoint_latency(main.app, EMERGENCY_TEXTS, args.iterations // 4)),
+        "endpoint(normal)": asyncio.run(endpoint_latency(main.app, normal_texts, args.iterations // 4)),
+    }
+    print_table(results, cols=("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"))
+    write_json(args.output, results)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main_cli()
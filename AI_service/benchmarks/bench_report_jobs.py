@@ -0,0 +1,79 @@
+# ai_service/benchmarks/bench_report_jobs.py
+# Bulk report throughput in reports per minute: the job queue (SQLite +
+# spawn process pool) at several pool sizes against calling the synchronous
+# /analyze_report endpoint once per report, as the backend does today.
+#
+#   python benchmarks/bench_report_jobs.py --reports 200 --workers 1 2 4
+
+import os
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+from common import RESULTS_DIR, report_image_bytes, asgi_client, write_json, print_table
+
+async def sequential_endpoint(app, reports):
+    async with asgi_client(app) as client:
+        t0 = time.perf_counter()
+        for i, content in enumerate(reports):
+            await client.post("/analyze_report", files={"file": (f"report{i}.png", content, "image/png")})
+        return time.perf_counter() - t0
+
+def run_job(workers, reports, workdir):
+    from modules.jobs import JobStore, JobRunner
+    store = JobStore(os.path.join(workdir, f"jobs-{workers}.sqlite3"))
+    runner = JobRunner(store, workers=workers)
+    runner.start()
+    try:
+        # One small job first so process spawn isn't counted as throughput
+        warm = store.create_job([{"name": "warm", "content": reports[0]}] * workers)
+        runner.notify()
+        while store.job(warm)["status"] != "completed":
+            time.sleep(0.05)
+
+        t0 = time.perf_counter()
+        job_id = store.create_job([{"name": f"report{i}.png", "content": c} for i, c in enumerate(reports)])
+        runner.notify()
+        while True:
+            job = store.job(job_id)
+            if job["status"] == "completed":
+                break
+            time.sleep(0.05)
+        wall = time.perf_counter() - t0
+        return wall, job
+    finally:
+        runner.close()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark bulk report analysis jobs")
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "report_jobs.json"))
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    reports = [report_image_bytes(rng) for _ in range(args.reports)]
+    rows, results = {}, {"cpus": os.cpu_count(), "reports": args.reports}
+
+    import main
+    wall = asyncio.run(sequential_endpoint(main.app, reports))
+    rows["sequential /analyze_report"] = {"wall_s": wall, "reports_per_min": args.reports * 60 / wall}
+
+    workdir = tempfile.mkdtemp(prefix="medicore-jobs-")
+    try:
+        for w in args.workers:
+            wall, job = run_job(w, reports, workdir)
+            rows[f"job queue, {w} worker(s)"] = {"wall_s": wall, "reports_per_min": args.reports * 60 / wall,
+                                                "failed": job["failed"]}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(rows, cols=("wall_s", "reports_per_min", "failed"))
+    results["runs"] = rows
+    write_json(args.output, results)
+
+if __name__ == "__main__":
+    main_cli()
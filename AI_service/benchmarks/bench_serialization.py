@@ -0,0 +1,87 @@
+# ai_service/benchmarks/bench_serialization.py
+# Response serialization cost per payload: FastAPI's untyped path (jsonable_encoder
+# + json.dumps, what every endpoint used before) against the typed response models
+# encoded by modules/responses.FastResponse as JSON (orjson) and msgpack. Payloads
+# are a triage start, a single report analysis and a batch (a 500-report job
+# results page).
+#
+#   python benchmarks/bench_serialization.py --repeat 2000
+
+import os
+import time
+import random
+import asyncio
+import argparse
+
+from common import (RESULTS_DIR, REPORT_LINES, load_vocabulary, synthetic_triage_texts, report_text,
+                    summarize, write_json, print_table)
+
+def report_result(rng):
+    """analyze_report_bytes output for a full panel (what OCR returns on a real report)."""
+    text = report_text(rng)
+    findings = []
+    for name, lo, hi, _ in REPORT_LINES:
+        val = rng.uniform(lo, hi)
+        findings.append({"test": name, "value": val, "status": rng.choice(["low", "normal", "high"]),
+                         "reference": f"{lo}-{hi}"})
+    return {"raw_text": text[:1000], "findings": findings}
+
+def payloads(rng):
+    import main
+    engine = main.engine.get()
+    triage = engine.start_session(synthetic_triage_texts(1, load_vocabulary(), rng)[0])
+    triage["session_id"] = "0" * 32
+    page = [{"index": i, "name": f"report{i}.png", "status": "done", "data": report_result(rng),
+             "error": None, "seconds": rng.uniform(0.5, 3.0)} for i in range(500)]
+    return {
+        "triage": ("/predict/symptoms", {"success": True, "data": triage}),
+        "report": ("/analyze_report", {"success": True, "data": report_result(rng)}),
+        "batch": ("/jobs/{job_id}/results", {"success": True, "data": {
+            "job_id": "0" * 32, "status": "completed", "total": 500, "offset": 0, "limit": 500, "items": page}}),
+    }
+
+async def encode_untyped(route, content):
+    from fastapi.routing import serialize_response
+    from fastapi.responses import JSONResponse
+    return JSONResponse(await serialize_response(response_content=content)).body
+
+async def encode_typed(route, content, msgpack=False):
+    from fastapi.routing import serialize_response
+    from modules import responses
+    token = responses._wants_msgpack.set(msgpack)
+    try:
+        data = await serialize_response(field=route.response_field, response_content=content,
+                                        exclude_unset=route.response_model_exclude_unset)
+        return responses.FastResponse(data).body
+    finally:
+        responses._wants_msgpack.reset(token)
+
+async def run(repeat):
+    import main
+    routes = {r.path: r for r in main.app.routes if hasattr(r, "response_field")}
+    rows = {}
+    for name, (path, content) in payloads(random.Random(11)).items():
+        route = routes[path]
+        for label, encode in (("untyped json", lambda: encode_untyped(route, content)),
+                              ("typed orjson", lambda: encode_typed(route, content)),
+                              ("typed msgpack", lambda: encode_typed(route, content, msgpack=True))):
+            body = await encode()
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                await encode()
+                times.append(time.perf_counter() - t0)
+            rows[f"{name}: {label}"] = {**summarize(times), "bytes": len(body)}
+    return rows
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "serialization.json"))
+    args = parser.parse_args()
+    rows = asyncio.run(run(args.repeat))
+    print_table(rows, cols=("count", "mean_ms", "p50_ms", "p99_ms", "bytes"))
+    write_json(args.output, {"args": vars(args), "results": rows})
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,159 @@
+# ai_service/benchmarks/bench_session_recovery.py
+# Session journal costs: what journaling adds to SessionManager.create/update on
+# the request path, writer throughput and compaction, and how long a fresh
+# process takes to recover a million live sessions (run in a child process so
+# the numbers are a real cold start), plus the lazy-decode cost of first use.
+#
+#   python benchmarks/bench_session_recovery.py --sessions 1000000
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from common import RESULTS_DIR, load_vocabulary, synthetic_triage_texts, summarize, write_json, print_table
+
+def session_templates(n, rng):
+    """Session dicts shaped like the ones /predict/symptoms stores."""
+    from main import InferenceEngine
+    engine = InferenceEngine()
+    out = []
+    for text in synthetic_triage_texts(n, load_vocabulary(), rng):
+        r = engine.start_session(text)
+        out.append({"text": text, "extracted": r["extracted_symptoms"], "posterior": r["posterior"],
+                    "asked": r["asked"], "candidates": r["candidates"]})
+    return out
+
+def request_path_cost(templates, journal_dir, n):
+    """Per-call latency of create + update with and without a journal."""
+    from main import SessionManager
+    from modules.session_journal import SessionJournal
+    results = {}
+    for name in ("memory_only", "journaled"):
+        journal = None
+        if name == "journaled":
+            journal = SessionJournal(journal_dir, ttl_seconds=3600)
+            journal.start()
+        manager = SessionManager(ttl_seconds=3600, journal=journal)
+        creates, updates = [], []
+        for i in range(n):
+            data = dict(templates[i % len(templates)])
+            t0 = time.perf_counter()
+            sid = manager.create(data)
+            t1 = time.perf_counter()
+            data["asked"] = data["asked"] + ["fever"]
+            manager.update(sid, data)
+            updates.append(time.perf_counter() - t1)
+            creates.append(t1 - t0)
+        if journal:
+            journal.close()
+            journal._lock_file.close()
+        results[f"create ({name})"] = summarize(creates)
+        results[f"update ({name})"] = summarize(updates)
+    return results
+
+def write_journal(templates, journal_dir, sessions, updates, segment_mb):
+    """Journal `sessions` sessions with `updates` answers each; returns writer figures."""
+    from modules.session_journal import SessionJournal
+    journal = SessionJournal(journal_dir, ttl_seconds=3600, segment_bytes=segment_mb * 1024 * 1024)
+    journal.start()
+    now = time.time()
+    t0 = time.perf_counter()
+    for i in range(sessions):
+        data = dict(templates[i % len(templates)])
+        sid = f"{i:032x}"
+        journal.put(sid, now, data)
+        for u in range(updates):
+            data["asked"] = data["asked"] + [f"symptom_{u}"]
+            journal.put(sid, now, data)
+    submit_s = time.perf_counter() - t0
+    journal.close(timeout=None)
+    journal._lock_file.close()
+    total_s = time.perf_counter() - t0
+    stats = journal.stats()
+    return {"records": stats["records"], "bytes": stats["bytes"], "compactions": stats["compactions"],
+            "last_compaction_s": stats["last_compaction_seconds"], "submit_s": submit_s,
+            "drain_s": total_s, "records_per_s": stats["records"] / total_s,
+            "disk_bytes": sum(os.path.getsize(os.path.join(journal_dir, f)) for f in os.listdir(journal_dir))}
+
+def recover_child(journal_dir):
+    """Runs in a fresh process: recover into a SessionManager, then touch sessions."""
+    from modules.memstats import read_memory
+    from main import SessionManager
+    from modules.session_journal import SessionJournal
+    rss0 = read_memory().get("rss", 0)
+    journal = SessionJournal(journal_dir, ttl_seconds=3600)
+    manager = SessionManager(ttl_seconds=3600, journal=journal)
+    t0 = time.perf_counter()
+    n = manager.recover()
+    recover_s = time.perf_counter() - t0
+    rss1 = read_memory().get("rss", 0)
+
+    sids = random.Random(0).sample(list(manager.sessions), min(10000, n))
+    first, again = [], []
+    for sid in sids:
+        t = time.perf_counter()
+        manager.get(sid)
+        first.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        manager.get(sid)
+        again.append(time.perf_counter() - t)
+
+    # What eager decoding would have added to startup
+    raws = [item["raw"] for item in manager.sessions.values() if "raw" in item]
+    t = time.perf_counter()
+    for raw in raws:
+        json.loads(raw)
+    eager_decode_s = time.perf_counter() - t
+    print(json.dumps({
+        "sessions": n, "recover_s": recover_s, "index_s": journal.last_recovery["seconds"],
+        "records_scanned": journal.last_recovery["records"], "rss_added_mb": (rss1 - rss0) / 2**20,
+        "first_get": summarize(first), "cached_get": summarize(again),
+        "eager_decode_s_would_add": eager_decode_s,
+    }))
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark session journaling and crash recovery")
+    parser.add_argument("--sessions", type=int, default=1000000)
+    parser.add_argument("--updates", type=int, default=2, help="answered follow-ups journaled per session")
+    parser.add_argument("--segment-mb", type=int, default=64)
+    parser.add_argument("--request-path-samples", type=int, default=50000)
+    parser.add_argument("--dir", help="journal directory (default: a temporary one, removed afterwards)")
+    parser.add_argument("--recover-only", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "session_recovery.json"))
+    args = parser.parse_args()
+
+    if args.recover_only:
+        recover_child(args.dir)
+        return
+
+    workdir = args.dir or tempfile.mkdtemp(prefix="medicore-journal-")
+    try:
+        templates = session_templates(500, random.Random(3))
+        request_path = request_path_cost(templates, os.path.join(workdir, "request_path"),
+                                         args.request_path_samples)
+        print_table(request_path, cols=("count", "p50_ms", "p95_ms", "p99_ms", "max_ms"))
+
+        journal_dir = os.path.join(workdir, "journal")
+        writer = write_journal(templates, journal_dir, args.sessions, args.updates, args.segment_mb)
+        print(json.dumps(writer, indent=2))
+
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--recover-only", "--dir", journal_dir],
+                             capture_output=True, text=True, check=True)
+        recovery = json.loads(out.stdout.strip().splitlines()[-1])
+        print(json.dumps({k: v for k, v in recovery.items() if not isinstance(v, dict)}, indent=2))
+        print_table({"first get (lazy decode)": recovery["first_get"], "later get": recovery["cached_get"]},
+                    cols=("count", "p50_ms", "p95_ms", "p99_ms"))
+        write_json(args.output, {"args": vars(args), "request_path": request_path,
+                                 "writer": writer, "recovery": recovery})
+    finally:
+        if not args.dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main_cli()
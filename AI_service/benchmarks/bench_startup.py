@@ -0,0 +1,88 @@
+# ai_service/benchmarks/bench_startup.py
+# Cold-start measurement for the AI service: `python -X importtime -c "import main"`
+# in a fresh interpreter, plus time until every component is loaded.
+#
+#   python benchmarks/bench_startup.py --runs 5
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+from common import SERVICE_DIR, RESULTS_DIR, write_json
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Run in the child: import, then force-load every component the way warm_up() does
+LOAD_SNIPPET = """
+import time, json, resource
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter() - t0
+rss_import = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+main.warm_up()
+t_ready = time.perf_counter() - t0
+print("BENCH" + json.dumps({"import_s": t_import, "ready_s": t_ready,
+    "maxrss_kb_after_import": rss_import,
+    "maxrss_kb_after_ready": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "components": {c.name: c.status() for c in main.COMPONENTS}}))
+"""
+
+def run_importtime():
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=SERVICE_DIR,
+                          capture_output=True, text=True, env={**os.environ, "MEDICORE_WARMUP": "0"})
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            self_us, cum_us, indent, name = m.groups()
+            rows.append({"module": name, "self_us": int(self_us), "cumulative_us": int(cum_us),
+                         "depth": len(indent) // 2})
+    return rows
+
+def run_load():
+    proc = subprocess.run([sys.executable, "-c", LOAD_SNIPPET], cwd=SERVICE_DIR, capture_output=True, text=True,
+                          env={**os.environ, "MEDICORE_WARMUP": "0"})
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH"):
+            return json.loads(line[5:])
+    raise RuntimeError(f"load run failed:\n{proc.stderr[-2000:]}")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Measure AI service import and warm-up time")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="heaviest top-level imports to list")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "startup.json"))
+    args = parser.parse_args()
+
+    rows = run_importtime()
+    main_row = next((r for r in rows if r["module"] == "main"), None)
+    top_level = sorted((r for r in rows if r["depth"] == 1), key=lambda r: r["cumulative_us"], reverse=True)
+    heavy = {m: any(r["module"] == m for r in rows) for m in ("torch", "torchvision", "cv2", "pytesseract", "PIL.Image", "sklearn")}
+
+    loads = [run_load() for _ in range(args.runs)]
+    report = {
+        "import_main_us": main_row["cumulative_us"] if main_row else None,
+        "heavy_modules_imported_by_main": heavy,
+        "top_imports": top_level[:args.top],
+        "import_s_median": statistics.median(l["import_s"] for l in loads),
+        "ready_s_median": statistics.median(l["ready_s"] for l in loads),
+        "runs": loads,
+    }
+
+    print(f"import main (-X importtime): {report['import_main_us'] / 1000:.1f} ms")
+    print(f"heavy modules imported at import time: {[m for m, hit in heavy.items() if hit] or 'none'}")
+    print(f"median wall: import {report['import_s_median']:.3f}s, all components ready {report['ready_s_median']:.3f}s")
+    print(f"max RSS after import {loads[-1]['maxrss_kb_after_import'] / 1024:.0f} MiB, "
+          f"after warm-up {loads[-1]['maxrss_kb_after_ready'] / 1024:.0f} MiB")
+    print("heaviest direct imports:")
+    for r in top_level[:args.top]:
+        print(f"  {r['module']:<32} {r['cumulative_us'] / 1000:>8.1f} ms")
+    write_json(args.output, report)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main_cli()
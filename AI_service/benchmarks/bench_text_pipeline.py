@@ -0,0 +1,80 @@
+# ai_service/benchmarks/bench_text_pipeline.py
+# Cost of adding specialty routing to triage requests (modules/text_pipeline.py):
+#   - triage alone as it used to be served (vectorizer.transform + predict_proba),
+#   - triage and specialty each through their own vectorizer and classifier,
+#   - the text pipeline with the triage head alone and with both heads,
+#   - start_session end to end, with and without the specialty head, prediction
+#     cache off so every call pays for scoring.
+# Symptom extraction is done up front for the head rows: it is the same whatever
+# scores the text.
+#
+#   python benchmarks/bench_text_pipeline.py --specialty-model knowledge/specialty_model.pkl --iterations 5000
+
+import os
+import time
+import random
+import argparse
+
+from common import RESULTS_DIR, load_vocabulary, synthetic_triage_texts, summarize, write_json, print_table
+
+def time_calls(fn, inputs, iterations):
+    latencies = []
+    for i in range(iterations):
+        x = inputs[i % len(inputs)]
+        t0 = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark triage + specialty scoring on the shared text pipeline")
+    parser.add_argument("--model", default=None, help="symptom model artifact (default: the one the service serves)")
+    parser.add_argument("--specialty-model", default=None, help="default: MEDICORE_SPECIALTY_MODEL")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "text_pipeline.json"))
+    args = parser.parse_args()
+
+    import main
+    specialty_path = args.specialty_model or main.SPECIALTY_MODEL
+    if not specialty_path or not os.path.exists(specialty_path):
+        raise SystemExit(f"No specialty model at {specialty_path!r}; train one with "
+                         "training_scripts/train_specialty_classifier.py")
+    model_path = args.model or main.serving_model_path()
+    main.SPECIALTY_MODEL = specialty_path
+    engine = main.build_engine(model_path)
+    if engine.specialty is None or "triage" not in engine.pipeline.heads:
+        raise SystemExit("Could not build both heads; see the messages above")
+    main.SPECIALTY_MODEL = ""
+    triage_only = main.build_engine(model_path)
+
+    texts = synthetic_triage_texts(args.texts, load_vocabulary(), random.Random(5))
+    texts = [t for t in texts if not main.guard.get().scan(t)]  # emergencies never reach the heads
+    requests = [(t, " ".join(engine.normalize_text(t))) for t in texts]
+    triage, specialty = engine.pipeline.heads["triage"], engine.specialty
+    pipeline = engine.pipeline
+    for e in (engine, triage_only):
+        e.cache_size = 0
+
+    results = {
+        "triage, own vectorizer": time_calls(
+            lambda r: triage.clf.predict_proba(triage.vect.transform([r[1]])), requests, args.iterations),
+        "both, own vectorizers": time_calls(
+            lambda r: (triage.clf.predict_proba(triage.vect.transform([r[1]])),
+                       specialty.clf.predict_proba(specialty.vect.transform([r[0]]))), requests, args.iterations),
+        "pipeline, triage": time_calls(lambda r: pipeline.run({"symptoms": r[1]}, ["triage"]), requests, args.iterations),
+        "pipeline, both heads": time_calls(
+            lambda r: pipeline.run({"symptoms": r[1], "text": r[0]}), requests, args.iterations),
+        "session, triage": time_calls(triage_only.start_session, texts, args.iterations),
+        "session, both heads": time_calls(engine.start_session, texts, args.iterations),
+    }
+    print(f"heads: {pipeline.describe()}")
+    print_table(results, cols=("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"))
+    base = results["triage, own vectorizer"]["p50_ms"]
+    for name in ("both, own vectorizers", "pipeline, triage", "pipeline, both heads"):
+        print(f"{name}: {results[name]['p50_ms'] / base:.2f}x single-model p50")
+    write_json(args.output, {"args": vars(args), "heads": pipeline.describe(), "results": results})
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main_cli()
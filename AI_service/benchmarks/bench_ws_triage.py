@@ -0,0 +1,131 @@
+# ai_service/benchmarks/bench_ws_triage.py
+# Triage question/answer loop over /ws/triage against the HTTP flow
+# (/predict/symptoms then one /predict/answer per follow-up):
+#   - per-turn latency seen by the client, both through the in-process test client,
+#   - the server-side cost of one answer (apply_answer re-predicting from the
+#     symptom list vs updating the conversation's logits in place),
+#   - memory held per open conversation (TriageConversation + its session) against
+#     a plain HTTP session, measured with tracemalloc.
+#
+#   python benchmarks/bench_ws_triage.py --conversations 200 --answers 6 [--model path.pkl]
+
+import os
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+from common import RESULTS_DIR, load_vocabulary, synthetic_triage_texts, summarize, write_json, print_table
+
+def conversations(n, answers, rng):
+    """(opening text, [(symptom, answer)]) scripts; answers follow the vocabulary, ~half yes."""
+    vocab = load_vocabulary()
+    return [(text, [(s, rng.random() < 0.5) for s in rng.sample(vocab, answers)])
+            for text in synthetic_triage_texts(n, vocab, rng)]
+
+def client_latency(client, scripts):
+    http_start, http_turn, ws_start, ws_turn = [], [], [], []
+    for text, script in scripts:
+        t0 = time.perf_counter()
+        sid = client.post("/predict/symptoms", json={"text": text}).json()["data"]["session_id"]
+        http_start.append(time.perf_counter() - t0)
+        for symptom, answer in script:
+            t0 = time.perf_counter()
+            client.post("/predict/answer", data={"session_id": sid, "symptom": symptom, "answer": str(answer).lower()})
+            http_turn.append(time.perf_counter() - t0)
+
+    for text, script in scripts:
+        with client.websocket_connect("/ws/triage") as ws:
+            t0 = time.perf_counter()
+            ws.send_text(json.dumps({"type": "start", "text": text}))
+            ws.receive_text()
+            ws_start.append(time.perf_counter() - t0)
+            for symptom, answer in script:
+                t0 = time.perf_counter()
+                ws.send_text(json.dumps({"type": "answer", "symptom": symptom, "answer": answer}))
+                ws.receive_text()
+                ws_turn.append(time.perf_counter() - t0)
+    return {"http start": summarize(http_start), "http answer": summarize(http_turn),
+            "ws start": summarize(ws_start), "ws answer": summarize(ws_turn)}
+
+def server_answer_cost(scripts):
+    """apply_answer alone (prediction cache cold): full re-prediction vs the incremental score state."""
+    import main
+    eng = main.engine.get()
+    out = {}
+    for label, incremental in (("answer (re-predict)", False), ("answer (incremental)", True)):
+        if incremental and not eng.incremental:
+            continue
+        times = []
+        for text, script in scripts:
+            result = main.begin_triage(text, [])
+            sid = result["session_id"]
+            sdata = main.sessions.get(sid)
+            state = eng.new_state(sdata["extracted"]) if incremental else None
+            for symptom, answer in script:
+                # every conversation's symptom set is new to the prediction cache in real traffic
+                eng._cache.clear()
+                t0 = time.perf_counter()
+                main.apply_answer(sid, sdata, symptom, answer, state)
+                times.append(time.perf_counter() - t0)
+        out[label] = summarize(times)
+    return out
+
+def memory_per_conversation(scripts, n):
+    """Bytes retained per live conversation: HTTP session dict vs WebSocket conversation."""
+    import main
+    out = {}
+    for label in ("http session", "ws conversation"):
+        main.sessions.sessions.clear()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        held = []
+        for i in range(n):
+            text, script = scripts[i % len(scripts)]
+            if label == "http session":
+                sid = main.begin_triage(text, [])["session_id"]
+                for symptom, answer in script[:2]:
+                    main.apply_answer(sid, main.sessions.get(sid), symptom, answer)
+            else:
+                conv = main.TriageConversation()
+                conv.start({"text": text})
+                for symptom, answer in script[:2]:
+                    conv.answer({"symptom": symptom, "answer": answer})
+                held.append(conv)
+        used = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+        out[label] = {"conversations": n, "bytes_per_conversation": used / n}
+    main.sessions.sessions.clear()
+    return out
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the WebSocket triage loop against HTTP")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=6, help="follow-up answers per conversation")
+    parser.add_argument("--memory-conversations", type=int, default=5000)
+    parser.add_argument("--model", help="model artifact (default: the service's knowledge/ model)")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "ws_triage.json"))
+    args = parser.parse_args()
+
+    import main
+    from fastapi.testclient import TestClient
+    if args.model:
+        main.engine.factory = lambda: main.InferenceEngine(model_path=args.model,
+                                                           red_flag_scanner=main.guard.get().scanner)
+    eng = main.engine.get()
+    print(f"model features: {len(eng.symptom_cols)}, incremental scoring: {eng.incremental}")
+
+    scripts = conversations(args.conversations, args.answers, random.Random(17))
+    with TestClient(main.app) as client:
+        latency = client_latency(client, scripts)
+    print_table(latency, cols=("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"))
+    server = server_answer_cost(scripts)
+    print_table(server, cols=("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"))
+    memory = memory_per_conversation(scripts, args.memory_conversations)
+    print_table(memory, cols=("conversations", "bytes_per_conversation"))
+    write_json(args.output, {"args": vars(args), "incremental": eng.incremental, "client_latency": latency,
+                             "server_answer": server, "memory": memory})
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,128 @@
+# ai_service/benchmarks/common.py
+# Shared helpers for the benchmark scripts: synthetic inputs, timing summaries
+# and an in-process client for the FastAPI app.
+
+import io
+import os
+import sys
+import json
+import random
+import statistics
+from typing import List, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(BENCH_DIR)
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# In-process benchmarks drive the app as a single client; per-client rate limiting
+# would shed most of that traffic (concurrency limits and priorities still apply)
+os.environ.setdefault("MEDICORE_RATE_LIMIT", "0")
+
+TEXT_TEMPLATES = [
+    "I have {0} and {1} since yesterday",
+    "For the last three days I've had {0}, {1} and some {2}",
+    "{0}. also {1}",
+    "My child has {0} with {1} and is not eating well, also mild {2}",
+    "Started with {0} in the morning, now {1} and {2} are getting worse",
+]
+
+def load_vocabulary() -> List[str]:
+    path = os.path.join(SERVICE_DIR, "knowledge", "symptom_list.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def synthetic_triage_texts(n: int, vocab: List[str], rng: random.Random) -> List[str]:
+    texts = []
+    for _ in range(n):
+        tpl = rng.choice(TEXT_TEMPLATES)
+        picks = [s.replace("_", " ") for s in rng.sample(vocab, 3)]
+        texts.append(tpl.format(*picks))
+    return texts
+
+def pill_image_bytes(rng: random.Random, size=(320, 240)) -> bytes:
+    """A coloured capsule/tablet on a plain background, PNG encoded."""
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, (235, 235, 230))
+    draw = ImageDraw.Draw(img)
+    color = tuple(rng.randint(30, 255) for _ in range(3))
+    w, h = size
+    box = (w * 0.2, h * 0.3, w * 0.8, h * 0.7)
+    draw.ellipse(box, fill=color, outline=(40, 40, 40), width=3)
+    draw.text((w * 0.45, h * 0.47), rng.choice(["M 30", "A 5", "IBU", "L484"]), fill=(20, 20, 20))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+REPORT_LINES = [
+    ("Hemoglobin", 9.0, 18.0, "g/dL"),
+    ("Total Leucocyte Count", 3000, 15000, "cumm"),
+    ("RBC Count", 3.5, 6.5, "mill/cumm"),
+    ("Platelet Count", 90000, 500000, "cumm"),
+    ("Fasting Blood Sugar", 60, 180, "mg/dL"),
+    ("Serum Creatinine", 0.4, 2.0, "mg/dL"),
+    ("Total Cholesterol", 120, 280, "mg/dL"),
+]
+
+def report_text(rng: random.Random) -> str:
+    lines = ["CITY DIAGNOSTIC LAB", "Complete Blood Count", ""]
+    for name, lo, hi, unit in REPORT_LINES:
+        val = rng.uniform(lo, hi)
+        val = round(val, 1) if hi < 100 else int(val)
+        lines.append(f"{name}: {val} {unit}")
+    return "\n".join(lines)
+
+def report_image_bytes(rng: random.Random, size=(900, 1200)) -> bytes:
+    """A rendered lab report page (black text on white), PNG encoded."""
+    from PIL import Image, ImageDraw
+    img = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(report_text(rng).splitlines()):
+        draw.text((60, 60 + i * 40), line, fill=0)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def summarize(latencies_s: List[float], wall_s: float = None, errors: int = 0) -> Dict:
+    """p50/p95/p99 in milliseconds plus throughput over the measured wall time."""
+    if not latencies_s:
+        return {"count": 0, "errors": errors}
+    ms = sorted(x * 1000 for x in latencies_s)
+
+    def pct(p):
+        idx = min(len(ms) - 1, max(0, int(round(p / 100.0 * len(ms))) - 1))
+        return ms[idx]
+
+    out = {
+        "count": len(ms),
+        "errors": errors,
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": ms[-1],
+    }
+    if wall_s:
+        out["throughput_rps"] = len(ms) / wall_s
+    return out
+
+def asgi_client(app, **kwargs):
+    """httpx client that drives the ASGI app in-process (no sockets)."""
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", **kwargs)
+
+def write_json(path: str, data: Dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+def print_table(rows: Dict[str, Dict], cols=("count", "errors", "p50_ms", "p95_ms", "p99_ms", "throughput_rps")):
+    print(f"{'name':<24}" + "".join(f"{c:>16}" for c in cols))
+    for name, r in rows.items():
+        cells = []
+        for c in cols:
+            v = r.get(c, "")
+            cells.append(f"{v:>16.3f}" if isinstance(v, float) else f"{v!s:>16}")
+        print(f"{name:<24}" + "".join(cells))
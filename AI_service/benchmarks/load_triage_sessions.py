@@ -0,0 +1,210 @@
+# ai_service/benchmarks/load_triage_sessions.py
+# Concurrent multi-step triage load generator: each simulated patient calls
+# /predict/symptoms once and then answers several follow-up questions on the
+# same session through /predict/answer, with think time between turns.
+#
+#   python benchmarks/load_triage_sessions.py --conversations 2000 --time-scale 0.01
+#   python benchmarks/load_triage_sessions.py --url http://localhost:8000 --conversations 500
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+
+from common import RESULTS_DIR, load_vocabulary, synthetic_triage_texts, summarize, asgi_client, write_json, print_table
+
+def deep_sizeof(obj, seen=None):
+    """Approximate retained size of plain containers (dict/list/str/...)."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(x, seen) for x in obj)
+    return size
+
+def process_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class SessionStoreProbe:
+    """Measures the in-process SessionManager (only available when running in-process)."""
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    def snapshot(self):
+        store = self.sessions.sessions
+        items = list(store.items())
+        sample = items[:200]
+        per_session = (deep_sizeof(dict(sample)) / len(sample)) if sample else 0
+        return {"sessions": len(items), "store_bytes_est": int(per_session * len(items)),
+                "process_rss_bytes": process_rss_bytes()}
+
+class Stats:
+    def __init__(self):
+        self.request_latencies = {"predict_symptoms": [], "predict_answer": []}
+        self.conversation_latencies = []  # service time only (sum of request latencies)
+        self.conversation_walls = []      # including think time
+        self.errors = Counter()
+        self.completed = 0
+        self.failed = 0
+        self.session_ids = set()
+        self.session_id_collisions = 0  # two live conversations handed the same session id
+
+async def conversation(client, cid, text, vocab, args, rng, stats):
+    t_start = time.perf_counter()
+    service_time = 0.0
+
+    async def call(kind, **kwargs):
+        nonlocal service_time
+        path = "/predict/symptoms" if kind == "predict_symptoms" else "/predict/answer"
+        t0 = time.perf_counter()
+        try:
+            # one simulated patient per conversation, as the backend forwards for real users
+            resp = await client.post(path, headers={"X-User-Id": f"load-{cid}"}, **kwargs)
+        except Exception as e:
+            stats.errors[f"{kind}:{type(e).__name__}"] += 1
+            return None
+        dt = time.perf_counter() - t0
+        service_time += dt
+        stats.request_latencies[kind].append(dt)
+        if resp.status_code != 200:
+            stats.errors[f"{kind}:http_{resp.status_code}"] += 1
+            return None
+        body = resp.json()
+        if not body.get("success"):
+            stats.errors[f"{kind}:{body.get('error', 'unknown')}"] += 1
+            return None
+        return body.get("data", {})
+
+    async def think():
+        await asyncio.sleep(rng.lognormvariate(args.think_mu, args.think_sigma) * args.time_scale)
+
+    data = await call("predict_symptoms", json={"text": text, "user_id": f"load-{cid}"})
+    if data is None:
+        stats.failed += 1
+        return
+    sid = data["session_id"]
+    if sid in stats.session_ids:
+        stats.session_id_collisions += 1
+    stats.session_ids.add(sid)
+    questions = list(data.get("next_questions") or [])
+    asked = set(data.get("extracted_symptoms") or [])
+
+    for _ in range(rng.randint(args.min_turns, args.max_turns)):
+        await think()
+        while questions and questions[0] in asked:
+            questions.pop(0)
+        symptom = questions.pop(0) if questions else rng.choice(vocab)
+        asked.add(symptom)
+        answer = rng.random() < args.yes_rate
+        data = await call("predict_answer", data={"session_id": sid, "symptom": symptom,
+                                                  "answer": "true" if answer else "false"})
+        if data is None:
+            stats.failed += 1
+            return
+        questions = list(data.get("next_questions") or questions)
+
+    stats.completed += 1
+    stats.conversation_latencies.append(service_time)
+    stats.conversation_walls.append(time.perf_counter() - t_start)
+
+async def run(args):
+    rng = random.Random(args.seed)
+    probe = None
+    if args.url:
+        import httpx
+        client = httpx.AsyncClient(base_url=args.url, timeout=60,
+                                   limits=httpx.Limits(max_connections=args.max_connections))
+        vocab = load_vocabulary()
+    else:
+        import main
+        client = asgi_client(main.app, timeout=60)
+        # Answer with symptoms the served model actually knows about
+        vocab = main.engine.get().symptom_cols or load_vocabulary()
+        probe = SessionStoreProbe(main.sessions)
+
+    texts = synthetic_triage_texts(args.conversations, load_vocabulary(), rng)
+    stats = Stats()
+    before = probe.snapshot() if probe else None
+
+    async def delayed(cid):
+        await asyncio.sleep(rng.uniform(0, args.ramp))
+        await conversation(client, cid, texts[cid], vocab, args, random.Random(args.seed + cid), stats)
+
+    t0 = time.perf_counter()
+    async with client:
+        await asyncio.gather(*(delayed(i) for i in range(args.conversations)))
+    wall = time.perf_counter() - t0
+    after = probe.snapshot() if probe else None
+
+    total_requests = sum(len(v) for v in stats.request_latencies.values())
+    report = {
+        "mode": "http" if args.url else "in-process",
+        "conversations": args.conversations,
+        "completed": stats.completed,
+        "failed": stats.failed,
+        "error_rate": stats.failed / max(1, args.conversations),
+        "errors": dict(stats.errors),
+        "session_id_collisions": stats.session_id_collisions,
+        "wall_seconds": wall,
+        "requests_per_second": total_requests / wall if wall else 0,
+        "conversation_service_time": summarize(stats.conversation_latencies),
+        "conversation_wall_time": summarize(stats.conversation_walls),
+        "requests": {k: summarize(v, wall) for k, v in stats.request_latencies.items()},
+    }
+    if probe:
+        report["session_store"] = {
+            "before": before,
+            "after": after,
+            "growth_bytes_est": after["store_bytes_est"] - before["store_bytes_est"],
+            "bytes_per_session_est": (after["store_bytes_est"] - before["store_bytes_est"]) /
+                                     max(1, after["sessions"] - before["sessions"]),
+        }
+    return report
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Concurrent triage conversation load generator")
+    parser.add_argument("--url", default=None, help="base URL of a running service; in-process if omitted")
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--min-turns", type=int, default=3, help="follow-up answers per conversation (AIConfig minQuestions)")
+    parser.add_argument("--max-turns", type=int, default=10, help="AIConfig maxQuestions")
+    parser.add_argument("--yes-rate", type=float, default=0.4, help="probability a patient answers yes")
+    # Think time is lognormal: median exp(mu) seconds (~5s by default), long right tail
+    parser.add_argument("--think-mu", type=float, default=1.6)
+    parser.add_argument("--think-sigma", type=float, default=0.7)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiply think times (e.g. 0.01 to compress)")
+    parser.add_argument("--ramp", type=float, default=5.0, help="spread conversation starts over this many seconds")
+    parser.add_argument("--max-connections", type=int, default=200, help="HTTP mode connection pool size")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "load_triage_sessions.json"))
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(f"mode={report['mode']} completed={report['completed']}/{report['conversations']} "
+          f"error_rate={report['error_rate']:.2%} wall={report['wall_seconds']:.1f}s rps={report['requests_per_second']:.1f}")
+    if report["errors"]:
+        print("errors:", report["errors"])
+    if report["session_id_collisions"]:
+        print(f"WARNING: {report['session_id_collisions']} conversations shared a session id")
+    print_table({"conversation(service)": report["conversation_service_time"],
+                 "conversation(wall)": report["conversation_wall_time"], **report["requests"]})
+    if "session_store" in report:
+        s = report["session_store"]
+        print(f"session store: {s['before']['sessions']} -> {s['after']['sessions']} sessions, "
+              f"~{s['growth_bytes_est'] / 1024:.0f} KiB growth ({s['bytes_per_session_est']:.0f} B/session), "
+              f"RSS {s['before']['process_rss_bytes']} -> {s['after']['process_rss_bytes']}")
+    write_json(args.output, report)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main_cli()
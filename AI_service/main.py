@@ -5,35 +5,45 @@
 import os
 import time
 import json
+import uuid
 import joblib
 import uvicorn
 import traceback
-from typing import List, Dict, Optional
-from fastapi import FastAPI, UploadFile, File, Form
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Generic, List, Dict, Optional, TypeVar, Union
+from fastapi import FastAPI, UploadFile, File, Form, Query, HTTPException, BackgroundTasks, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import numpy as np
 
-# Optional heavy imports guarded for environments without GPU / heavy libs
-try:
-    from PIL import Image
-except Exception:
-    Image = None
-
-try:
-    import torch
-    from torchvision import transforms
-except Exception:
-    torch = None
-
-# Optional Tesseract (report OCR)
-try:
-    import pytesseract
-    import cv2
-except Exception:
-    pytesseract = None
-    cv2 = None
+from modules import metrics
+from modules.metrics import span, SESSIONS, CACHE, ERRORS, FUZZY
+from modules import profiling
+from modules.admission import AdmissionMiddleware, default_classes
+from modules.deadline import DeadlineMiddleware, current_deadline
+from modules.responses import FastResponse, NegotiatedRoute, dumps_json, dumps_msgpack, loads_msgpack
+from modules.report_pipeline import load_ocr_backend, ocr_report, analyze_report_text
+from modules.recorder import TrafficRecorder
+from modules.pill_model import PillModel
+from modules.image_workers import ImageWorkerPool
+from modules.jobs import JobStore, JobRunner
+from modules.lab_store import LabStore, findings_of
+from modules.shadow import ShadowEvaluator
+from modules.red_flags import RedFlagScanner, normalize_key
+from modules.session_journal import SessionJournal
+from modules.fuzzy_index import FuzzyIndex, vocabulary_phrases, parse_max_edits, DEFAULT_MAX_EDITS
+from modules.knowledge_bundle import KnowledgeBundle, match_terms
+from modules.text_pipeline import TextHead, TextPipeline, head_from_artifact
+
+# Heavy optional dependencies stay out of this module: torch / torchvision are imported by
+# modules/pill_model.py and cv2 / pytesseract by modules/report_pipeline.py on first use,
+# normally inside the image worker processes (modules/image_workers.py).
 
 # ----------------------------
 # Config and paths
@@ -44,6 +54,97 @@ MODEL_PATH = os.path.join(BASE_DIR, "models")
 os.makedirs(KNOW_PATH, exist_ok=True)
 os.makedirs(MODEL_PATH, exist_ok=True)
 
+# Precompiled knowledge (training_scripts/build_knowledge_bundle.py). The JSON files in
+# knowledge/ are read instead when it is missing, invalid or older than them; "" disables it.
+KNOWLEDGE_BUNDLE = os.environ.get("MEDICORE_KNOWLEDGE_BUNDLE", os.path.join(KNOW_PATH, "knowledge.bundle"))
+
+# Load models in a background thread once the server is up (set to 0 to load on first request)
+WARMUP = os.environ.get("MEDICORE_WARMUP", "1") == "1"
+
+# On-demand profiling (see modules/profiling.py). Off by default; when on, requests with
+# an `X-Profile: 1` header or picked at MEDICORE_PROFILE_SAMPLE_RATE are profiled.
+PROFILING = os.environ.get("MEDICORE_PROFILING", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("MEDICORE_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.environ.get("MEDICORE_PROFILE_MODE", "cprofile")  # or "pyinstrument"
+PROFILE_KEEP = int(os.environ.get("MEDICORE_PROFILE_KEEP", "50"))
+
+# Shadow evaluation: score a sampled fraction of triage traffic with a candidate model
+# artifact in the background (see modules/shadow.py and /admin/shadow)
+SHADOW_MODEL = os.environ.get("MEDICORE_SHADOW_MODEL")
+SHADOW_SAMPLE_RATE = float(os.environ.get("MEDICORE_SHADOW_SAMPLE_RATE", "0.1"))
+
+# Admission control (see modules/admission.py): shared pool of request slots, per-class
+# limits for the expensive uploads, and a per-client token bucket (rate 0 disables it).
+# Clients are identified by the X-User-Id header the backend forwards, else the peer address;
+# the header is only believed from MEDICORE_TRUSTED_PROXIES (the backend's addresses).
+ADMISSION = os.environ.get("MEDICORE_ADMISSION", "1") == "1"
+ADMISSION_POOL = int(os.environ.get("MEDICORE_ADMISSION_POOL", "32"))
+OCR_CONCURRENCY = int(os.environ.get("MEDICORE_OCR_CONCURRENCY", "2"))
+PILL_CONCURRENCY = int(os.environ.get("MEDICORE_PILL_CONCURRENCY", "2"))
+RATE_LIMIT = float(os.environ.get("MEDICORE_RATE_LIMIT", "10"))  # tokens/s per client
+RATE_BURST = float(os.environ.get("MEDICORE_RATE_BURST", "40"))
+TRUSTED_PROXIES = [a.strip() for a in os.environ.get("MEDICORE_TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if a.strip()]
+
+# Pill identification and report OCR run in this many sidecar processes per API process
+# (see modules/image_workers.py), so torch / cv2 / Tesseract stay out of the API workers;
+# 0 runs them in the API process. Tasks that take longer than the timeout are killed.
+IMAGE_WORKERS = int(os.environ.get("MEDICORE_IMAGE_WORKERS", "2"))
+IMAGE_TASK_TIMEOUT = float(os.environ.get("MEDICORE_IMAGE_TASK_TIMEOUT", "120"))
+
+# Request deadlines (see modules/deadline.py): budgets of the image endpoints when the caller
+# sends no X-Request-Timeout-Ms header, and the most a header may ask for. Work the deadline
+# cuts short is dropped and the response is marked partial.
+REPORT_DEADLINE_MS = float(os.environ.get("MEDICORE_REPORT_DEADLINE_MS", "60000"))
+PILL_DEADLINE_MS = float(os.environ.get("MEDICORE_PILL_DEADLINE_MS", "20000"))
+MAX_DEADLINE_MS = float(os.environ.get("MEDICORE_MAX_DEADLINE_MS", "300000"))
+
+# Bulk report jobs (see modules/jobs.py): SQLite queue + process pool (default one worker
+# per CPU). Server-side paths may only be submitted from under MEDICORE_JOB_PATH_ROOT.
+JOBS_DB = os.environ.get("MEDICORE_JOBS_DB", os.path.join(BASE_DIR, "data", "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("MEDICORE_JOB_WORKERS", "0")) or None
+# Whether this process runs the dispatcher and its pool; with it off, jobs are still accepted
+# and served from the queue and another process runs them (prefork.py elects one worker)
+JOB_DISPATCHER = os.environ.get("MEDICORE_JOB_DISPATCHER", "1") == "1"
+JOB_PATH_ROOT = os.environ.get("MEDICORE_JOB_PATH_ROOT")
+
+# Lab values of reports analysed with a patient_id are kept here for /labs/{patient_id}/trends
+# (see modules/lab_store.py)
+LABS_DB = os.environ.get("MEDICORE_LABS_DB", os.path.join(BASE_DIR, "data", "labs.sqlite3"))
+
+# Triage over WebSocket (/ws/triage): open conversations allowed at once, and seconds
+# without a message before the server closes the connection
+WS_MAX_CONNECTIONS = int(os.environ.get("MEDICORE_WS_MAX_CONNECTIONS", "1000"))
+WS_IDLE_TIMEOUT = float(os.environ.get("MEDICORE_WS_IDLE_TIMEOUT", "300"))
+
+# Regression corpus (see modules/recorder.py and training_scripts/replay_corpus.py): anonymized
+# triage / answer / report records are appended under this directory (unset = not recorded)
+RECORD_DIR = os.environ.get("MEDICORE_RECORD_DIR")
+RECORD_SAMPLE_RATE = float(os.environ.get("MEDICORE_RECORD_SAMPLE_RATE", "1.0"))
+
+# Durable sessions: journal directory (unset = sessions live in memory only). One process
+# per directory; prefork.py gives each worker its own subdirectory.
+SESSION_JOURNAL_DIR = os.environ.get("MEDICORE_SESSION_JOURNAL_DIR")
+
+# Symptom model versions published by training_scripts/update_from_overrides.py: the engine
+# serves the one current.json names (nothing published = knowledge/medicore_model_v4.pkl),
+# and POST /admin/model/reload swaps in a newly published one without a restart
+MODEL_VERSIONS_DIR = os.environ.get("MEDICORE_MODEL_VERSIONS_DIR", os.path.join(BASE_DIR, "data", "model_versions"))
+# Seconds between checks of current.json; when it changes the process swaps in the model it
+# names, so every prefork worker follows a publish or a reload (0 = off; prefork.py sets 5)
+MODEL_WATCH_SECONDS = float(os.environ.get("MEDICORE_MODEL_WATCH_SECONDS", "0"))
+# Share of MODEL_PROBES whose top disease a reloaded model must keep (0 = only check that it scores)
+MODEL_PROBE_AGREEMENT = float(os.environ.get("MEDICORE_MODEL_PROBE_AGREEMENT", "0.5"))
+
+# Specialty routing model (training_scripts/train_specialty_classifier.py): scored on the
+# complaint in the same text pipeline pass as triage (modules/text_pipeline.py), so triage
+# responses carry a recommended_specialty for booking. Missing file or "" = no recommendation.
+SPECIALTY_MODEL = os.environ.get("MEDICORE_SPECIALTY_MODEL", os.path.join(KNOW_PATH, "specialty_model.pkl"))
+
+# Typo-tolerant extraction (see modules/fuzzy_index.py): per-request time budget
+# (0 disables it) and allowed edits by word length, e.g. "4:1,7:2"
+FUZZY_BUDGET_MS = float(os.environ.get("MEDICORE_FUZZY_BUDGET_MS", "2"))
+FUZZY_MAX_EDITS = parse_max_edits(os.environ.get("MEDICORE_FUZZY_MAX_EDITS", "")) or DEFAULT_MAX_EDITS
+
 # ----------------------------
 # Utilities
 # ----------------------------
@@ -59,6 +160,85 @@ def safe_read_csv(p):
         return pd.read_csv(p)
     return None
 
+class LazyComponent:
+    """Builds a component on first use (or during warm-up) and tracks its load state for /ready.
+
+    Async handlers use aget(): a component that isn't loaded yet is loaded, or waited for, on
+    the threadpool instead of the event loop. A failed load is retried after a backoff
+    (1 s, doubling up to retry_max); until then get() raises without calling the factory.
+    """
+    retry_base = 1.0
+    retry_max = 60.0
+
+    def __init__(self, name, factory, required=True, check=None):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.check = check  # optional fn(value) -> bool, e.g. "model file was found"
+        self.state = "not_loaded"  # not_loaded -> loading -> ready | failed
+        self.error = None
+        self.load_seconds = None
+        self.failures = 0
+        self._retry_at = 0.0
+        self._value = None
+        self._lock = threading.Lock()
+
+    def _raise_if_backing_off(self):
+        if self.state == "failed" and time.monotonic() < self._retry_at:
+            raise RuntimeError(f"{self.name} failed to load ({self.error}); "
+                               f"retrying in {self._retry_at - time.monotonic():.1f}s")
+
+    def get(self):
+        value = self._value
+        if value is not None:
+            return value
+        self._raise_if_backing_off()
+        with self._lock:
+            if self._value is None:
+                self._raise_if_backing_off()  # failed while we waited for the lock
+                self.state = "loading"
+                t0 = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                    self.state = "ready"
+                    self.error = None
+                    self.failures = 0
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    self.failures += 1
+                    self._retry_at = time.monotonic() + min(self.retry_base * 2 ** (self.failures - 1), self.retry_max)
+                    raise
+                finally:
+                    self.load_seconds = time.perf_counter() - t0
+        return self._value
+
+    async def aget(self):
+        """get() for async code: never blocks the event loop on a load."""
+        value = self._value
+        if value is not None:
+            return value
+        self._raise_if_backing_off()
+        return await run_in_threadpool(self.get)
+
+    def replace(self, value):
+        """Swap in a new value (e.g. a reloaded model); callers already holding the old one finish with it."""
+        with self._lock:
+            self._value = value
+            self.state = "ready"
+            self.error = None
+            self.failures = 0
+
+    def status(self):
+        out = {"state": self.state, "required": self.required, "load_seconds": self.load_seconds}
+        if self.error:
+            out["error"] = self.error
+        if self.state == "failed":
+            out["retry_in"] = round(max(self._retry_at - time.monotonic(), 0.0), 1)
+        if self.state == "ready" and self.check:
+            out["available"] = bool(self.check(self._value))
+        return out
+
 # ----------------------------
 # InferenceEngine (Pickle Model)
 # ----------------------------
@@ -66,19 +246,61 @@ class InferenceEngine:
     """
     Inference engine using trained Scikit-learn model (medicore_model_v4.pkl)
     """
-    def __init__(self, model_path=None, synonyms_path=None, medicine_rules=None, red_flags=None, symptom_list=None):
+    def __init__(self, model_path=None, synonyms_path=None, medicine_rules=None, red_flags=None, symptom_list=None, cache_size=4096, metrics_prefix="", red_flag_scanner=None, question_strategy="information_gain", fuzzy_budget_ms=FUZZY_BUDGET_MS, fuzzy_max_edits=FUZZY_MAX_EDITS, knowledge=None, specialty_model=None):
         self.model_path = model_path or os.path.join(KNOW_PATH, "medicore_model_v4.pkl")
         self.synonyms_path = synonyms_path or os.path.join(KNOW_PATH, "synonyms.json")
-        self.medicine_rules = safe_load_json(medicine_rules or os.path.join(KNOW_PATH, "medicine_rules.json"))
-        self.red_flags = safe_load_json(red_flags or os.path.join(KNOW_PATH, "red_flags.json"))
-        self.synonyms = safe_load_json(self.synonyms_path)
-        self.symptom_list = safe_load_json(symptom_list or os.path.join(KNOW_PATH, "symptom_list.json"))
+        # A KnowledgeBundle replaces the JSON files with its precompiled tables
+        self.knowledge = knowledge
+        if knowledge is not None:
+            self.medicine_rules = knowledge.medicine_rules
+            self.red_flag_scanner = red_flag_scanner or RedFlagScanner(knowledge.red_flags)
+            self.synonyms = knowledge.synonyms
+            self.symptom_list = knowledge.symptom_list
+            self.match_terms = knowledge.match_terms
+            phrases = knowledge.fuzzy_phrases
+        else:
+            self.medicine_rules = safe_load_json(medicine_rules or os.path.join(KNOW_PATH, "medicine_rules.json"))
+            # Share the service's scanner when given one so red_flags.json is parsed once
+            self.red_flag_scanner = red_flag_scanner or RedFlagScanner.from_file(red_flags or os.path.join(KNOW_PATH, "red_flags.json"))
+            self.synonyms = safe_load_json(self.synonyms_path)
+            self.symptom_list = safe_load_json(symptom_list or os.path.join(KNOW_PATH, "symptom_list.json"))
+            vocab = self.symptom_list if isinstance(self.symptom_list, list) else []
+            # (term, symptom) pairs normalize_text looks for, built once instead of per request
+            self.match_terms = match_terms(vocab, self.synonyms)
+            phrases = vocabulary_phrases(vocab, self.synonyms) if fuzzy_budget_ms else None
+        self.red_flags = self.red_flag_scanner.red_flags
+        # Fallback for misspellings the exact matching below misses
+        self.fuzzy_budget_ms = fuzzy_budget_ms
+        self.fuzzy_index = None
+        if fuzzy_budget_ms:
+            self.fuzzy_index = FuzzyIndex(phrases, max_edits=fuzzy_max_edits)
         
         self.model = None
         self.vectorizer = None
         self.label_encoder = None
+        self.metadata = {}
         self._load_model()
+        self.vect, self.clf = self._split_model()
         self.symptom_cols = self.get_all_symptoms() # For normalization compatibility
+        self.class_index = {c: i for i, c in enumerate(getattr(self.clf, 'classes_', []))}
+        self.feature_index = {f: i for i, f in enumerate(self.symptom_cols)}
+        self.question_strategy = question_strategy  # "information_gain" or "coefficient" (legacy)
+        # Answers can update class logits in place instead of re-vectorizing (see new_state)
+        self.incremental = self._supports_incremental()
+        self._analyzer = self.vect.build_analyzer() if self.incremental else None
+
+        # Stage/cache metric labels get this prefix (e.g. "shadow:" for a candidate engine)
+        self.metrics_prefix = metrics_prefix
+
+        # Triage and specialty heads on one tokenization per input (see _build_pipeline)
+        self.specialty_path = specialty_model
+        self.specialty = self._load_specialty(specialty_model)
+        self.pipeline = self._build_pipeline()
+
+        # LRU of class probabilities keyed by the text the model actually sees
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
 
     def _load_model(self):
         try:
@@ -94,6 +316,7 @@ class InferenceEngine:
                     self.model = data.get('model') or data.get('classifier')
                     self.vectorizer = data.get('vectorizer')
                     self.label_encoder = data.get('label_encoder')
+                    self.metadata = data.get('metadata') or {}
                     print(f"Loaded dict model with keys: {data.keys()}")
                 else:
                     self.model = data
@@ -105,89 +328,221 @@ class InferenceEngine:
             print(f"Error loading model: {e}")
             traceback.print_exc()
 
+    def _split_model(self):
+        """(vectorizer, classifier) for both artifact layouts, so the two stages can run separately."""
+        if self.model is not None and hasattr(self.model, 'steps'):
+            steps = self.model.steps
+            vect = steps[0][1] if len(steps) == 2 else self.model[:-1]
+            return vect, steps[-1][1]
+        if self.vectorizer is not None and self.model is not None:
+            return self.vectorizer, self.model
+        return None, self.model
+
+    def _load_specialty(self, path):
+        """Specialty routing head from a train_specialty_classifier.py artifact, or None."""
+        if not path:
+            return None
+        if not os.path.exists(path):
+            print(f"Specialty model not found at {path}")
+            return None
+        try:
+            head = head_from_artifact("specialty", joblib.load(path), source="text")
+            if head is None:
+                print(f"Specialty model at {path} is not a (vectorizer, classifier) artifact")
+            return head
+        except Exception as e:
+            print(f"Error loading specialty model: {e}")
+            traceback.print_exc()
+            return None
+
+    def _build_pipeline(self):
+        """TextPipeline of the triage head (reads the extracted symptoms) and the specialty head (the complaint)."""
+        heads = []
+        if self.vect is not None and hasattr(self.clf, 'predict_proba'):
+            # label "": keeps the triage stages named vectorize / predict_proba
+            heads.append(TextHead("triage", self.vect, self.clf, source="symptoms", label=""))
+        if self.specialty is not None:
+            heads.append(self.specialty)
+        return TextPipeline(heads, metrics_prefix=self.metrics_prefix)
+
     def get_all_symptoms(self):
-        if self.vectorizer and hasattr(self.vectorizer, 'get_feature_names_out'):
-            return list(self.vectorizer.get_feature_names_out())
+        if self.knowledge is not None and self.vect is not None:
+            names = self.knowledge.features_for(self.model_path, self.vect)
+            if names is not None:
+                return names
+        if self.vect is not None and hasattr(self.vect, 'get_feature_names_out'):
+            return list(self.vect.get_feature_names_out())
         return []
 
     def normalize_text(self, text: str) -> List[str]:
         # Improved Extraction using strictly controlled vocabulary i.e. symptom_list
         if not text: return []
-        text_low = text.lower()
-        found = set()
-        
-        # 1. Check strict symptom list (primary source of truth)
-        if isinstance(self.symptom_list, list):
-            for s in self.symptom_list:
-                # Symptom in list: "stiff_neck", Text: "I have a stiff neck"
-                # Check with spaces
-                readable = s.replace("_", " ")
-                if readable in text_low or s in text_low:
-                    found.add(s)
-
-        # 2. Keyword matching from Synonyms (legacy/fallback)
-        for canon, variants in self.synonyms.items():
-            for v in variants + [canon]:
-                if v in text_low:
-                    found.add(canon)
-        
-        return list(found)
+        with span(self.metrics_prefix + "normalize_text"):
+            text_low = text.lower()
+            found = set()
+
+            # 1-2. Strict symptom list (primary source of truth; "stiff_neck" also matches
+            # "stiff neck") and synonym keywords, precompiled into (term, symptom) pairs
+            for term, symptom in self.match_terms:
+                if term in text_low:
+                    found.add(symptom)
+
+            # 3. Typo-tolerant matching on whatever the exact passes couldn't explain
+            if self.fuzzy_index is not None:
+                with span(self.metrics_prefix + "fuzzy_match"):
+                    matches, exhausted = self.fuzzy_index.match(text_low, self.fuzzy_budget_ms / 1000)
+                for m in matches:
+                    if m["symptom"] not in found:
+                        found.add(m["symptom"])
+                        FUZZY.inc("match")
+                if exhausted:
+                    FUZZY.inc("budget_exceeded")
+
+            return list(found)
 
     def start_session(self, text: str, confirmed_symptoms: Optional[List[str]] = None):
         extracted = self.normalize_text(text)
         if confirmed_symptoms:
             extracted = list(set(extracted + confirmed_symptoms))
-            
-        results = self.predict(extracted)
+
+        # one pipeline pass for every head; the triage result is cached for explain / next_questions
+        scores = self.route(text, extracted)
+        results = self.rank_classes(scores["triage"]["probs"]) if "triage" in scores else self.predict(extracted)
         top_disease = results[0]['disease'] if results else "Unknown"
         confidence = results[0]['confidence'] if results else 0.0
         
         # Next question logic - dynamic based on model coefficients
-        next_questions = []
-        try:
-            # Check if we have a pipeline with a linear classifier
-            if self.model and hasattr(self.model, 'named_steps') and 'clf' in self.model.named_steps:
-                clf = self.model.named_steps['clf']
-                vect = self.model.named_steps['vect']
-                
-                # Get index of top disease
-                classes = list(clf.classes_)
-                if top_disease in classes:
-                    class_idx = classes.index(top_disease)
-                    
-                    # Get coefficients for this class
-                    if hasattr(clf, 'coef_'):
-                        # shape (n_classes, n_features) or (1, n_features) for binary
-                        coefs = clf.coef_[class_idx] if clf.coef_.shape[0] > 1 else clf.coef_[0]
-                        feature_names = vect.get_feature_names_out()
-                        
-                        # Pair feature with coef
-                        feat_imp = zip(feature_names, coefs)
-                        # Sort by importance (descending)
-                        sorted_feats = sorted(feat_imp, key=lambda x: x[1], reverse=True)
-                        
-                        # Find top features not yet confirmed/extracted
-                        for feat, score in sorted_feats:
-                            if feat not in extracted and score > 0:
-                                next_questions.append(feat)
-                                if len(next_questions) >= 20: break
-        except Exception as e:
-            print(f"Error generating next questions: {e}")
+        next_questions = self.next_questions(extracted)
 
         meds = self.medicine_rules.get(top_disease, {})
-        red_alerts = [self.red_flags[s] for s in extracted if s in self.red_flags]
+        red_alerts = [a["action"] for a in self.red_flag_scanner.check(extracted)]
 
-        return {
+        result = {
             "extracted_symptoms": extracted,
             "posterior": [], # Not used in pickle model
             "candidates": [r['disease'] for r in results],
             "next_questions": next_questions,
-            "explainability": {},
+            "explainability": self.explain(extracted, [r['disease'] for r in results]),
             "red_flags": red_alerts,
             "top_disease": top_disease,
             "medicines_and_advice": meds,
             "asked": []
         }
+        specialty = self.recommend_specialty(scores.get("specialty"))
+        if specialty:
+            result["recommended_specialty"] = specialty
+        return result
+
+    def route(self, text: str, symptoms: List[str]) -> Dict[str, Dict]:
+        """{head: {X, probs}} of one triage request, all heads in one pipeline pass ({} on error).
+
+        "triage" is the prediction cache entry (see _score): on a hit only the heads
+        reading the complaint run.
+        """
+        if not self.model or not hasattr(self.clf, 'predict_proba'):
+            return {}
+        confirmed_text = " ".join(symptoms)
+        try:
+            entry = self._cached(confirmed_text)
+            heads = [name for name, h in self.pipeline.heads.items() if h.source == "text"]
+            if entry is None and "triage" in self.pipeline.heads:
+                heads.append("triage")
+            scores = self.pipeline.run({"text": text, "symptoms": confirmed_text}, heads)
+            scores["triage"] = entry if entry is not None else self._compute(confirmed_text, scores.get("triage"))
+            return scores
+        except Exception as e:
+            print(f"Prediction error: {e}")
+            traceback.print_exc()
+            return {}
+
+    def recommend_specialty(self, result: Optional[Dict]) -> Optional[Dict]:
+        """{specialty, confidence} from the specialty head; None when no word of the complaint is in its vocabulary."""
+        if result is None or not result["X"].nnz:
+            return None
+        probs = result["probs"]
+        i = int(np.argmax(probs))
+        return {"specialty": str(self.specialty.classes[i]), "confidence": float(probs[i])}
+
+    def next_questions(self, symptoms: List[str], asked: Optional[List[str]] = None, n=20, strategy=None, probs=None):
+        """Symptoms to ask about next, most useful first. Never repeats known or asked symptoms.
+
+        `probs` are the current class probabilities when the caller already has them.
+        """
+        clf = self.clf
+        if self.vect is None or not hasattr(clf, 'coef_'):
+            return []
+        strategy = strategy or self.question_strategy
+        exclude = set(symptoms) | set(asked or [])
+        try:
+            with span(self.metrics_prefix + "next_questions"):
+                if strategy == "information_gain":
+                    questions = self._rank_by_information_gain(symptoms, exclude, n, probs=probs)
+                    if questions:
+                        return questions
+                return self._rank_by_coefficient(symptoms, exclude, n)
+        except Exception as e:
+            print(f"Error generating next questions: {e}")
+            return []
+
+    def _rank_by_coefficient(self, symptoms, exclude, n):
+        """Legacy heuristic: largest positive coefficients of the current top disease."""
+        clf = self.clf
+        results = self.predict(symptoms)
+        top_disease = results[0]['disease'] if results else "Unknown"
+        if top_disease not in self.class_index:
+            return []
+        # shape (n_classes, n_features) or (1, n_features) for binary
+        coefs = clf.coef_[self.class_index[top_disease]] if clf.coef_.shape[0] > 1 else clf.coef_[0]
+        questions = []
+        for j in np.argsort(-coefs):
+            if coefs[j] <= 0:
+                break
+            feat = self.symptom_cols[j]
+            if feat not in exclude:
+                questions.append(feat)
+                if len(questions) >= n: break
+        return questions
+
+    def _rank_by_information_gain(self, symptoms, exclude, n, n_candidates=10, base_rate=0.1, probs=None):
+        """Expected entropy reduction over the leading candidates for every unasked symptom at once.
+
+        P(yes | disease c) for symptom j is modelled as sigmoid(w_cj + logit(base_rate)), so
+        symptoms the model weights positively for c are likely to be present in c. For the
+        K candidates and J unasked symptoms everything below is a K x J array operation.
+        """
+        coef = self.clf.coef_
+        if coef.shape[0] < 3:
+            return []
+        if probs is None:
+            probs = self._predict_proba(" ".join(symptoms))
+        cand = np.argsort(-probs)[:n_candidates]
+        p = probs[cand] / probs[cand].sum()
+
+        mask = np.ones(coef.shape[1], dtype=bool)
+        for s in exclude:
+            j = self.feature_index.get(s)
+            if j is not None:
+                mask[j] = False
+        cols = np.flatnonzero(mask)
+        if len(cols) == 0:
+            return []
+
+        W = coef[np.ix_(cand, cols)]                                  # (K, J)
+        L = 1.0 / (1.0 + np.exp(-(W + np.log(base_rate / (1 - base_rate)))))  # P(yes | c)
+        joint_yes = p[:, None] * L
+        joint_no = p[:, None] - joint_yes
+        p_yes = joint_yes.sum(axis=0)                                 # (J,)
+        p_no = 1.0 - p_yes
+
+        def entropy(joint, marginal):
+            post = joint / np.maximum(marginal, 1e-12)
+            return -(post * np.log(np.maximum(post, 1e-12))).sum(axis=0)
+
+        h_prior = -(p * np.log(np.maximum(p, 1e-12))).sum()
+        gain = h_prior - (p_yes * entropy(joint_yes, p_yes) + p_no * entropy(joint_no, p_no))
+
+        order = np.argsort(-gain)[:n]
+        return [self.symptom_cols[cols[j]] for j in order if gain[j] > 1e-9]
 
     def predict(self, symptoms: List[str], top_k=3):
         if not self.model:
@@ -196,45 +551,173 @@ class InferenceEngine:
         confirmed_text = " ".join(symptoms)
         
         try:
-            # Case 1: Model is a Pipeline that handles text
-            if hasattr(self.model, 'predict_proba'):
-                try:
-                    # Some pipelines expect iterator
-                    probs = self.model.predict_proba([confirmed_text])[0]
-                except:
-                     # Fallback if vectorizer is needed manually
-                     if self.vectorizer:
-                         X = self.vectorizer.transform([confirmed_text])
-                         probs = self.model.predict_proba(X)[0]
-                     else:
-                         raise Exception("Model expects vectorizer but none found")
-                
-                classes = self.model.classes_
-            
-            # Case 2: Manual vectorization (dict)
-            elif self.vectorizer and self.model:
-                X = self.vectorizer.transform([confirmed_text])
-                probs = self.model.predict_proba(X)[0]
-                classes = self.model.classes_
-                
-            else:
+            if not hasattr(self.clf, 'predict_proba'):
                 return [{"disease": "Configuration Error", "confidence": 0.0}]
-
-            # Process results
-            results = []
-            for i, p in enumerate(probs):
-                if p > 0.01:
-                    disease_name = classes[i]
-                    results.append({"disease": disease_name, "confidence": float(p)})
-            
-            results.sort(key=lambda x: x['confidence'], reverse=True)
-            return results[:top_k]
+            probs = self._predict_proba(confirmed_text)
+            return self.rank_classes(probs, top_k)
 
         except Exception as e:
             print(f"Prediction error: {e}")
             traceback.print_exc()
             return []
 
+    def rank_classes(self, probs, top_k=3):
+        """[{disease, confidence}] for the top_k classes above 1%, most likely first."""
+        classes = self.clf.classes_
+        results = []
+        for i, p in enumerate(probs):
+            if p > 0.01:
+                disease_name = classes[i]
+                results.append({"disease": disease_name, "confidence": float(p)})
+
+        results.sort(key=lambda x: x['confidence'], reverse=True)
+        return results[:top_k]
+
+    def explain(self, symptoms: List[str], diseases: List[str], max_features=10, row=None):
+        """Contribution of each present feature to each disease's logit (coefficient x value).
+
+        Only the non-zero columns of the sparse input row are touched, so this is one
+        small (k x nnz) product. Results are cached with the prediction, except when the
+        caller passes the row itself as (columns, values) (see state_row).
+        """
+        clf = self.clf
+        if self.vect is None or not hasattr(clf, 'coef_') or not diseases:
+            return {}
+        try:
+            if row is not None:
+                with span(self.metrics_prefix + "explain"):
+                    return self._explain_row(row[0], row[1], diseases, max_features)
+            entry = self._score(" ".join(symptoms))
+            key = (tuple(diseases), max_features)
+            cached = entry["explain"].get(key)
+            if cached is not None:
+                CACHE.inc(self.metrics_prefix + "explain", "hit")
+                return cached
+            CACHE.inc(self.metrics_prefix + "explain", "miss")
+
+            with span(self.metrics_prefix + "explain"):
+                X = entry["X"]
+                explanation = self._explain_row(X.indices, X.data, diseases, max_features)  # 1 x n_features CSR row
+            entry["explain"][key] = explanation
+            return explanation
+        except Exception as e:
+            print(f"Error computing explainability: {e}")
+            return {}
+
+    def _explain_row(self, cols, vals, diseases, max_features):
+        clf = self.clf
+        rows = [self.class_index[d] for d in diseases if d in self.class_index]
+        coef = clf.coef_
+        if coef.shape[0] == 1:
+            # binary model: class 1 uses +w, class 0 the mirror image
+            W = np.vstack([-coef[0, cols], coef[0, cols]])[rows]
+        else:
+            W = coef[np.ix_(rows, cols)]
+        contrib = W * vals  # (k, nnz)
+        intercepts = np.atleast_1d(clf.intercept_)
+
+        explanation = {}
+        for r, class_idx in enumerate(rows):
+            order = np.argsort(-np.abs(contrib[r]))[:max_features]
+            b = intercepts[class_idx] if len(intercepts) > 1 else (intercepts[0] if class_idx == 1 else -intercepts[0])
+            explanation[str(clf.classes_[class_idx])] = {
+                "intercept": float(b),
+                "contributions": [{"symptom": self.symptom_cols[cols[j]], "contribution": float(contrib[r, j])}
+                                  for j in order],
+            }
+        return explanation
+
+    # -- incremental scoring --------------------------------------------------
+    # With raw unigram counts feeding a logistic model, confirming a symptom only adds
+    # that symptom's token counts to the feature row, so the class logits move by the
+    # matching coefficient columns. A conversation keeps {counts, logits} and each
+    # answer costs a handful of column additions instead of vectorize + predict_proba.
+
+    def _supports_incremental(self):
+        from sklearn.feature_extraction.text import CountVectorizer
+        from sklearn.linear_model import LogisticRegression
+        vect, clf = self.vect, self.clf
+        if not (type(vect) is CountVectorizer and vect.analyzer == "word" and tuple(vect.ngram_range) == (1, 1)
+                and isinstance(clf, LogisticRegression) and hasattr(clf, "coef_")):
+            return False
+        try:
+            # Probabilities must be the softmax/sigmoid of the logits (not one-vs-rest)
+            X = vect.transform([" ".join(self.symptom_cols[:3])])
+            return bool(np.allclose(clf.predict_proba(X)[0], self._logits_to_proba(clf.decision_function(X)[0])))
+        except Exception:
+            return False
+
+    @staticmethod
+    def _logits_to_proba(z):
+        z = np.atleast_1d(z)
+        if z.shape[0] == 1:
+            p1 = 1.0 / (1.0 + np.exp(-z[0]))
+            return np.array([1.0 - p1, p1])
+        e = np.exp(z - z.max())
+        return e / e.sum()
+
+    def new_state(self, symptoms: List[str]) -> Dict:
+        """Score state {counts: column -> count, logits} for the symptoms so far."""
+        X = self._score(" ".join(symptoms))["X"]
+        logits = np.atleast_1d(self.clf.decision_function(X)[0]).astype(float)
+        return {"counts": dict(zip(X.indices.tolist(), X.data.tolist())), "logits": logits, "engine": self}
+
+    def add_symptom(self, state: Dict, symptom: str):
+        """Update a score state in place for one more confirmed symptom."""
+        vocab, counts, coef = self.vect.vocabulary_, state["counts"], self.clf.coef_
+        for token in self._analyzer(symptom):
+            j = vocab.get(token)
+            if j is None:
+                continue
+            old = counts.get(j, 0)
+            new = 1 if self.vect.binary else old + 1
+            if new != old:
+                state["logits"] += coef[:, j] * (new - old)
+                counts[j] = new
+
+    def state_proba(self, state: Dict):
+        return self._logits_to_proba(state["logits"])
+
+    def state_row(self, state: Dict):
+        """(columns, values) of the state's feature row, for explain()."""
+        cols = np.fromiter(state["counts"].keys(), dtype=np.int64, count=len(state["counts"]))
+        vals = np.fromiter(state["counts"].values(), dtype=float, count=len(state["counts"]))
+        return cols, vals
+
+    def _predict_proba(self, confirmed_text: str):
+        """Class probabilities for one request; the array is shared with the cache, don't modify it."""
+        return self._score(confirmed_text)["probs"]
+
+    def _score(self, confirmed_text: str):
+        """Cache entry {probs, X, explain} for the text the model sees, computed on a miss."""
+        entry = self._cached(confirmed_text)
+        return entry if entry is not None else self._compute(confirmed_text)
+
+    def _cached(self, confirmed_text: str):
+        with self._cache_lock:
+            entry = self._cache.get(confirmed_text)
+            if entry is not None:
+                self._cache.move_to_end(confirmed_text)
+        CACHE.inc(self.metrics_prefix + "prediction", "hit" if entry is not None else "miss")
+        return entry
+
+    def _compute(self, confirmed_text: str, scored: Optional[Dict] = None):
+        """Score the text (unless a pipeline pass already did: `scored`) and cache the entry."""
+        if scored is None:
+            if "triage" in self.pipeline.heads:
+                scored = self.pipeline.run({"symptoms": confirmed_text}, ["triage"])["triage"]
+            else:
+                # Bare classifier that handles raw text itself
+                with span(self.metrics_prefix + "predict_proba"):
+                    scored = {"X": [confirmed_text], "probs": self.clf.predict_proba([confirmed_text])[0]}
+
+        entry = {"probs": scored["probs"], "X": scored["X"], "explain": {}}
+        with self._cache_lock:
+            self._cache[confirmed_text] = entry
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return entry
+
     def handle_answer(self, current_posterior: List[float], symptom: str, answer: bool, asked_list: List[str]):
         # Since we are stateless/model-based, we just add the symptom if yes
         # If no, we might mark it as negative (logic depends on model training)
@@ -250,13 +733,18 @@ class InferenceEngine:
 # Session Manager
 # ----------------------------
 class SessionManager:
-    def __init__(self, ttl_seconds=1800):
+    def __init__(self, ttl_seconds=1800, journal: Optional[SessionJournal] = None):
         self.sessions = {}  # session_id -> {created, engine_state...}
         self.ttl = ttl_seconds
+        self.journal = journal
 
     def create(self, data):
-        sid = str(int(time.time()*1000))  # simple id
-        self.sessions[sid] = {"created": time.time(), "data": data}
+        sid = uuid.uuid4().hex  # millisecond timestamps collide under concurrent load
+        created = time.time()
+        self.sessions[sid] = {"created": created, "data": data}
+        if self.journal:
+            self.journal.put(sid, created, data)
+        SESSIONS.inc("created")
         return sid
 
     def get(self, sid):
@@ -264,91 +752,320 @@ class SessionManager:
         if not item:
             return None
         if time.time() - item["created"] > self.ttl:
-            del self.sessions[sid]
+            self._expire(sid)
             return None
+        if "raw" in item:
+            # recovered from the journal, decoded on first use
+            item["data"] = json.loads(item.pop("raw"))
         return item["data"]
 
     def update(self, sid, data):
         if sid in self.sessions:
+            created = time.time()
             self.sessions[sid]["data"] = data
-            self.sessions[sid]["created"] = time.time()
+            self.sessions[sid]["created"] = created
+            self.sessions[sid].pop("raw", None)
+            if self.journal:
+                self.journal.put(sid, created, data)
+            SESSIONS.inc("updated")
             return True
         return False
 
+    def _expire(self, sid):
+        del self.sessions[sid]
+        if self.journal:
+            self.journal.delete(sid)
+        SESSIONS.inc("expired")
+
     def cleanup(self):
         now = time.time()
         for sid, item in list(self.sessions.items()):
             if now - item["created"] > self.ttl:
-                del self.sessions[sid]
+                self._expire(sid)
+
+    def recover(self):
+        """Reload sessions from the journal (startup, before serving)."""
+        if not self.journal:
+            return 0
+        with span("session_recovery"):
+            entries = self.journal.recover()
+            for sid, (created, raw) in entries.items():
+                self.sessions.setdefault(sid, {"created": created, "raw": raw})
+        SESSIONS.inc("recovered", amount=len(entries))
+        print(f"Recovered {len(entries)} sessions in {self.journal.last_recovery['seconds']:.2f}s")
+        return len(entries)
 
 # ----------------------------
 # Simple RedFlagGuard (safety)
 # ----------------------------
 class RedFlagGuard:
-    def __init__(self, red_flags_path=None):
-        self.red_flags = safe_load_json(red_flags_path or os.path.join(KNOW_PATH, "red_flags.json"))
+    def __init__(self, red_flags_path=None, knowledge=None):
+        if knowledge is not None:
+            self.scanner = RedFlagScanner(knowledge.red_flags)
+            vocab = knowledge.symptom_list
+        else:
+            self.scanner = RedFlagScanner.from_file(red_flags_path or os.path.join(KNOW_PATH, "red_flags.json"))
+            vocab = safe_load_json(os.path.join(KNOW_PATH, "symptom_list.json"))
+        self.red_flags = self.scanner.red_flags
+        # red flag -> symptom id, for the flags that are also in the model's vocabulary
+        vocab = {normalize_key(v): v for v in (vocab if isinstance(vocab, list) else [])}
+        self.symptom_ids = {k: vocab[k] for k in self.scanner.by_key if k in vocab}
     def check(self, symptoms: List[str]):
-        alerts = []
-        for s in symptoms:
-            if s in self.red_flags:
-                alerts.append({"symptom": s, "action": self.red_flags[s]})
-        return alerts
+        return self.scanner.check(symptoms)
+    def scan(self, text: str, symptoms: Optional[List[str]] = None):
+        """Red flags that pre-empt the model (see modules/red_flags.py) in raw text plus any confirmed symptoms."""
+        alerts = self.scanner.scan_text(text)
+        if symptoms:
+            seen = {a["symptom"] for a in alerts}
+            alerts += [a for a in self.scanner.check(symptoms) if a["symptom"] not in seen]
+        return self.scanner.standalone(alerts)
+    def flagged_symptoms(self, alerts: List[Dict]) -> List[str]:
+        """Symptom ids of the alerts that the model knows (others only appear in red_flag_details)."""
+        ids = (self.symptom_ids.get(normalize_key(a["symptom"])) for a in alerts)
+        return [s for s in ids if s]
 
 # ----------------------------
-# Pill Model Loader (lightweight)
+# FastAPI app + endpoints
 # ----------------------------
-class PillModel:
-    def __init__(self):
-        # try to load torch model
-        self.model = None
-        self.labels = None
-        # try torch model
-        torch_path = os.path.join(MODEL_PATH, "pill_model.pt")
-        labels_path = os.path.join(MODEL_PATH, "pill_labels.json")
-        if torch and os.path.exists(torch_path):
-            try:
-                self.model = torch.jit.load(torch_path) if torch.jit.isinstance(torch.jit, object) else torch.load(torch_path, map_location='cpu')
-                if os.path.exists(labels_path):
-                    self.labels = safe_load_json(labels_path)
-            except Exception:
-                self.model = None
-        # else leave model None (fallback)
-    def infer(self, image_bytes):
-        # return dummy if not available
-        if self.model is None or torch is None:
-            return {"pill_name": "Unknown - model missing", "confidence": 0.0}
+def load_knowledge_bundle():
+    if not KNOWLEDGE_BUNDLE:
+        raise FileNotFoundError("disabled (MEDICORE_KNOWLEDGE_BUNDLE is empty)")
+    if not os.path.exists(KNOWLEDGE_BUNDLE):
+        raise FileNotFoundError(f"{KNOWLEDGE_BUNDLE} not built (training_scripts/build_knowledge_bundle.py)")
+    bundle = KnowledgeBundle.load(KNOWLEDGE_BUNDLE)
+    stale = bundle.stale_sources(KNOW_PATH)
+    if stale:
+        raise ValueError(f"{KNOWLEDGE_BUNDLE} is older than {', '.join(stale)}; rebuild it")
+    print(f"Loaded knowledge bundle in {bundle.load_seconds * 1000:.1f}ms")
+    return bundle
+
+def knowledge_or_none():
+    """The knowledge bundle, or None when the JSON files should be read instead."""
+    if knowledge.state == "failed":
+        return None
+    try:
+        return knowledge.get()
+    except Exception as e:
+        print(f"Knowledge bundle not used: {e}")
+        return None
+
+def published_model(version: Optional[str] = None) -> Optional[Dict]:
+    """current.json of MODEL_VERSIONS_DIR (or the named version there) with the artifact's path; None if absent."""
+    if version is None:
+        current = safe_load_json(os.path.join(MODEL_VERSIONS_DIR, "current.json"))
+        if not current.get("path"):
+            return None
+        version = current["path"]
+    if os.path.basename(version) != version or not os.path.isfile(os.path.join(MODEL_VERSIONS_DIR, version)):
+        raise ValueError(f"no published model version {version!r}")
+    return {"version": version, "path": os.path.join(MODEL_VERSIONS_DIR, version)}
+
+def serving_model_path() -> Optional[str]:
+    try:
+        return (published_model() or {}).get("path")
+    except ValueError as e:
+        print(f"Published model not used: {e}")
+        return None
+
+def build_engine(model_path: Optional[str] = None):
+    return InferenceEngine(model_path=model_path, red_flag_scanner=guard.get().scanner, knowledge=knowledge_or_none(),
+                           specialty_model=SPECIALTY_MODEL or None)
+
+# Fixed complaints a reloaded model is scored on before it replaces the serving one
+MODEL_PROBES = (
+    "fever and headache with body pain",
+    "cough, runny nose and sneezing",
+    "itching and a red skin rash",
+    "vomiting and diarrhoea since yesterday",
+    "frequent urination and excessive thirst",
+    "yellow eyes and dark urine",
+    "joint pain and high fever with chills",
+    "burning sensation while urinating",
+)
+
+def check_engine(new, old=None) -> Optional[str]:
+    """Why `new` must not replace `old`, or None if it may.
+
+    Every probe must score to a probability distribution over the new model's classes and,
+    against a serving engine, at least MODEL_PROBE_AGREEMENT of them keep their top disease.
+    """
+    if new.model is None or not hasattr(new.clf, "predict_proba"):
+        return "model could not be loaded"
+    classes = list(new.clf.classes_)
+    agreed = 0
+    for text in MODEL_PROBES:
+        probs = np.asarray(new._predict_proba(" ".join(new.normalize_text(text))), dtype=float)
+        if probs.shape != (len(classes),) or not np.all(np.isfinite(probs)) or abs(probs.sum() - 1) > 1e-6:
+            return f"probe {text!r} did not score to a distribution over its {len(classes)} classes"
+        if old is not None:
+            old_probs = old._predict_proba(" ".join(old.normalize_text(text)))
+            agreed += classes[int(np.argmax(probs))] == old.clf.classes_[int(np.argmax(old_probs))]
+    if old is not None and agreed < MODEL_PROBE_AGREEMENT * len(MODEL_PROBES):
+        return f"top disease kept on only {agreed}/{len(MODEL_PROBES)} probes"
+    return None
+
+def reload_engine(published: Dict) -> Dict:
+    """Build a published model, check it (check_engine) and swap it in; ValueError if it fails the check."""
+    t0 = time.perf_counter()
+    new = build_engine(published["path"])
+    old = engine.get() if engine.state == "ready" else None
+    problem = check_engine(new, old)
+    if problem:
+        raise ValueError(f"model {published['version']} not swapped in: {problem}")
+    engine.replace(new)
+    return {"version": published["version"], "previous": old.model_path if old else None,
+            "classes": len(new.class_index), "load_seconds": time.perf_counter() - t0}
+
+def point_current(version: str):
+    """Make current.json name an already published version (parent: the one it named before)."""
+    path = os.path.join(MODEL_VERSIONS_DIR, "current.json")
+    current = {"version": version, "path": version, "parent": safe_load_json(path).get("version"),
+               "published_at": time.time()}
+    tmp = path + f".{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(current, f, indent=2)
+    os.replace(tmp, path)
+
+def watch_published_model(stop: threading.Event):
+    """Swap in the model current.json names whenever the file changes (MODEL_WATCH_SECONDS)."""
+    path = os.path.join(MODEL_VERSIONS_DIR, "current.json")
+    seen = None
+    while not stop.wait(MODEL_WATCH_SECONDS):
         try:
-            img = Image.open(image_bytes).convert("RGB")
-            tf = transforms.Compose([
-                transforms.Resize((224,224)),
-                transforms.ToTensor(),
-                transforms.Normalize(mean=[0.485,0.456,0.406], std=[0.229,0.224,0.225])
-            ])
-            x = tf(img).unsqueeze(0)
-            self.model.eval()
-            with torch.no_grad():
-                out = self.model(x)
-                probs = torch.softmax(out, dim=1).cpu().numpy()[0]
-                idx = int(np.argmax(probs))
-                conf = float(probs[idx])
-                name = self.labels.get(str(idx), f"class_{idx}") if self.labels else f"class_{idx}"
-                return {"pill_name": name, "confidence": conf}
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        if mtime == seen:
+            continue
+        seen = mtime
+        if engine.state != "ready":
+            continue  # a first load reads current.json itself
+        try:
+            published = published_model()
+            if published is None or engine.get().model_path == published["path"]:
+                continue
+            info = reload_engine(published)
+            print(f"Model watch: now serving {info['version']} (was {info['previous']})")
         except Exception as e:
-            return {"pill_name":"error","confidence":0.0,"error":str(e)}
+            ERRORS.inc("model_watch")
+            print(f"Model watch: {e}")
 
-# ----------------------------
-# FastAPI app + endpoints
-# ----------------------------
-app = FastAPI(title="MediCore AI Service")
+# Components are built lazily; see warm_up() and /ready
+knowledge = LazyComponent("knowledge_bundle", load_knowledge_bundle, required=False)
+guard = LazyComponent("red_flag_guard", lambda: RedFlagGuard(knowledge=knowledge_or_none()))
+engine = LazyComponent("inference_engine", lambda: build_engine(serving_model_path()),
+                       check=lambda e: e.model is not None)
+if IMAGE_WORKERS:
+    # started per API process in lifespan(); workers load the pill model and OCR themselves
+    image_workers = LazyComponent("image_workers", lambda: ImageWorkerPool(IMAGE_WORKERS, MODEL_PATH,
+                                                                           task_timeout=IMAGE_TASK_TIMEOUT),
+                                  required=False, check=lambda p: p.alive() > 0)
+    COMPONENTS = [knowledge, guard, engine, image_workers]
+else:
+    pill_model = LazyComponent("pill_model", lambda: PillModel(MODEL_PATH), required=False,
+                               check=lambda p: p.model is not None)
+    ocr_backend = LazyComponent("ocr", load_ocr_backend, required=False,
+                                check=lambda o: o.pytesseract is not None and o.cv2 is not None)
+    COMPONENTS = [knowledge, guard, engine, pill_model, ocr_backend]
+
+def start_report_jobs():
+    runner = JobRunner(JobStore(JOBS_DB), workers=JOB_WORKERS, dispatch=JOB_DISPATCHER)
+    runner.start()
+    return runner
+
+# started by the lifespan, not warm_up(); reported by /ready ("available": the dispatcher is running)
+report_jobs = LazyComponent("report_jobs", start_report_jobs, required=False, check=lambda r: r.alive())
+lab_store = LazyComponent("lab_store", lambda: LabStore(LABS_DB), required=False)
+SESSION_TTL = 60*60  # 1 hour default
+sessions = SessionManager(ttl_seconds=SESSION_TTL)
+session_journal = None
+
+def open_session_journal(directory: str):
+    """Journal this process's sessions in `directory` (before serving; lifespan() recovers from it)."""
+    global session_journal
+    try:
+        session_journal = SessionJournal(directory, ttl_seconds=SESSION_TTL)
+        sessions.journal = session_journal
+    except RuntimeError as e:
+        print(f"Session journal disabled: {e}")
+
+if SESSION_JOURNAL_DIR:
+    open_session_journal(SESSION_JOURNAL_DIR)
+shadow = ShadowEvaluator(lambda: InferenceEngine(model_path=SHADOW_MODEL, metrics_prefix="shadow:"),
+                         sample_rate=SHADOW_SAMPLE_RATE) if SHADOW_MODEL else None
+recorder = TrafficRecorder(RECORD_DIR, sample_rate=RECORD_SAMPLE_RATE) if RECORD_DIR else None
+metrics.Gauge("medicore_active_sessions", "Sessions currently held in memory", lambda: len(sessions.sessions))
+
+def warm_up():
+    """Load every component and run one prediction so the first real request is fast."""
+    t0 = time.perf_counter()
+    for comp in COMPONENTS:
+        try:
+            comp.get()
+        except Exception as e:
+            print(f"Warm-up failed for {comp.name}: {e}")
+    try:
+        engine.get().start_session("headache")
+    except Exception as e:
+        print(f"Warm-up prediction failed: {e}")
+    print(f"Warm-up finished in {time.perf_counter() - t0:.2f}s")
+
+@asynccontextmanager
+async def lifespan(app):
+    if session_journal:
+        # Before accepting connections, so resumed conversations find their session
+        sessions.recover()
+        session_journal.start()
+    # Picks up report jobs left queued or interrupted by the last shutdown
+    report_jobs.get()
+    if IMAGE_WORKERS:
+        # here rather than in warm_up(): a prefork master must not own this process's workers
+        image_workers.get().start()
+    if WARMUP:
+        # uvicorn starts accepting connections once this yields; models load meanwhile
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+    if shadow:
+        shadow.start()
+    if recorder:
+        recorder.start()
+    model_watch = threading.Event()
+    if MODEL_WATCH_SECONDS > 0:
+        threading.Thread(target=watch_published_model, args=(model_watch,), name="model-watch", daemon=True).start()
+    yield
+    model_watch.set()
+    emergency_scoring.shutdown(wait=False, cancel_futures=True)
+    if recorder:
+        recorder.close()
+    if session_journal:
+        session_journal.close()
+    if report_jobs.state == "ready":
+        report_jobs.get().close()
+    if IMAGE_WORKERS:
+        image_workers.get().close()
+    if lab_store.state == "ready":
+        lab_store.get().close()
+
+# Responses are typed (see the response models below) and encoded with orjson, or
+# msgpack for clients sending `Accept: application/msgpack` (modules/responses.py)
+app = FastAPI(title="MediCore AI Service", lifespan=lifespan, default_response_class=FastResponse)
+app.router.route_class = NegotiatedRoute
 
 # CORS (allow your Node backend)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
-# instantiate components
-engine = InferenceEngine()
-sessions = SessionManager(ttl_seconds=60*60)  # 1 hour default
-guard = RedFlagGuard()
-pill_model = PillModel()
+if ADMISSION:
+    app.add_middleware(AdmissionMiddleware, pool_size=ADMISSION_POOL, rate=RATE_LIMIT, burst=RATE_BURST,
+                       trusted_proxies=TRUSTED_PROXIES,
+                       classes=default_classes(ADMISSION_POOL, OCR_CONCURRENCY, PILL_CONCURRENCY))
+
+profile_store = profiling.ProfileStore(capacity=PROFILE_KEEP)
+if PROFILING:
+    app.add_middleware(profiling.ProfilingMiddleware, store=profile_store,
+                       sample_rate=PROFILE_SAMPLE_RATE, mode=PROFILE_MODE)
+
+# outermost, so the deadline also runs while a request waits for admission
+app.add_middleware(DeadlineMiddleware, max_seconds=MAX_DEADLINE_MS / 1000,
+                   routes=(("/analyze_report", REPORT_DEADLINE_MS / 1000), ("/identify_pill", PILL_DEADLINE_MS / 1000)))
 
 # Request models
 class TriageRequest(BaseModel):
@@ -358,134 +1075,656 @@ class TriageRequest(BaseModel):
     session_id: Optional[str] = None
     user_id: Optional[str] = None
 
+# Response models. Every endpoint answers {"success", "data"} or {"success", "error"};
+# routes set response_model_exclude_unset so optional fields only appear when the
+# handler filled them in (e.g. the emergency-only triage fields).
+T = TypeVar("T")
+
+class Envelope(BaseModel, Generic[T]):
+    success: bool
+    data: Optional[T] = None
+    error: Optional[str] = None
+
+class Contribution(BaseModel):
+    symptom: str
+    contribution: float
+
+class Explanation(BaseModel):
+    intercept: float
+    contributions: List[Contribution]
+
+class RedFlagAlert(BaseModel):
+    symptom: str
+    action: str
+
+class SpecialtyRecommendation(BaseModel):
+    specialty: str
+    confidence: float
+
+class TriageResult(BaseModel):
+    extracted_symptoms: List[str]
+    posterior: List[float] = []
+    candidates: List[str]
+    next_questions: List[str]
+    explainability: Dict[str, Explanation] = {}
+    red_flags: List[str]
+    top_disease: str
+    medicines_and_advice: Union[List[str], Dict[str, Any]] = {}  # advice list from medicine_rules.json, {} when none
+    asked: List[str] = []
+    session_id: Optional[str] = None
+    recommended_specialty: Optional[SpecialtyRecommendation] = None  # with a specialty model, when the complaint has words it knows
+    # red-flag fast path only
+    red_flag_details: Optional[List[RedFlagAlert]] = None
+    emergency: Optional[bool] = None
+    scoring: Optional[str] = None
+
+class AnswerResult(BaseModel):
+    candidates: List[str]
+    top_disease: str
+    explainability: Dict[str, Explanation] = {}
+    next_questions: List[str]
+    red_flags: List[str]
+
+class PillResult(BaseModel):
+    pill_name: str
+    confidence: float
+    error: Optional[str] = None
+    partial: Optional[bool] = None  # the request deadline passed before inference
+
+class ReportFinding(BaseModel):
+    test: str
+    value: float
+    status: str
+    reference: Optional[str] = None
+
+class ReportResult(BaseModel):
+    raw_text: str
+    findings: List[ReportFinding]
+    partial: Optional[bool] = None  # OCR was cut short by the request deadline
+    simulated: Optional[bool] = None  # no OCR backend: demo findings, never stored
+    stored: Optional[int] = None  # lab values kept for the patient_id given (0 for partial results)
+
+class LabPoint(BaseModel):
+    taken_at: float
+    value: float
+    flag: Optional[int] = None
+
+class LabSeries(BaseModel):
+    count: int
+    first_at: float
+    last_at: float
+    last_value: float
+    min: float
+    max: float
+    mean: float
+    delta: Optional[float] = None  # last value minus the one before
+    delta_from_first: Optional[float] = None
+    slope_per_30d: Optional[float] = None
+    out_of_range: int
+    current_streak: int  # consecutive out-of-range values up to the latest
+    longest_streak: int
+    last_flag: Optional[int] = None  # -1 low, 0 in range, 1 high
+    unit: Optional[str] = None
+    reference: Optional[List[float]] = None
+    points: Optional[List[LabPoint]] = None
+
+class LabTrends(BaseModel):
+    patient_id: str
+    tests: Dict[str, LabSeries]
+
+class JobCreated(BaseModel):
+    job_id: str
+    total: int
+
+class JobStatus(BaseModel):
+    job_id: str
+    created: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    total: int
+    done: int
+    failed: int
+    status: str
+    progress: float
+    reports_per_minute: Optional[float] = None
+    queue: Dict[str, int] = {}
+
+class JobResultItem(BaseModel):
+    index: int
+    name: Optional[str] = None
+    status: str
+    data: Optional[ReportResult] = None
+    error: Optional[str] = None
+    seconds: Optional[float] = None
+
+class JobResultsPage(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    offset: int
+    limit: int
+    items: List[JobResultItem]
+
+def emergency_result(confirmed: List[str], alerts: List[Dict]):
+    """Triage response for the red-flag fast path (same shape as start_session)."""
+    flagged = guard.get().flagged_symptoms(alerts)
+    return {
+        "extracted_symptoms": list(dict.fromkeys(list(confirmed) + flagged)),
+        "posterior": [],
+        "candidates": [],
+        "next_questions": [],
+        "explainability": {},
+        "red_flags": [a["action"] for a in alerts],
+        "red_flag_details": alerts,
+        "top_disease": "Unknown",
+        "medicines_and_advice": {},
+        "asked": [],
+        "emergency": True,
+    }
+
+# model scoring of fast-pathed emergencies outside a response (e.g. /ws/triage)
+emergency_scoring = ThreadPoolExecutor(max_workers=2, thread_name_prefix="emergency-scoring")
+
+def score_emergency_session(sid: str, text: str, confirmed: List[str]):
+    """Background model scoring for a fast-pathed emergency, stored on the session."""
+    try:
+        result = engine.get().start_session(text, confirmed_symptoms=confirmed)
+        sdata = sessions.get(sid)
+        if sdata is not None:
+            sdata.update({"extracted": result["extracted_symptoms"], "candidates": result["candidates"],
+                          "top_disease": result["top_disease"], "scoring": "done"})
+            sessions.update(sid, sdata)
+    except Exception:
+        traceback.print_exc()
+        ERRORS.inc("emergency_scoring")
+
+async def loaded(*components: LazyComponent):
+    """Load (or wait for) components on the threadpool before sync code calls their get()."""
+    for c in components:
+        await c.aget()
+
+async def triage_loaded(text: str, confirmed: List[str]):
+    """loaded() for begin_triage: the engine is not waited for when the text takes the red-flag fast path."""
+    scanner = await guard.aget()
+    if engine.state != "ready" and scanner.scan(text, confirmed):
+        return
+    await engine.aget()
+
+def record_traffic(kind: str, inputs: Dict, result: Dict, t_start: float, warm: bool = True):
+    """Record a request unless it found a component still loading (`warm` False): its latency would include the load."""
+    if recorder and warm:
+        recorder.record(kind, inputs, result, time.perf_counter() - t_start)
+
+def begin_triage(text: str, confirmed: List[str], background: Optional[BackgroundTasks] = None) -> Dict:
+    """Start a triage session (shared by /predict/symptoms and /ws/triage); returns the result with session_id.
+
+    Emergencies take the red-flag fast path and are scored with the model afterwards: as a
+    response background task when `background` is given, else on emergency_scoring.
+    """
+    t_start = time.perf_counter()
+    warm = guard.state == "ready" and engine.state == "ready"
+    # Red-flag fast path: emergencies are answered before any extraction or model work
+    with span("red_flag_scan"):
+        alerts = guard.get().scan(text, confirmed)
+    if alerts:
+        SESSIONS.inc("emergency")
+        result = emergency_result(confirmed, alerts)
+        result["scoring"] = "pending"
+        sid = sessions.create({
+            "text": text,
+            "extracted": result["extracted_symptoms"],
+            "posterior": [],
+            "asked": [],
+            "candidates": [],
+            "emergency": True,
+            "scoring": result["scoring"],
+        })
+        if background:
+            background.add_task(score_emergency_session, sid, text, result["extracted_symptoms"])
+        else:
+            emergency_scoring.submit(score_emergency_session, sid, text, result["extracted_symptoms"])
+        result["session_id"] = sid
+        record_traffic("triage", {"text": text, "confirmed": list(confirmed)}, result, t_start, warm)
+        return result
+
+    # start session
+    t0 = time.perf_counter()
+    result = engine.get().start_session(text, confirmed_symptoms=confirmed)
+    if shadow:
+        shadow.submit("symptoms", (text, list(confirmed)), result["candidates"], time.perf_counter() - t0)
+    session_data = {
+        "text": text,
+        "extracted": result["extracted_symptoms"],
+        "posterior": result["posterior"],
+        "asked": result["asked"],
+        "candidates": result["candidates"]
+    }
+    result["session_id"] = sessions.create(session_data)
+    record_traffic("triage", {"text": text, "confirmed": list(confirmed)}, result, t_start, warm)
+    return result
+
+def apply_answer(session_id: str, sdata: Dict, symptom: str, answer: bool, state: Optional[Dict] = None) -> Dict:
+    """Record one follow-up answer on a session and re-score it.
+
+    With a score `state` (see InferenceEngine.new_state; /ws/triage keeps one per connection)
+    the logits are updated in place; otherwise the confirmed symptoms are re-predicted.
+    """
+    t_start = time.perf_counter()
+    eng = engine.get()
+    if state is not None and state.get("engine") is not eng:
+        state = None  # built by a model since swapped out (/admin/model/reload): re-predict
+    extracted = sdata.get("extracted", [])
+    asked = sdata.setdefault("asked", [])
+    if recorder:
+        # the state the answer was applied to, so a replay needs no session
+        inputs = {"extracted": list(extracted), "asked": list(asked), "symptom": symptom, "answer": answer}
+    if symptom not in asked:
+        asked.append(symptom)
+    if answer:
+        extracted.append(symptom)
+
+    # Re-predict
+    t0 = time.perf_counter()
+    probs = row = None
+    if state is not None:
+        if answer:
+            eng.add_symptom(state, symptom)
+        probs, row = eng.state_proba(state), eng.state_row(state)
+        results = eng.rank_classes(probs)
+    else:
+        results = eng.predict(extracted)
+    candidates = [r['disease'] for r in results]
+    if shadow:
+        shadow.submit("answer", (list(extracted),), candidates, time.perf_counter() - t0)
+    top_disease = results[0]['disease'] if results else "Unknown"
+    explainability = eng.explain(extracted, candidates, row=row)
+    next_questions = eng.next_questions(extracted, asked=asked, probs=probs)
+
+    # Update session
+    sdata.update({"extracted": extracted, "candidates": candidates})
+    sessions.update(session_id, sdata)
+
+    result = {
+        "candidates": candidates,
+        "top_disease": top_disease,
+        "explainability": explainability,
+        "next_questions": next_questions,
+        "red_flags": [a["action"] for a in guard.get().check([symptom])] if answer else []
+    }
+    if recorder:
+        record_traffic("answer", inputs, result, t_start)
+    return result
+
+def run_report_analysis(contents: bytes, deadline=None) -> Dict:
+    """OCR + findings for one report upload (blocking); the findings stage is what gets recorded.
+
+    With a deadline the findings cover the text read before it passed (marked partial).
+    """
+    try:
+        if IMAGE_WORKERS:
+            ocr = image_workers.get().run("ocr", contents, deadline=deadline)
+        else:
+            ocr = ocr_report(contents, ocr_backend.get(), deadline)
+    except TimeoutError:
+        # the worker was killed at the deadline: nothing was read
+        if deadline is None or not deadline.partial:
+            raise
+        ocr = {"text": ""}
+    partial = deadline is not None and deadline.partial
+    text = ocr["text"]
+    t_start = time.perf_counter()
+    data = analyze_report_text(text, partial)
+    if not partial:
+        record_traffic("report", {"text": text}, data, t_start)
+    return data
+
+def run_pill_identification(contents: bytes, deadline=None) -> Dict:
+    """Pill model on one upload (blocking); "Unknown" and partial when the deadline passed first."""
+    try:
+        if IMAGE_WORKERS:
+            res = image_workers.get().run("pill", contents, deadline=deadline)
+        else:
+            from io import BytesIO
+            res = pill_model.get().infer(BytesIO(contents), deadline)
+    except TimeoutError:
+        if deadline is None or not deadline.partial:
+            raise
+        res = {"pill_name": "Unknown", "confidence": 0.0}
+    if deadline is not None and deadline.partial:
+        res["partial"] = True
+    return res
+
 @app.get("/health")
 async def health():
     return {"ok": True, "uptime": time.time()}
 
+# readiness: per-component load state (503 until required components are loaded;
+# with warm-up disabled, components that load on first use count as ready)
+@app.get("/ready")
+async def ready():
+    status = {c.name: c.status() for c in COMPONENTS + [report_jobs]}
+    ok_states = ("ready",) if WARMUP else ("ready", "not_loaded", "loading")
+    is_ready = all(c.state in ok_states for c in COMPONENTS if c.required)
+    return JSONResponse({"ready": is_ready, "components": status}, status_code=200 if is_ready else 503)
+
+# Prometheus scrape endpoint (stage latencies, sessions, cache, errors)
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # start triage (creates a session and returns first question and candidates)
-@app.post("/predict/symptoms")
-async def predict_symptoms(req: TriageRequest):
+@app.post("/predict/symptoms", response_model=Envelope[TriageResult], response_model_exclude_unset=True)
+async def predict_symptoms(req: TriageRequest, background: BackgroundTasks):
     try:
-        # start session
-        result = engine.start_session(req.text, confirmed_symptoms=req.confirmed_symptoms)
-        session_data = {
-            "text": req.text,
-            "extracted": result["extracted_symptoms"],
-            "posterior": result["posterior"],
-            "asked": result["asked"],
-            "candidates": result["candidates"]
-        }
-        sid = sessions.create(session_data)
-        result["session_id"] = sid
+        confirmed = list(req.confirmed_symptoms or [])
+        await triage_loaded(req.text, confirmed)
+        # emergencies are scored after the response; see /predict/session
+        result = begin_triage(req.text, confirmed, background)
         return {"success": True, "data": result}
     except Exception as e:
         traceback.print_exc()
+        ERRORS.inc("/predict/symptoms")
         return {"success": False, "error": str(e)}
 
 # answer a follow-up question
-@app.post("/predict/answer")
+@app.post("/predict/answer", response_model=Envelope[AnswerResult], response_model_exclude_unset=True)
 async def answer_question(session_id: str = Form(...), symptom: str = Form(...), answer: bool = Form(...)):
     try:
         sdata = sessions.get(session_id)
         if not sdata:
+            SESSIONS.inc("not_found")
             return {"success": False, "error": "session not found"}
-            
-        # For pickle model, we just aggregate symptoms and re-predict
-        # We need to trust the backend to maintain the list of confirmed symptoms, 
-        # or we update the session data here.
-        
-        extracted = sdata.get("extracted", [])
-        if answer:
-            extracted.append(symptom)
-            
-        # Re-predict
-        results = engine.predict(extracted)
-        top_disease = results[0]['disease'] if results else "Unknown"
-        
-        # Update session
-        sdata.update({"extracted": extracted, "candidates": [r['disease'] for r in results]})
-        sessions.update(session_id, sdata)
-        
-        return {"success": True, "data": {
-            "candidates": [r['disease'] for r in results],
-            "top_disease": top_disease,
-            "next_questions": [] # TODO: Implement next question logic for pickle model
-        }}
+        await loaded(guard, engine)
+        return {"success": True, "data": apply_answer(session_id, sdata, symptom, answer)}
     except Exception as e:
         traceback.print_exc()
+        ERRORS.inc("/predict/answer")
         return {"success": False, "error": str(e)}
 
+# current state of a triage session (e.g. background scoring of an emergency)
+@app.get("/predict/session/{session_id}", response_model=Envelope[Dict[str, Any]], response_model_exclude_unset=True)
+async def get_session(session_id: str):
+    sdata = sessions.get(session_id)
+    if not sdata:
+        SESSIONS.inc("not_found")
+        return {"success": False, "error": "session not found"}
+    return {"success": True, "data": sdata}
+
+class TriageConversation:
+    """Per-connection state of a /ws/triage conversation.
+
+    Holds the session dict itself and the engine's score state for the whole
+    conversation, so an answer skips form parsing, the session lookup and (for
+    models that support it) re-vectorizing. The session is still kept in
+    SessionManager, so HTTP endpoints, the journal and resume all see it.
+    """
+    def __init__(self):
+        self.session_id = None
+        self.sdata = None
+        self.state = None
+
+    def start(self, msg: Dict) -> Dict:
+        result = begin_triage(msg["text"], list(msg.get("confirmed_symptoms") or []))
+        self.session_id = result["session_id"]
+        self.sdata = sessions.get(self.session_id)
+        self.state = None
+        return result
+
+    def resume(self, msg: Dict) -> Dict:
+        sdata = sessions.get(msg["session_id"])
+        if not sdata:
+            SESSIONS.inc("not_found")
+            raise ValueError("session not found")
+        self.session_id, self.sdata, self.state = msg["session_id"], sdata, None
+        return {"session_id": self.session_id, "extracted_symptoms": sdata.get("extracted", []),
+                "asked": sdata.get("asked", []), "candidates": sdata.get("candidates", [])}
+
+    def answer(self, msg: Dict) -> Dict:
+        if self.sdata is None:
+            raise ValueError("no session: send start or resume first")
+        eng = engine.get()
+        if self.state is not None and self.state["engine"] is not eng:
+            self.state = None  # the model was reloaded mid-conversation
+        if self.state is None and eng.incremental:
+            # built on the first answer; start_session has usually cached the row already
+            self.state = eng.new_state(self.sdata.get("extracted", []))
+        return apply_answer(self.session_id, self.sdata, msg["symptom"], bool(msg["answer"]), self.state)
+
+ws_open = 0
+metrics.Gauge("medicore_ws_connections", "Open /ws/triage conversations", lambda: ws_open)
+
+# triage conversation over one WebSocket. Client messages (JSON text frames, or
+# msgpack binary frames, answered in kind):
+#   {"type": "start", "text": ..., "confirmed_symptoms": [...]}  -> same data as /predict/symptoms
+#   {"type": "resume", "session_id": ...}                        -> attach an existing session
+#   {"type": "answer", "symptom": ..., "answer": true|false}     -> same data as /predict/answer
+# Replies are {"type", "success", "data"} or {"type", "success": false, "error"}.
+@app.websocket("/ws/triage")
+async def triage_socket(ws: WebSocket):
+    global ws_open
+    if ws_open >= WS_MAX_CONNECTIONS:
+        SESSIONS.inc("ws_rejected")
+        await ws.close(code=1013)  # try again later
+        return
+    await ws.accept()
+    ws_open += 1
+    conv = TriageConversation()
+    handlers = {"start": conv.start, "resume": conv.resume, "answer": conv.answer}
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(ws.receive(), WS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await ws.close(code=1000)
+                break
+            if message["type"] == "websocket.disconnect":
+                break
+            binary = message.get("bytes") is not None
+            kind = None
+            try:
+                msg = loads_msgpack(message["bytes"]) if binary else json.loads(message["text"])
+                kind = msg.get("type")
+                if kind not in handlers:
+                    raise ValueError(f"unknown message type: {kind}")
+                if kind == "start":
+                    await triage_loaded(msg["text"], list(msg.get("confirmed_symptoms") or []))
+                elif kind == "answer":
+                    await loaded(guard, engine)
+                reply = {"type": kind, "success": True, "data": handlers[kind](msg)}
+            except KeyError as e:
+                reply = {"type": kind, "success": False, "error": f"missing field: {e.args[0]}"}
+            except ValueError as e:
+                reply = {"type": kind, "success": False, "error": str(e)}
+            except Exception as e:
+                traceback.print_exc()
+                ERRORS.inc("/ws/triage")
+                reply = {"type": kind, "success": False, "error": str(e)}
+            if binary:
+                await ws.send_bytes(dumps_msgpack(reply))
+            else:
+                await ws.send_text(dumps_json(reply).decode("utf-8"))
+    finally:
+        ws_open -= 1
+
 # pill identifier (multipart/form-data)
-@app.post("/identify_pill")
+@app.post("/identify_pill", response_model=Envelope[PillResult], response_model_exclude_unset=True)
 async def identify_pill(file: UploadFile = File(...)):
     try:
         contents = await file.read()
-        from io import BytesIO
-        bio = BytesIO(contents)
-        res = pill_model.infer(bio)
+        # CPU-bound: keep the event loop free for triage requests
+        res = await run_in_threadpool(run_pill_identification, contents, current_deadline())
         return {"success": True, "data": res}
     except Exception as e:
         traceback.print_exc()
+        ERRORS.inc("/identify_pill")
         return {"success": False, "error": str(e)}
 
-# analyze report (OCR + heuristic parsing)
-@app.post("/analyze_report")
-async def analyze_report(file: UploadFile = File(...)):
+# analyze report (OCR + heuristic parsing); with a patient_id the lab values are stored for
+# /labs/{patient_id}/trends, dated taken_at (unix seconds, default now) and replaced when
+# the same report_id is sent again
+@app.post("/analyze_report", response_model=Envelope[ReportResult], response_model_exclude_unset=True)
+async def analyze_report(file: UploadFile = File(...), patient_id: Optional[str] = Form(None),
+                         report_id: Optional[str] = Form(None), taken_at: Optional[float] = Form(None)):
     try:
         contents = await file.read()
-        from io import BytesIO
-        bio = BytesIO(contents)
-        text = ""
-        if pytesseract and cv2 and Image:
-            # attempt to use OpenCV + pytesseract
-            nparr = np.frombuffer(contents, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            # simple threshold/denoise
-            gray = cv2.medianBlur(gray, 3)
-            # Check if pytesseract is executable
-            try:
-                text = pytesseract.image_to_string(gray)
-            except:
-                text = "" # Fallback
-        else:
-            # fallback: try PIL text extraction (very weak)
-            if Image:
-                img = Image.open(bio)
-                try:
-                    text = pytesseract.image_to_string(img) if pytesseract else ""
-                except Exception:
-                    text = ""
-        # simple regex examples for Hemoglobin / WBC
-        import re
-        findings = []
-        hb = re.search(r'(hemoglob(in|in|in\.)|hgb)[^\d\n\r]{0,6}(\d+\.?\d*)', text, flags=re.IGNORECASE)
-        if hb:
-            val = float(hb.group(3))
-            ref = "13.5-17.5"  # placeholder
-            status = "low" if val < 13.5 else "normal"
-            findings.append({"test":"Hemoglobin","value":val,"status":status,"reference":ref})
-        # return
-        if not findings and not text:
-            # Mock fallback for demonstration if OCR is missing
-            findings = [
-                {"test": "Hemoglobin", "value": 12.5, "status": "low", "reference": "13.5-17.5"},
-                {"test": "WBC", "value": 7.5, "status": "normal", "reference": "4.5-11.0"},
-                {"test": "Platelets", "value": 250, "status": "normal", "reference": "150-450"}
-            ]
-            text = "[SIMULATED OCR] Hemoglobin: 12.5 g/dL (Low), WBC: 7.5, Platelets: 250... (OCR unavailable, showing usage demo)"
-
-        return {"success": True, "data": {"raw_text": text[:1000], "findings": findings}}
+        # OCR is CPU-bound: run it off the event loop so triage requests keep flowing
+        data = await run_in_threadpool(run_report_analysis, contents, current_deadline())
+        if patient_id and data.get("partial"):
+            data["stored"] = 0  # cut short by the deadline: storing it would look like a complete report
+        elif patient_id and not data.get("simulated"):
+            data["stored"] = await run_in_threadpool((await lab_store.aget()).add_report, patient_id, findings_of(data),
+                                                     taken_at, report_id)
+        return {"success": True, "data": data}
+    except Exception as e:
+        traceback.print_exc()
+        ERRORS.inc("/analyze_report")
+        return {"success": False, "error": str(e)}
+
+# per-test trend, deltas and out-of-range streaks of a patient's stored lab values;
+# `tests` narrows the tests, since/until (unix seconds) the dates, `points` adds the last n values
+@app.get("/labs/{patient_id}/trends", response_model=Envelope[LabTrends], response_model_exclude_unset=True)
+async def lab_trends(patient_id: str, tests: List[str] = Query(None), since: Optional[float] = None,
+                     until: Optional[float] = None, points: int = 0):
+    try:
+        series = await run_in_threadpool((await lab_store.aget()).trends, patient_id, tests, since, until, min(max(points, 0), 1000))
+        return {"success": True, "data": {"patient_id": patient_id, "tests": series}}
+    except Exception as e:
+        traceback.print_exc()
+        ERRORS.inc("/labs/trends")
+        return {"success": False, "error": str(e)}
+
+# bulk report analysis: upload files and/or name report paths on this host; returns a job id
+@app.post("/jobs/reports", response_model=Envelope[JobCreated], response_model_exclude_unset=True)
+async def submit_report_job(files: List[UploadFile] = File(None), paths: List[str] = Form(None)):
+    items = []
+    for f in files or []:
+        items.append({"name": f.filename, "content": await f.read()})
+    root = os.path.realpath(JOB_PATH_ROOT) if JOB_PATH_ROOT else None
+    for p in paths or []:
+        real = os.path.realpath(p)
+        if not root or os.path.commonpath([real, root]) != root:
+            raise HTTPException(status_code=400, detail=f"path not allowed: {p}")
+        if not os.path.isfile(real):
+            raise HTTPException(status_code=400, detail=f"file not found: {p}")
+        items.append({"name": os.path.basename(real), "path": real})
+    if not items:
+        raise HTTPException(status_code=400, detail="no files or paths given")
+    try:
+        runner = await report_jobs.aget()
+        job_id = await run_in_threadpool(runner.store.create_job, items)
+        runner.notify()
+        return {"success": True, "data": {"job_id": job_id, "total": len(items)}}
     except Exception as e:
         traceback.print_exc()
+        ERRORS.inc("/jobs/reports")
         return {"success": False, "error": str(e)}
 
+# job status: queued | running | completed, counts, progress and reports/minute
+@app.get("/jobs/{job_id}", response_model=Envelope[JobStatus], response_model_exclude_unset=True)
+async def get_report_job(job_id: str):
+    store = (await report_jobs.aget()).store
+    job = await run_in_threadpool(store.job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    job["queue"] = await run_in_threadpool(store.backlog)  # all jobs: pending / running items
+    return {"success": True, "data": job}
+
+# per-report results in submission order, one page at a time
+@app.get("/jobs/{job_id}/results", response_model=Envelope[JobResultsPage], response_model_exclude_unset=True)
+async def get_report_job_results(job_id: str, offset: int = 0, limit: int = 50):
+    store = (await report_jobs.aget()).store
+    job = await run_in_threadpool(store.job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    offset, limit = max(offset, 0), min(max(limit, 1), 500)
+    items = await run_in_threadpool(store.results, job_id, offset, limit)
+    return {"success": True, "data": {"job_id": job_id, "status": job["status"], "total": job["total"],
+                                      "offset": offset, "limit": limit, "items": items}}
+
 # background cleanup endpoint
 @app.post("/admin/cleanup_sessions")
 async def cleanup_sessions():
     sessions.cleanup()
     return {"success": True, "count": len(sessions.sessions)}
 
+# serving symptom model: artifact, published version and training metadata, and the
+# text pipeline heads (triage, specialty) with whether each runs on the shared tokens
+@app.get("/admin/model")
+async def model_info():
+    eng = await engine.aget()
+    return {"success": True, "data": {"model_path": eng.model_path, "classes": len(eng.class_index),
+                                      "features": len(eng.symptom_cols), "metadata": eng.metadata,
+                                      "specialty_model": eng.specialty_path if eng.specialty else None,
+                                      "heads": eng.pipeline.describe()}}
+
+# swap in the published model (current.json, or ?version=<file> from the versions directory)
+# without a restart; the new engine is loaded and scored on MODEL_PROBES (check_engine)
+# before it replaces the old one. The swap applies to the process handling the request; with
+# MEDICORE_MODEL_WATCH_SECONDS (prefork workers) a ?version reload is made current.json too,
+# so the other workers follow it within that interval.
+@app.post("/admin/model/reload")
+async def reload_model(version: Optional[str] = None):
+    try:
+        published = published_model(version)
+        if published is None:
+            return {"success": False, "error": f"no model published in {MODEL_VERSIONS_DIR}"}
+        try:
+            info = await run_in_threadpool(reload_engine, published)
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+        if version is not None and MODEL_WATCH_SECONDS > 0:
+            await run_in_threadpool(point_current, published["version"])
+        return {"success": True, "data": info}
+    except Exception as e:
+        traceback.print_exc()
+        ERRORS.inc("/admin/model/reload")
+        return {"success": False, "error": str(e)}
+
+# session journal state (records written, compactions, last recovery)
+@app.get("/admin/session_journal")
+async def session_journal_stats():
+    if not session_journal:
+        return {"success": True, "enabled": False}
+    return {"success": True, "enabled": True, "directory": session_journal.directory, "data": session_journal.stats()}
+
+# traffic recorder state (records written, drops, corpus bytes)
+@app.get("/admin/recorder")
+async def recorder_stats():
+    if not recorder:
+        return {"success": True, "enabled": False}
+    return {"success": True, "enabled": True, "directory": RECORD_DIR, "data": recorder.stats()}
+
+# image worker processes (per-worker tasks and memory, crashes, restarts)
+@app.get("/admin/image_workers")
+async def image_worker_stats():
+    if not IMAGE_WORKERS:
+        return {"success": True, "enabled": False}
+    return {"success": True, "enabled": True, "data": (await image_workers.aget()).stats()}
+
+# shadow model comparison (agreement, rank correlation, latency deltas)
+@app.get("/admin/shadow")
+async def shadow_stats():
+    if not shadow:
+        return {"success": True, "enabled": False}
+    return {"success": True, "enabled": True, "model_path": SHADOW_MODEL, "data": shadow.stats()}
+
+# captured request profiles (newest first)
+@app.get("/admin/profiles")
+async def list_profiles():
+    return {"success": True, "enabled": PROFILING, "data": profile_store.list()}
+
+# download one profile: format=prof (pstats/snakeviz, or pyinstrument HTML) or format=text
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: int, format: str = "prof"):
+    entry = profile_store.get(profile_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="profile not found")
+    if format == "text":
+        return PlainTextResponse(profiling.profile_text(entry))
+    ext = "prof" if entry["mode"] == "cprofile" else "html"
+    return Response(profiling.profile_bytes(entry), media_type="application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.{ext}"'})
+
 if __name__ == "__main__":
     # direct run (useful for single-cell)
     uvicorn.run("main:app", host="0.0.0.0", port=int(os.environ.get("PORT",8000)), reload=True)
@@ -9,6 +9,8 @@ try:
 except ImportError:
     import Image
 
+from modules.metrics import span
+
 class MedicalReportAnalyzer:
     def __init__(self):
         # KNOWLEDGE BASE: Standard Ranges
@@ -27,14 +29,19 @@ class MedicalReportAnalyzer:
         text = ""
         try:
             if file_path.endswith('.pdf'):
-                pages = convert_from_path(file_path)
+                with span("pdf_render"):
+                    pages = convert_from_path(file_path)
                 for page in pages:
                     # Grayscale for accuracy
-                    page = cv2.cvtColor(np.array(page), cv2.COLOR_RGB2GRAY)
-                    text += pytesseract.image_to_string(page)
+                    with span("image_preprocess"):
+                        page = cv2.cvtColor(np.array(page), cv2.COLOR_RGB2GRAY)
+                    with span("ocr"):
+                        text += pytesseract.image_to_string(page)
             else:
-                img = cv2.imread(file_path, 0) # Load as grayscale
-                text = pytesseract.image_to_string(img)
+                with span("image_decode"):
+                    img = cv2.imread(file_path, 0) # Load as grayscale
+                with span("ocr"):
+                    text = pytesseract.image_to_string(img)
         except Exception as e:
             return ""
         return text
@@ -42,10 +49,19 @@ class MedicalReportAnalyzer:
     def analyze(self, file_path):
         raw_text = self._ocr(file_path)
         if not raw_text: return {"error": "Could not read file."}
+        return self.analyze_text(raw_text)
 
+    def analyze_text(self, raw_text):
+        # Tests only, on already extracted text (also used to replay recorded reports)
         findings = []
         alerts = []
         
+        with span("report_findings"):
+            self._apply_tests(raw_text, findings, alerts)
+        
+        return {"extracted_data": findings, "alerts": alerts}
+
+    def _apply_tests(self, raw_text, findings, alerts):
         for name, config in self.tests.items():
             # Robust Regex Search
             match = re.search(config['pattern'], raw_text, re.IGNORECASE | re.DOTALL)
@@ -67,5 +83,3 @@ class MedicalReportAnalyzer:
                     "status": status,
                     "range": f"{config['min']}-{config['max']}"
                 })
-        
-        return {"extracted_data": findings, "alerts": alerts}
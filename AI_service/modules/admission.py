@@ -0,0 +1,208 @@
+# ai_service/modules/admission.py
+# Admission control for the service: per-client token buckets, per-class
+# concurrency limits with bounded queues, and priorities so cheap triage calls
+# are let through before OCR / pill uploads when the service is saturated.
+#
+# Every request path maps to an endpoint class. A request is
+#   1. charged its class cost against the client's token bucket (client =
+#      X-User-Id header when sent by a trusted proxy, i.e. the backend, else
+#      the peer address)                                    -> 429 when empty,
+#   2. queued for a slot of its class (FIFO, bounded)       -> 503 when full,
+#   3. queued for a slot of the shared pool, where waiting requests are
+#      served by class priority                             -> 503 on timeout.
+# Rejections are immediate and carry Retry-After plus X-RateLimit-* headers.
+
+import json
+import heapq
+import asyncio
+import itertools
+from time import monotonic
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .metrics import Counter, Histogram
+
+SHED = Counter("medicore_requests_shed_total", "Requests rejected by admission control",
+               ("endpoint_class", "reason"))
+QUEUE_WAIT = Histogram("medicore_admission_wait_seconds", "Time accepted requests waited for a slot",
+                       "endpoint_class")
+
+class EndpointClass:
+    def __init__(self, name, priority, concurrency, queue_size=16, max_wait=2.0, cost=1.0):
+        self.name = name
+        self.priority = priority      # lower is served first from the shared pool
+        self.cost = cost              # tokens charged per request
+        self.max_wait = max_wait      # seconds a request may wait for both slots together
+        self.queue_size = queue_size
+        self.slots = Slots(concurrency)
+
+# (path prefix, class name); first match wins, unmatched paths are not admitted/limited
+DEFAULT_ROUTES = (
+    ("/predict/", "triage"),
+    ("/analyze_report", "ocr"),
+    ("/jobs/reports", "ocr"),  # batch report uploads; job status polls stay unclassified
+    ("/identify_pill", "pill"),
+)
+
+def default_classes(pool_size=32, ocr_concurrency=2, pill_concurrency=2) -> Dict[str, EndpointClass]:
+    return {
+        "triage": EndpointClass("triage", priority=0, concurrency=pool_size, queue_size=256, max_wait=1.0, cost=1),
+        "pill": EndpointClass("pill", priority=1, concurrency=pill_concurrency, queue_size=8, max_wait=5.0, cost=3),
+        "ocr": EndpointClass("ocr", priority=2, concurrency=ocr_concurrency, queue_size=8, max_wait=10.0, cost=5),
+    }
+
+class Slots:
+    """Counting semaphore whose waiters are woken in (priority, arrival) order."""
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority=0, timeout: Optional[float] = None) -> bool:
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return True
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self.waiting += 1
+        granted = False
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout)
+            granted = True
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+            if not granted:
+                if fut.done() and not fut.cancelled():
+                    # Granted just as we gave up (or the client went away): hand the slot on
+                    self.release()
+                else:
+                    fut.cancel()
+
+    def release(self):
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(True)  # slot passes straight to the waiter
+                return
+        self.active -= 1
+
+class TokenBuckets:
+    """One bucket per client, least recently seen clients evicted past max_clients."""
+    def __init__(self, rate: float, burst: float, max_clients=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> [tokens, last refill]
+
+    def take(self, client: str, cost: float):
+        """(allowed, tokens left, seconds until `cost` tokens are available)."""
+        now = monotonic()
+        b = self._buckets.get(client)
+        if b is None:
+            b = self._buckets[client] = [self.burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+            b[1] = now
+        if b[0] >= cost:
+            b[0] -= cost
+            return True, b[0], 0.0
+        return False, b[0], (cost - b[0]) / self.rate
+
+def _client_key(scope, trusted=frozenset()) -> str:
+    """Bucket key: the X-User-Id header when the peer is a trusted proxy (the backend), else the peer address.
+
+    Anyone else could set the header to a new value per request and get a fresh bucket each time.
+    """
+    client = scope.get("client")
+    addr = client[0] if client else "unknown"
+    if addr in trusted:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-user-id" and value:
+                return "user:" + value.decode("latin-1")
+    return "addr:" + addr
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the policy above to HTTP requests."""
+    def __init__(self, app, classes: Optional[Dict[str, EndpointClass]] = None, routes=DEFAULT_ROUTES,
+                 pool_size=32, rate=10.0, burst=40.0, trusted_proxies=("127.0.0.1", "::1")):
+        self.app = app
+        self.trusted_proxies = frozenset(trusted_proxies)
+        self.classes = classes or default_classes(pool_size)
+        self.routes = routes
+        self.pool = Slots(pool_size)
+        self.buckets = TokenBuckets(rate, burst) if rate > 0 else None
+
+    def _classify(self, path: str) -> Optional[EndpointClass]:
+        for prefix, name in self.routes:
+            if path.startswith(prefix):
+                return self.classes.get(name)
+        return None
+
+    def _rate_headers(self, remaining) -> list:
+        return [(b"x-ratelimit-limit", str(int(self.buckets.burst)).encode()),
+                (b"x-ratelimit-remaining", str(int(remaining)).encode()),
+                (b"x-ratelimit-policy", f"{self.buckets.burst:g};w={self.buckets.burst / self.buckets.rate:g}".encode())]
+
+    async def _reject(self, send, status, cls, reason, retry_after, extra_headers=()):
+        SHED.inc(cls.name, reason)
+        body = json.dumps({"success": False, "error": reason.replace("_", " "),
+                           "retry_after": round(retry_after, 3)}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                   (b"retry-after", str(max(1, int(retry_after + 0.999))).encode()), *extra_headers]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        cls = None
+        if scope["type"] == "http" and scope["method"] != "OPTIONS":  # CORS preflights pass straight through
+            cls = self._classify(scope["path"])
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        rate_headers = []
+        if self.buckets is not None:
+            allowed, remaining, retry_after = self.buckets.take(_client_key(scope, self.trusted_proxies), cls.cost)
+            rate_headers = self._rate_headers(remaining)
+            if not allowed:
+                await self._reject(send, 429, cls, "rate_limited", retry_after,
+                                   rate_headers + [(b"x-ratelimit-reset", f"{retry_after:.3f}".encode())])
+                return
+
+        if cls.slots.waiting >= cls.queue_size:
+            await self._reject(send, 503, cls, "queue_full", cls.max_wait / 2, rate_headers)
+            return
+
+        t0 = monotonic()
+        if not await cls.slots.acquire(cls.priority, cls.max_wait):
+            await self._reject(send, 503, cls, "queue_timeout", cls.max_wait, rate_headers)
+            return
+        # from here on the class slot is held: released however the request ends (incl. cancellation
+        # while waiting for the pool)
+        pooled = False
+        try:
+            remaining_wait = cls.max_wait - (monotonic() - t0)
+            if not await self.pool.acquire(cls.priority, max(remaining_wait, 0.001)):
+                await self._reject(send, 503, cls, "queue_timeout", cls.max_wait, rate_headers)
+                return
+            pooled = True
+            QUEUE_WAIT.observe(cls.name, monotonic() - t0)
+
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start" and rate_headers:
+                    message = {**message, "headers": list(message.get("headers", [])) + rate_headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if pooled:
+                self.pool.release()
+            cls.slots.release()
@@ -0,0 +1,107 @@
+# ai_service/modules/deadline.py
+# Request deadlines for the slow image endpoints. A request's time budget comes
+# from the X-Request-Timeout-Ms header (the backend sends the timeout it will wait
+# for the answer) or from its endpoint's default, counted from when the request
+# reached the service, so time queued by admission control is spent from it too.
+#
+# DeadlineMiddleware keeps the request's Deadline in a context variable; handlers
+# pass it down to the stages that can stop early: per-page PDF OCR, the Tesseract
+# call itself (killed at the deadline) and pill inference. A stage the deadline
+# cut short is recorded on the Deadline with its expected cost (mean of its
+# recorded stage time), and the response carries what was done with
+# `partial: true`. The image workers run their stages against a copy of the
+# deadline and send back what they skipped with the result.
+#
+# medicore_deadline_cpu_seconds_saved_total is the estimate of work the service
+# did not do for clients that had already stopped waiting.
+
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from .metrics import Counter, STAGE_SECONDS
+
+HEADER = b"x-request-timeout-ms"
+
+SKIPPED = Counter("medicore_deadline_skipped_total", "Stages skipped or cut short by a request deadline", ("stage",))
+SAVED = Counter("medicore_deadline_cpu_seconds_saved_total",
+                "Estimated CPU-seconds not spent on work past its request deadline", ("stage",))
+
+# (path prefix, default budget in seconds); first match wins
+DEFAULT_ROUTES = (
+    ("/analyze_report", 60.0),
+    ("/identify_pill", 20.0),
+)
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("medicore_deadline", default=None)
+
+def expected_seconds(stage: str) -> float:
+    """Mean recorded duration of a stage in this process (0 before its first run)."""
+    count, total = STAGE_SECONDS.stats(stage)
+    return total / count if count else 0.0
+
+class Deadline:
+    __slots__ = ("budget", "expires", "skipped")
+
+    def __init__(self, seconds: float, start: Optional[float] = None):
+        self.budget = seconds
+        self.expires = (time.monotonic() if start is None else start) + seconds
+        self.skipped: List[Tuple[str, float]] = []  # (stage, estimated seconds saved)
+
+    def remaining(self) -> float:
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def skip(self, stage: str, units: int = 1, spent: float = 0.0):
+        """Record that `units` runs of `stage` were not done, or one was stopped after `spent` seconds."""
+        self.skipped.append((stage, max(expected_seconds(stage) * units - spent, 0.0)))
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.skipped)
+
+    def account(self):
+        for stage, seconds in self.skipped:
+            SKIPPED.inc(stage)
+            SAVED.inc(stage, amount=seconds)
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the request being handled (None outside DeadlineMiddleware or without a budget)."""
+    return _current.get()
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware starting each request's deadline; add it outermost so queueing counts."""
+    def __init__(self, app, routes=DEFAULT_ROUTES, max_seconds=300.0):
+        self.app = app
+        self.routes = routes
+        self.max_seconds = max_seconds
+
+    def _budget(self, scope) -> Optional[float]:
+        for name, value in scope.get("headers") or ():
+            if name == HEADER:
+                try:
+                    ms = float(value)
+                except ValueError:
+                    break
+                if ms > 0:
+                    return min(ms / 1000, self.max_seconds)
+                break
+        for prefix, seconds in self.routes:
+            if scope["path"].startswith(prefix):
+                return seconds
+        return None
+
+    async def __call__(self, scope, receive, send):
+        budget = self._budget(scope) if scope["type"] == "http" else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        deadline = Deadline(budget)
+        token = _current.set(deadline)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            deadline.account()
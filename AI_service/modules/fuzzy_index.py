@@ -0,0 +1,177 @@
+# ai_service/modules/fuzzy_index.py
+# Typo-tolerant lookup of symptom phrases ("headahce", "nausia", "stif neck").
+# Phrases from symptom_list.json and synonyms.json are indexed by character
+# trigram; a query only gets a bounded edit-distance check against phrases that
+# share enough trigrams and have a compatible length. Only tokens that exact
+# matching cannot explain are looked at, and matching stops at a per-call time
+# budget so a long text can't blow up request latency.
+
+import re
+from collections import defaultdict
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"[a-z]+")
+
+# (minimum query length, allowed edits), checked longest first
+DEFAULT_MAX_EDITS = ((4, 1), (7, 2))
+
+# Common words in patient text that sit within an edit or two of a symptom word
+STOPWORDS = frozenset("""
+    about after again also although always am and any are around been before being both
+    but came cannot come could days does doing done down during each every feel feeling
+    feels felt from getting going have having here into just last like little made make
+    many more morning most much near never night only other over really same since some
+    started still such than that their them then there these they thing think this those
+    though through today very want week weeks well were what when where which while with
+    would yesterday your
+""".split())
+
+def parse_max_edits(spec: str) -> Tuple[Tuple[int, int], ...]:
+    """"4:1,7:2" -> ((4, 1), (7, 2))"""
+    pairs = (part.split(":") for part in spec.split(",") if part.strip())
+    return tuple((int(n), int(k)) for n, k in pairs)
+
+def _trigrams(s: str) -> List[str]:
+    padded = f"  {s} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def bounded_distance(a: str, b: str, k: int) -> int:
+    """Optimal-string-alignment distance (adjacent transpositions count as one edit).
+
+    Returns k + 1 as soon as the distance is known to exceed k.
+    """
+    if abs(len(a) - len(b)) > k:
+        return k + 1
+    if a == b:
+        return 0
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        ca = a[i - 1]
+        for j in range(1, len(b) + 1):
+            cb = b[j - 1]
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > k:
+            return k + 1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= k else k + 1
+
+def vocabulary_phrases(symptom_list: Iterable[str], synonyms: Dict[str, List[str]]) -> Dict[str, str]:
+    """Lowercase, space-normalised phrase -> symptom id for the symptom list and synonyms."""
+    phrases = {}
+    for s in symptom_list or []:
+        phrases[" ".join(s.lower().replace("_", " ").split())] = s
+    for canon, variants in (synonyms or {}).items():
+        for v in list(variants) + [canon]:
+            phrases.setdefault(" ".join(v.lower().split()), canon)
+    return phrases
+
+class FuzzyIndex:
+    def __init__(self, phrases: Dict[str, str], max_edits=DEFAULT_MAX_EDITS, min_length=4, memo_size=50000):
+        """`phrases` maps a lowercase phrase ("stiff neck") to the symptom id it stands for."""
+        self.max_edits = sorted(max_edits, reverse=True)
+        self.min_length = min_length
+        self.phrases = list(phrases.items())
+        # Every word of every phrase: tokens in here are already explained by exact matching
+        self.known_words = {w for p, _ in self.phrases for w in p.split()}
+        # word -> {(phrase word count, position of the word)} for multi-word phrases
+        self._anchors = defaultdict(set)
+        for p, _ in self.phrases:
+            words = p.split()
+            if len(words) > 1:
+                for o, w in enumerate(words):
+                    self._anchors[w].add((len(words), o))
+        # word count -> trigram -> phrase ids
+        self._postings = defaultdict(lambda: defaultdict(list))
+        for pid, (phrase, _) in enumerate(self.phrases):
+            for g in set(_trigrams(phrase)):
+                self._postings[len(phrase.split())][g].append(pid)
+        # query -> (canonical, distance) or None; most lookups are repeats across requests
+        self._memo: Dict[str, Optional[Tuple[str, int]]] = {}
+        self._memo_size = memo_size
+
+    @classmethod
+    def from_vocabulary(cls, symptom_list: Iterable[str], synonyms: Dict[str, List[str]], **kwargs) -> "FuzzyIndex":
+        return cls(vocabulary_phrases(symptom_list, synonyms), **kwargs)
+
+    def allowed_edits(self, query: str) -> int:
+        n = len(query.replace(" ", ""))
+        for min_len, edits in self.max_edits:
+            if n >= min_len:
+                return edits
+        return 0
+
+    def lookup(self, query: str) -> Optional[Tuple[str, int]]:
+        """Best (canonical symptom, distance) for a 1..max_words word query, or None."""
+        if query in self._memo:
+            return self._memo[query]
+        k = self.allowed_edits(query)
+        best = None
+        if k:
+            postings = self._postings.get(len(query.split()))
+            if postings:
+                grams = _trigrams(query)
+                # Each edit destroys at most three trigrams
+                need = max(1, len(grams) - 3 * k)
+                shared = defaultdict(int)
+                for g in grams:
+                    for pid in postings.get(g, ()):
+                        shared[pid] += 1
+                for pid, count in shared.items():
+                    if count < need:
+                        continue
+                    phrase, canon = self.phrases[pid]
+                    d = bounded_distance(query, phrase, k)
+                    if d <= k and (best is None or d < best[1]):
+                        best = (canon, d)
+                        if d == 1:
+                            break
+        if len(self._memo) >= self._memo_size:
+            self._memo.clear()
+        self._memo[query] = best
+        return best
+
+    def _uncovered(self, token: str) -> bool:
+        return len(token) >= self.min_length and token not in self.known_words and token not in STOPWORDS
+
+    def match(self, text: str, budget_s: Optional[float] = None) -> Tuple[List[Dict], bool]:
+        """Fuzzy matches in lowercase text, and whether the time budget ran out.
+
+        Single tokens are tried when exact matching could not have explained
+        them. A multi-word window is only tried where one of its words is
+        spelled correctly at the same position in some phrase of that length
+        ("stif neck" is tried because "neck" ends two-word phrases), and only
+        if it also holds an unexplained token: a budget of one or two edits
+        can't repair every word of a phrase.
+        """
+        deadline = perf_counter() + budget_s if budget_s else None
+        tokens = TOKEN_RE.findall(text)
+        uncovered = [self._uncovered(t) for t in tokens]
+        n = len(tokens)
+        matches, seen, tried = [], set(), set()
+        for j, token in enumerate(tokens):
+            if deadline is not None and perf_counter() > deadline:
+                return matches, True
+            if uncovered[j]:
+                windows = [(j, 1)]
+            else:
+                windows = [(j - o, w) for w, o in self._anchors.get(token, ())
+                           if 0 <= j - o and j - o + w <= n]
+            for i, w in windows:
+                if (i, w) in tried or (w > 1 and not any(uncovered[i:i + w])):
+                    continue
+                tried.add((i, w))
+                query = " ".join(tokens[i:i + w])
+                hit = self.lookup(query)
+                if hit and hit[0] not in seen:
+                    seen.add(hit[0])
+                    matches.append({"text": query, "symptom": hit[0], "distance": hit[1]})
+        return matches, False
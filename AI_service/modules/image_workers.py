@@ -0,0 +1,281 @@
+# ai_service/modules/image_workers.py
+# Sidecar worker processes for the image workloads (pill identification and
+# report OCR). Each worker is a fresh interpreter (`python -m modules.image_workers`)
+# that imports torch / cv2 / pytesseract and loads the pill model, so the API
+# process never does: it stays small and cheap to fork, and a crash or a runaway
+# in Tesseract or torch takes down one worker (replaced on the spot), not triage.
+#
+# Handoff: every worker owns a shared memory slab (an anonymous memfd, or an
+# unlinked temp file where memfd_create is missing) mapped by both processes.
+# The API process copies the upload into the slab and sends only (kind, size,
+# seconds left of the request deadline) over a socketpair Connection; the worker reads the image from its mapping and
+# answers with a small pickled dict. The slab grows (ftruncate + remap) when an
+# image does not fit.
+#
+# A task with a deadline (modules/deadline.py) runs against a copy of it in the
+# worker, whose stages stop early and report what they skipped; the API process
+# waits DEADLINE_GRACE past the deadline for that partial answer before it kills
+# the worker.
+#
+# A pool belongs to the process that started it; after a fork (prefork.py
+# workers) the child starts its own on first use.
+
+import os
+import sys
+import mmap
+import time
+import queue
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from io import BytesIO
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional
+
+from .metrics import Counter, span
+from .deadline import Deadline
+from .memstats import read_memory
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEADLINE_GRACE = 1.0  # seconds
+
+EVENTS = Counter("medicore_image_worker_events_total", "Image worker tasks, failures and restarts", ("event",))
+
+def _shared_fd(size: int) -> int:
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("medicore-image")
+    else:
+        with tempfile.TemporaryFile() as f:
+            fd = os.dup(f.fileno())
+    os.ftruncate(fd, size)
+    return fd
+
+class _Worker:
+    """API-side handle of one worker process: its process, channel and slab."""
+
+    def __init__(self, model_dir: str, slab_bytes: int, preload: bool):
+        self.fd = _shared_fd(slab_bytes)
+        self.slab = mmap.mmap(self.fd, slab_bytes)
+        parent, child = socket.socketpair()
+        cmd = [sys.executable, "-m", "modules.image_workers", "--conn-fd", str(child.fileno()),
+               "--slab-fd", str(self.fd), "--model-dir", model_dir]
+        if preload:
+            cmd.append("--preload")
+        try:
+            self.proc = subprocess.Popen(cmd, cwd=SERVICE_DIR, pass_fds=(child.fileno(), self.fd))
+        finally:
+            child.close()
+        self.conn = Connection(parent.detach())
+        self.tasks = 0
+        self.info = {}
+
+    def call(self, kind: str, data: bytes, timeout: float, budget: Optional[float] = None) -> Dict:
+        n = len(data)
+        if n > len(self.slab):
+            size = max(n, 2 * len(self.slab))
+            os.ftruncate(self.fd, size)
+            self.slab.close()
+            self.slab = mmap.mmap(self.fd, size)
+        self.slab[:n] = data
+        self.conn.send((kind, n, budget))
+        deadline = time.monotonic() + timeout
+        while True:
+            if not self.conn.poll(max(deadline - time.monotonic(), 0)):
+                raise TimeoutError(f"image worker did not answer within {timeout:.0f}s")
+            status, payload = self.conn.recv()
+            if status == "ready":
+                self.info = payload
+                continue
+            self.tasks += 1
+            if status == "error":
+                raise RuntimeError(payload)
+            return payload
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def stop(self, timeout=5.0):
+        self.conn.close()  # the worker exits on EOF
+        try:
+            self.proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.slab.close()
+        os.close(self.fd)
+
+    def kill(self):
+        if self.alive():
+            self.proc.kill()
+        self.stop()
+
+class ImageWorkerPool:
+    def __init__(self, workers=2, model_dir=None, task_timeout=120.0, slab_bytes=4 * 1024 * 1024, preload=True):
+        self.size = workers
+        self.model_dir = model_dir or os.path.join(SERVICE_DIR, "models")
+        self.task_timeout = task_timeout
+        self.slab_bytes = slab_bytes
+        self.preload = preload
+        self._lock = threading.Lock()
+        self._pid = None
+        self._workers: List[_Worker] = []
+        self._idle = queue.Queue()
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self.model_dir, self.slab_bytes, self.preload)
+
+    def start(self) -> "ImageWorkerPool":
+        """Launch the workers (no-op if this process already did); they load their models in the background."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return self
+            # first start, or a pool inherited across fork: the parent's workers are not ours to use
+            self._pid = os.getpid()
+            self._workers = [self._spawn() for _ in range(self.size)]
+            self._idle = queue.Queue()
+            for w in self._workers:
+                self._idle.put(w)
+        return self
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        new = self._spawn()
+        with self._lock:
+            self._workers = [new if w is worker else w for w in self._workers]
+        EVENTS.inc("restart")
+        return new
+
+    def run(self, kind: str, data: bytes, timeout: Optional[float] = None,
+            deadline: Optional[Deadline] = None) -> Dict:
+        """Run one task ("pill" or "ocr") on a free worker (blocking; waits for one when all are busy).
+
+        With a deadline, what the worker skipped is added to it; a worker still busy
+        DEADLINE_GRACE past it is killed and the whole task counts as skipped.
+        """
+        self.start()
+        timeout = self.task_timeout if timeout is None else timeout
+        worker = self._idle.get()
+        t0 = time.perf_counter()
+        budget = None
+        try:
+            if not worker.alive():
+                worker = self._replace(worker)
+            if deadline is not None:
+                budget = deadline.remaining()
+                timeout = min(timeout, budget + DEADLINE_GRACE)
+            with span("image_worker"):
+                result = worker.call(kind, data, timeout, budget)
+            if deadline is not None:
+                deadline.skipped.extend(tuple(s) for s in result.pop("skipped", ()))
+            EVENTS.inc("task")
+            return result
+        except TimeoutError:
+            EVENTS.inc("timeout")
+            worker = self._replace(worker)
+            if budget is not None and timeout < self.task_timeout:
+                deadline.skip("image_worker", spent=time.perf_counter() - t0)
+            raise
+        except (EOFError, OSError):
+            code = worker.proc.poll()
+            EVENTS.inc("crash")
+            worker = self._replace(worker)
+            raise RuntimeError(f"image worker crashed (exit code {code})")
+        except RuntimeError:
+            EVENTS.inc("error")
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def alive(self) -> int:
+        return sum(w.alive() for w in self._workers)
+
+    def close(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            for w in self._workers:
+                w.stop()
+            self._workers, self._pid = [], None
+
+    def stats(self) -> Dict:
+        workers = []
+        for w in list(self._workers):
+            mem = read_memory(w.proc.pid) if w.alive() else {}
+            workers.append({"pid": w.proc.pid, "alive": w.alive(), "tasks": w.tasks, "slab_bytes": len(w.slab),
+                            "load_seconds": w.info.get("load_seconds"), "rss": mem.get("rss"), "uss": mem.get("uss")})
+        return {"workers": workers, "busy": len(self._workers) - self._idle.qsize(),
+                **{e: EVENTS.get(e) for e in ("task", "error", "crash", "timeout", "restart")}}
+
+# ----------------------------------------------------------------------------
+# Worker process
+# ----------------------------------------------------------------------------
+class _Handlers:
+    def __init__(self, model_dir: str, preload: bool):
+        self.model_dir = model_dir
+        self._pill = None
+        self._ocr = None
+        if preload:
+            self.pill_model()
+            self.ocr_backend()
+
+    def pill_model(self):
+        if self._pill is None:
+            from .pill_model import PillModel
+            self._pill = PillModel(self.model_dir)
+        return self._pill
+
+    def ocr_backend(self):
+        if self._ocr is None:
+            from .report_pipeline import load_ocr_backend
+            self._ocr = load_ocr_backend()
+        return self._ocr
+
+    def run(self, kind: str, data: bytes, deadline: Optional[Deadline] = None) -> Dict:
+        if kind == "pill":
+            return self.pill_model().infer(BytesIO(data), deadline)
+        if kind == "ocr":
+            from .report_pipeline import ocr_report
+            return ocr_report(data, self.ocr_backend(), deadline)
+        if kind == "memory":
+            return read_memory()
+        raise ValueError(f"unknown image task: {kind}")
+
+def serve(conn_fd: int, slab_fd: int, model_dir: str, preload: bool):
+    # Ctrl-C reaches the whole process group; the worker stops when the API process closes the channel
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    conn = Connection(conn_fd)
+    slab = mmap.mmap(slab_fd, os.fstat(slab_fd).st_size)
+    t0 = time.perf_counter()
+    handlers = _Handlers(model_dir, preload)
+    conn.send(("ready", {"pid": os.getpid(), "load_seconds": time.perf_counter() - t0}))
+    while True:
+        try:
+            kind, size, budget = conn.recv()
+        except (EOFError, OSError):
+            return
+        if size > len(slab):
+            # the API process grew the slab for a bigger image
+            slab.close()
+            slab = mmap.mmap(slab_fd, os.fstat(slab_fd).st_size)
+        deadline = Deadline(budget) if budget is not None else None
+        try:
+            result = handlers.run(kind, slab[:size], deadline)
+            if deadline is not None and deadline.skipped:
+                result["skipped"] = deadline.skipped
+            reply = ("ok", result)
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        conn.send(reply)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MediCore image worker (started by ImageWorkerPool)")
+    parser.add_argument("--conn-fd", type=int, required=True)
+    parser.add_argument("--slab-fd", type=int, required=True)
+    parser.add_argument("--model-dir", required=True)
+    parser.add_argument("--preload", action="store_true")
+    args = parser.parse_args()
+    serve(args.conn_fd, args.slab_fd, args.model_dir, args.preload)
@@ -0,0 +1,237 @@
+# ai_service/modules/jobs.py
+# Bulk report-analysis jobs. A job is a batch of report images (uploaded bytes
+# or paths on the service host); its items are queued in SQLite so they survive
+# a restart, and a dispatcher thread feeds them to a process pool running
+# report_pipeline.analyze_report_bytes. Callers poll /jobs/{id} and page
+# through /jobs/{id}/results. An error in the dispatcher loop itself (e.g. the
+# database is locked or the disk is full) is logged and counted, and the loop
+# backs off and carries on; /ready shows whether the thread is still alive.
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import ERRORS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    name TEXT,
+    path TEXT,
+    content BLOB,
+    status TEXT NOT NULL DEFAULT 'pending',
+    result TEXT,
+    error TEXT,
+    seconds REAL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS items_pending ON items(status) WHERE status IN ('pending', 'running');
+"""
+
+def run_item(path: Optional[str], content: Optional[bytes]) -> Tuple[Dict, float]:
+    """Executed in a pool worker: analyse one report, return (result, seconds)."""
+    from modules.report_pipeline import analyze_report_bytes
+    t0 = time.perf_counter()
+    if content is None:
+        with open(path, "rb") as f:
+            content = f.read()
+    result = analyze_report_bytes(content)
+    return result, time.perf_counter() - t0
+
+class JobStore:
+    """SQLite-backed job/item queue. One connection, serialised by a lock."""
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def create_job(self, items: List[Dict]) -> str:
+        """items: [{"name", "path"} or {"name", "content"}] -> job id."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("INSERT INTO jobs (id, created, total) VALUES (?, ?, ?)", (job_id, time.time(), len(items)))
+            self._db.executemany(
+                "INSERT INTO items (job_id, idx, name, path, content) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, i, it.get("name"), it.get("path"), it.get("content")) for i, it in enumerate(items)])
+            self._db.execute("COMMIT")
+        return job_id
+
+    def requeue_running(self) -> int:
+        """Items that were in flight when the service stopped go back to the queue."""
+        with self._lock:
+            return self._db.execute("UPDATE items SET status = 'pending' WHERE status = 'running'").rowcount
+
+    def claim(self, n: int) -> List[tuple]:
+        """Mark up to n pending items running, oldest submission first."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                "SELECT rowid, job_id, idx, path, content FROM items WHERE status = 'pending' ORDER BY rowid LIMIT ?",
+                (n,)).fetchall()
+            if rows:
+                now = time.time()
+                self._db.executemany("UPDATE items SET status = 'running' WHERE rowid = ?", [(r[0],) for r in rows])
+                self._db.executemany("UPDATE jobs SET started = ? WHERE id = ? AND started IS NULL",
+                                     [(now, job_id) for job_id in {r[1] for r in rows}])
+            self._db.execute("COMMIT")
+        return [r[1:] for r in rows]
+
+    def finish(self, job_id: str, idx: int, result: Optional[Dict], error: Optional[str], seconds: float):
+        status = "done" if error is None else "failed"
+        with self._lock:
+            self._db.execute("BEGIN")
+            # The upload is no longer needed once analysed
+            self._db.execute("UPDATE items SET status = ?, result = ?, error = ?, seconds = ?, content = NULL "
+                             "WHERE job_id = ? AND idx = ?",
+                             (status, json.dumps(result) if result is not None else None, error, seconds, job_id, idx))
+            self._db.execute(f"UPDATE jobs SET {status} = {status} + 1, finished = CASE WHEN done + failed + 1 >= total "
+                             "THEN ? ELSE finished END WHERE id = ?", (time.time(), job_id))
+            self._db.execute("COMMIT")
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT id, created, started, finished, total, done, failed FROM jobs WHERE id = ?",
+                                   (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(zip(("job_id", "created", "started", "finished", "total", "done", "failed"), row))
+        processed = job["done"] + job["failed"]
+        job["status"] = "completed" if processed >= job["total"] else ("running" if job["started"] else "queued")
+        job["progress"] = processed / job["total"] if job["total"] else 1.0
+        elapsed = (job["finished"] or time.time()) - job["started"] if job["started"] else 0
+        job["reports_per_minute"] = processed * 60 / elapsed if elapsed > 0 else None
+        return job
+
+    def results(self, job_id: str, offset=0, limit=50) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, name, status, result, error, seconds FROM items WHERE job_id = ? "
+                "ORDER BY idx LIMIT ? OFFSET ?", (job_id, limit, offset)).fetchall()
+        return [{"index": idx, "name": name, "status": status, "data": json.loads(result) if result else None,
+                 "error": error, "seconds": seconds} for idx, name, status, result, error, seconds in rows]
+
+    def backlog(self) -> Dict:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM items WHERE status IN ('pending', 'running') "
+                                    "GROUP BY status").fetchall()
+        return dict(rows)
+
+class JobRunner:
+    """Dispatcher thread keeping a spawn-context process pool busy with queued items.
+
+    With dispatch=False only the store is used: jobs are queued and read here and run
+    by the one process sharing the database that dispatches (see prefork.py).
+    """
+    def __init__(self, store: JobStore, workers: Optional[int] = None, in_flight_per_worker=2, dispatch=True,
+                 max_backoff=30.0):
+        self.store = store
+        self.dispatch = dispatch
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = self.workers * in_flight_per_worker
+        self.max_backoff = max_backoff
+        self.errors = 0
+        self.last_error = None
+        self._wakeup = threading.Event()
+        self._stop = False
+        self._thread = None
+        self._pool = None
+
+    def start(self):
+        if self._thread is not None or not self.dispatch:
+            return
+        requeued = self.store.requeue_running()
+        if requeued:
+            print(f"Requeued {requeued} report job items interrupted by the last shutdown")
+        self._pool = self._new_pool()
+        self._thread = threading.Thread(target=self._run, name="report-jobs", daemon=True)
+        self._thread.start()
+
+    def _new_pool(self):
+        # spawn: workers must not inherit the server's threads, sockets or loaded models
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def notify(self):
+        self._wakeup.set()
+
+    def alive(self) -> bool:
+        """Whether queued items are being run: the dispatcher thread is up (always True without dispatch)."""
+        return not self.dispatch or (self._thread is not None and self._thread.is_alive())
+
+    def close(self):
+        self._stop = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _run(self):
+        in_flight = {}
+        backoff = 0.0
+        while not self._stop:
+            try:
+                self._step(in_flight)
+                backoff = 0.0
+            except Exception as e:
+                traceback.print_exc()
+                ERRORS.inc("report_jobs_dispatcher")
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                backoff = min(max(backoff * 2, 0.5), self.max_backoff)
+                self._wakeup.wait(timeout=backoff)
+                self._wakeup.clear()
+
+    def _step(self, in_flight: Dict):
+        """One dispatcher pass: top up the pool from the queue, record what finished."""
+        free = self.max_in_flight - len(in_flight)
+        if free > 0:
+            for job_id, idx, path, content in self.store.claim(free):
+                in_flight[self._pool.submit(run_item, path, content)] = (job_id, idx)
+        if not in_flight:
+            self._wakeup.wait(timeout=1.0)
+            self._wakeup.clear()
+            return
+        finished, _ = wait(list(in_flight), timeout=0.5, return_when=FIRST_COMPLETED)
+        broken = False
+        for fut in finished:
+            job_id, idx = in_flight[fut]
+            try:
+                result, seconds = fut.result()
+                outcome = (result, None, seconds)
+            except BrokenProcessPool as e:
+                # A worker died (e.g. OCR crashed); every item it took down fails, the rest carry on
+                broken = True
+                outcome = (None, f"worker crashed: {e}", 0.0)
+            except Exception as e:
+                outcome = (None, f"{type(e).__name__}: {e}", 0.0)
+            # dropped from in_flight only once recorded, so a failed write is retried on the next pass
+            self.store.finish(job_id, idx, *outcome)
+            del in_flight[fut]
+        if broken:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
@@ -0,0 +1,235 @@
+# ai_service/modules/knowledge_bundle.py
+# Precompiled knowledge bundle. symptom_list.json, synonyms.json, red_flags.json,
+# medicine_rules.json and the served model's feature columns are compiled offline
+# (training_scripts/build_knowledge_bundle.py) into one binary file, which the
+# service memory-maps and verifies with a single checksum instead of parsing and
+# normalising the JSON files at startup.
+#
+# Every string (symptom ids, matching terms, diseases, advice, actions, model
+# features) is stored once in a string table. Tables refer to strings by their
+# index in it (interned ids) as little-endian u32 arrays read straight off the map.
+#
+# Layout:
+#   header     magic "MCKB" | u16 version | u16 section count | u32 crc32(rest of file) | u64 size of the rest
+#   directory  per section: 16-byte name | u64 offset | u64 length (offsets from the end of the directory)
+#   payload    the sections:
+#     meta                               JSON: build time, source file checksums, model fingerprint
+#                                        (artifact size and crc32: the feature columns are used only with it)
+#     strings                            utf-8, NUL separated
+#     symptoms                           symptom_list.json, in order
+#     term_text / term_symptom           exact-match term -> symptom (normalize_text)
+#     phrase_text / phrase_symptom       normalised phrase -> symptom (fuzzy index)
+#     synonym_canon / synonym_variant    synonyms.json, flattened
+#     red_flag_key / red_flag_action     red_flags.json
+#     medicine_disease / medicine_offsets / medicine_advice
+#                                        medicine_rules.json as CSR: advice[offsets[i]:offsets[i + 1]]
+#     feature_names                      string id of each model feature column
+
+import os
+import json
+import mmap
+import time
+import zlib
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .fuzzy_index import vocabulary_phrases
+
+MAGIC = b"MCKB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIQ")
+SECTION = struct.Struct("<16sQQ")
+
+SOURCES = ("symptom_list.json", "synonyms.json", "red_flags.json", "medicine_rules.json")
+
+def match_terms(symptom_list, synonyms) -> List[Tuple[str, str]]:
+    """(substring, symptom id) pairs the exact extraction stages look for in lowercased text."""
+    terms = {}
+    for s in symptom_list or []:
+        # Symptom in list: "stiff_neck", Text: "I have a stiff neck"
+        terms.setdefault((s.replace("_", " "), s), None)
+        terms.setdefault((s, s), None)
+    for canon, variants in (synonyms or {}).items():
+        for v in list(variants) + [canon]:
+            terms.setdefault((v, canon), None)
+    return list(terms)
+
+def _file_checksum(path: str) -> Optional[List[int]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    return [len(data), zlib.crc32(data)]
+
+def _load_json(path: str):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# ----------------------------------------------------------------------------
+# Building (offline)
+# ----------------------------------------------------------------------------
+class _Strings:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def __call__(self, s: str) -> int:
+        i = self.ids.get(s)
+        if i is None:
+            if "\0" in s:
+                raise ValueError(f"NUL byte in knowledge string {s!r}")
+            i = self.ids[s] = len(self.ids)
+        return i
+
+    def blob(self) -> bytes:
+        return "\0".join(self.ids).encode("utf-8")
+
+def build_bundle(knowledge_dir: str, feature_names: Optional[List[str]] = None,
+                 model_fingerprint: Optional[Dict] = None) -> bytes:
+    """Compile the knowledge files (and optionally the model's feature columns) into bundle bytes.
+
+    ValueError for content the bundle can't represent, rather than leaving it out.
+    """
+    symptom_list = _load_json(os.path.join(knowledge_dir, "symptom_list.json")) or []
+    if not isinstance(symptom_list, list):
+        raise ValueError(f"symptom_list.json: expected a list of symptom ids, got {type(symptom_list).__name__}")
+    synonyms = _load_json(os.path.join(knowledge_dir, "synonyms.json"))
+    red_flags = _load_json(os.path.join(knowledge_dir, "red_flags.json"))
+    medicine_rules = _load_json(os.path.join(knowledge_dir, "medicine_rules.json"))
+    not_lists = [d for d, items in medicine_rules.items() if not isinstance(items, list)]
+    if not_lists:
+        raise ValueError(f"medicine_rules.json: advice must be a list of strings (not for {', '.join(not_lists)})")
+
+    sid = _Strings()
+    u32 = lambda ids: np.asarray(ids, dtype="<u4").tobytes()
+    sections = {}
+    sections["symptoms"] = u32([sid(s) for s in symptom_list])
+    terms = match_terms(symptom_list, synonyms)
+    sections["term_text"] = u32([sid(t) for t, _ in terms])
+    sections["term_symptom"] = u32([sid(s) for _, s in terms])
+    phrases = vocabulary_phrases(symptom_list, synonyms)
+    sections["phrase_text"] = u32([sid(p) for p in phrases])
+    sections["phrase_symptom"] = u32([sid(s) for s in phrases.values()])
+    pairs = [(canon, v) for canon, variants in synonyms.items() for v in variants]
+    empty = [canon for canon, variants in synonyms.items() if not variants]
+    sections["synonym_canon"] = u32([sid(c) for c, _ in pairs] + [sid(c) for c in empty])
+    # an empty group is kept as a canon with no variant (id 0xFFFFFFFF)
+    sections["synonym_variant"] = u32([sid(v) for _, v in pairs] + [0xFFFFFFFF] * len(empty))
+    sections["red_flag_key"] = u32([sid(k) for k in red_flags])
+    sections["red_flag_action"] = u32([sid(v) for v in red_flags.values()])
+    offsets, advice = [0], []
+    for disease, items in medicine_rules.items():
+        advice += [sid(a) for a in items]
+        offsets.append(len(advice))
+    sections["medicine_disease"] = u32([sid(d) for d in medicine_rules])
+    sections["medicine_offsets"] = u32(offsets)
+    sections["medicine_advice"] = u32(advice)
+    sections["feature_names"] = u32([sid(f) for f in feature_names or []])
+    sections["strings"] = sid.blob()
+    sections["meta"] = json.dumps({
+        "version": VERSION,
+        "built_at": time.time(),
+        "sources": {name: _file_checksum(os.path.join(knowledge_dir, name)) for name in SOURCES},
+        "model": model_fingerprint,
+        "counts": {"strings": len(sid.ids), "symptoms": len(symptom_list), "terms": len(terms),
+                   "phrases": len(phrases), "red_flags": len(red_flags), "medicine_rules": len(medicine_rules),
+                   "features": len(feature_names or [])},
+    }).encode("utf-8")
+
+    directory, payload, off = [], [], 0
+    for name, data in sections.items():
+        directory.append(SECTION.pack(name.encode("ascii"), off, len(data)))
+        payload.append(data)
+        off += len(data)
+        pad = -off % 4  # keep u32 arrays aligned
+        payload.append(b"\0" * pad)
+        off += pad
+    body = b"".join(directory) + b"".join(payload)
+    return HEADER.pack(MAGIC, VERSION, len(sections), zlib.crc32(body), len(body)) + body
+
+def write_bundle(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+# ----------------------------------------------------------------------------
+# Loading (service)
+# ----------------------------------------------------------------------------
+class KnowledgeBundle:
+    """Knowledge tables decoded from a bundle file (see the layout above)."""
+
+    @classmethod
+    def load(cls, path: str) -> "KnowledgeBundle":
+        """Map, checksum and decode a bundle; ValueError if it is not a valid bundle."""
+        t0 = time.perf_counter()
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < HEADER.size:
+                raise ValueError("truncated knowledge bundle")
+            magic, version, n_sections, crc, size = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                raise ValueError("not a knowledge bundle")
+            if version != VERSION:
+                raise ValueError(f"knowledge bundle version {version}, expected {VERSION}")
+            if HEADER.size + size != len(mm):
+                raise ValueError("truncated knowledge bundle")
+            view = memoryview(mm)
+            try:
+                ok = zlib.crc32(view[HEADER.size:]) == crc
+            finally:
+                view.release()
+            if not ok:
+                raise ValueError("knowledge bundle checksum mismatch")
+            base = HEADER.size + n_sections * SECTION.size
+            sections = {}
+            for i in range(n_sections):
+                name, off, length = SECTION.unpack_from(mm, HEADER.size + i * SECTION.size)
+                sections[name.rstrip(b"\0").decode("ascii")] = (base + off, length)
+
+            def raw(name) -> bytes:
+                off, length = sections[name]
+                return mm[off:off + length]
+
+            def ids(name) -> List[int]:
+                off, length = sections[name]
+                return np.frombuffer(mm, dtype="<u4", count=length // 4, offset=off).tolist()
+
+            bundle = cls()
+            bundle.path = path
+            bundle.meta = json.loads(raw("meta"))
+            strings = raw("strings").decode("utf-8").split("\0")
+            bundle.strings = strings
+            bundle.symptom_list = [strings[i] for i in ids("symptoms")]
+            bundle.match_terms = [(strings[t], strings[s]) for t, s in zip(ids("term_text"), ids("term_symptom"))]
+            bundle.fuzzy_phrases = {strings[p]: strings[s] for p, s in zip(ids("phrase_text"), ids("phrase_symptom"))}
+            synonyms = {}
+            for c, v in zip(ids("synonym_canon"), ids("synonym_variant")):
+                group = synonyms.setdefault(strings[c], [])
+                if v != 0xFFFFFFFF:
+                    group.append(strings[v])
+            bundle.synonyms = synonyms
+            bundle.red_flags = {strings[k]: strings[a] for k, a in zip(ids("red_flag_key"), ids("red_flag_action"))}
+            offsets, advice = ids("medicine_offsets"), ids("medicine_advice")
+            bundle.medicine_rules = {strings[d]: [strings[a] for a in advice[offsets[i]:offsets[i + 1]]]
+                                     for i, d in enumerate(ids("medicine_disease"))}
+            bundle.feature_names = [strings[i] for i in ids("feature_names")]
+        bundle.load_seconds = time.perf_counter() - t0
+        return bundle
+
+    def stale_sources(self, knowledge_dir: str) -> List[str]:
+        """Knowledge files whose contents differ from what the bundle was built from."""
+        recorded = self.meta.get("sources", {})
+        return [name for name in SOURCES if _file_checksum(os.path.join(knowledge_dir, name)) != recorded.get(name)]
+
+    def features_for(self, model_path: str, vect) -> Optional[List[str]]:
+        """The bundled feature columns if they were built from this very model artifact, else None."""
+        fp = self.meta.get("model") or {}
+        vocab = getattr(vect, "vocabulary_", None)
+        if not self.feature_names or vocab is None or not fp.get("checksum"):
+            return None
+        if len(vocab) != len(self.feature_names) or _file_checksum(model_path) != fp["checksum"]:
+            return None
+        return self.feature_names
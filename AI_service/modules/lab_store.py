@@ -0,0 +1,175 @@
+# ai_service/modules/lab_store.py
+# Longitudinal store of lab values extracted from reports (/analyze_report with a
+# patient_id, or any MedicalReportAnalyzer result), for per-patient trends.
+#
+# Values live in one SQLite table clustered on (patient_id, test, taken_at): it
+# is a WITHOUT ROWID table whose primary key is that tuple, so each patient's
+# series for a test is stored contiguously in date order and a trend query is
+# one range scan. Queries pull the columns (date, value, range, flag) into numpy
+# arrays and compute slopes, deltas and out-of-range streaks for all of a
+# patient's tests at once.
+
+import os
+import re
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lab_results (
+    patient_id TEXT NOT NULL,
+    test TEXT NOT NULL,
+    taken_at REAL NOT NULL,      -- unix seconds: report date, else when it was analysed
+    report_id TEXT NOT NULL,
+    value REAL NOT NULL,
+    unit TEXT,
+    ref_low REAL,
+    ref_high REAL,
+    flag INTEGER,                -- -1 low, 0 in range, 1 high, NULL unknown
+    PRIMARY KEY (patient_id, test, taken_at, report_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lab_results_report ON lab_results(report_id);
+"""
+
+DAY = 86400.0
+_RANGE = re.compile(r"(-?\d+(?:\.\d+)?)\s*(?:-|–|to)\s*(-?\d+(?:\.\d+)?)")
+_FLAGS = {"low": -1, "normal": 0, "high": 1, "critical": 1}
+
+def parse_reference(reference) -> tuple:
+    """(low, high) from "13.5-17.5" / "13.5 - 17.5" / "150 to 450"; (None, None) otherwise."""
+    m = _RANGE.search(str(reference or ""))
+    return (float(m.group(1)), float(m.group(2))) if m else (None, None)
+
+def findings_of(result: Dict) -> List[Dict]:
+    """Findings of a report_pipeline result ("findings") or a MedicalReportAnalyzer one ("extracted_vitals")."""
+    return result.get("findings") or result.get("extracted_vitals") or []
+
+def _row(patient_id, taken_at, report_id, finding) -> Optional[tuple]:
+    try:
+        value = float(finding["value"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    low, high = parse_reference(finding.get("reference"))
+    if low is not None and high is not None:
+        flag = -1 if value < low else (1 if value > high else 0)
+    else:
+        flag = _FLAGS.get(str(finding.get("status", "")).lower())
+    return (patient_id, str(finding["test"]), taken_at, report_id, value, finding.get("unit"), low, high, flag)
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """Lengths of the runs of True in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+def series_stats(taken_at: np.ndarray, values: np.ndarray, flags: np.ndarray) -> Dict:
+    """Trend, deltas and out-of-range streaks of one date-ordered series."""
+    n = len(values)
+    out = (flags != 0) & ~np.isnan(flags)  # values without a range or status never count
+    runs = _runs(out)
+    trailing = n - 1 - np.flatnonzero(~out)[-1] if not out.all() else n
+    stats = {
+        "count": int(n),
+        "first_at": float(taken_at[0]),
+        "last_at": float(taken_at[-1]),
+        "last_value": float(values[-1]),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "delta": float(values[-1] - values[-2]) if n > 1 else None,
+        "delta_from_first": float(values[-1] - values[0]) if n > 1 else None,
+        "out_of_range": int(out.sum()),
+        "current_streak": int(trailing),
+        "longest_streak": int(runs.max()) if len(runs) else 0,
+        "last_flag": None if np.isnan(flags[-1]) else int(flags[-1]),
+    }
+    days = (taken_at - taken_at[0]) / DAY
+    if n > 1 and np.ptp(days) > 0:
+        # least-squares slope, per 30 days
+        d = days - days.mean()
+        stats["slope_per_30d"] = float((d * (values - values.mean())).sum() / (d * d).sum() * 30)
+    else:
+        stats["slope_per_30d"] = None
+    return stats
+
+class LabStore:
+    """SQLite-backed lab values. One connection, serialised by a lock."""
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def add_report(self, patient_id: str, findings: Iterable[Dict], taken_at: Optional[float] = None,
+                   report_id: Optional[str] = None) -> int:
+        """Store one report's findings; returns how many values were stored. Re-adding a report replaces it."""
+        taken_at = time.time() if taken_at is None else float(taken_at)
+        report_id = report_id or uuid.uuid4().hex
+        rows = [r for r in (_row(patient_id, taken_at, report_id, f) for f in findings) if r is not None]
+        with self._lock:
+            self._db.execute("BEGIN")
+            # whatever an earlier version of the report stored, whatever its date or tests
+            self._db.execute("DELETE FROM lab_results WHERE patient_id = ? AND report_id = ?", (patient_id, report_id))
+            self._db.executemany("INSERT OR REPLACE INTO lab_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+        return len(rows)
+
+    def delete_patient(self, patient_id: str) -> int:
+        with self._lock:
+            return self._db.execute("DELETE FROM lab_results WHERE patient_id = ?", (patient_id,)).rowcount
+
+    def trends(self, patient_id: str, tests: Optional[List[str]] = None, since: Optional[float] = None,
+               until: Optional[float] = None, points: int = 0) -> Dict[str, Dict]:
+        """{test: stats} for a patient (see series_stats), with the last `points` values per test when asked."""
+        sql = "SELECT test, taken_at, value, ref_low, ref_high, flag, unit FROM lab_results WHERE patient_id = ?"
+        args = [patient_id]
+        if tests:
+            sql += f" AND test IN ({','.join('?' * len(tests))})"
+            args += list(tests)
+        if since is not None:
+            sql += " AND taken_at >= ?"
+            args.append(since)
+        if until is not None:
+            sql += " AND taken_at <= ?"
+            args.append(until)
+        # primary key order: one range scan, already grouped by test and sorted by date
+        sql += " ORDER BY test, taken_at"
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        if not rows:
+            return {}
+        test_col, taken_col, value_col, low_col, high_col, flag_col, unit_col = zip(*rows)
+        taken_at = np.fromiter(taken_col, dtype=float, count=len(rows))
+        values = np.fromiter(value_col, dtype=float, count=len(rows))
+        flags = np.array(flag_col, dtype=float)  # None -> NaN
+        names = np.array(test_col, dtype=object)
+        starts = np.flatnonzero(np.concatenate(([True], names[1:] != names[:-1])))
+        ends = np.append(starts[1:], len(rows))
+        out = {}
+        for s, e in zip(starts, ends):
+            stats = series_stats(taken_at[s:e], values[s:e], flags[s:e])
+            stats["unit"] = unit_col[e - 1]
+            stats["reference"] = [low_col[e - 1], high_col[e - 1]] if low_col[e - 1] is not None else None
+            if points:
+                first = max(s, e - points)
+                stats["points"] = [{"taken_at": float(t), "value": float(v),
+                                    "flag": None if np.isnan(f) else int(f)}
+                                   for t, v, f in zip(taken_at[first:e], values[first:e], flags[first:e])]
+            out[names[s]] = stats
+        return out
+
+    def stats(self) -> Dict:
+        with self._lock:
+            values, patients, reports = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT patient_id), COUNT(DISTINCT report_id) FROM lab_results").fetchone()
+        return {"values": values, "patients": patients, "reports": reports}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
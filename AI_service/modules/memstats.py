@@ -0,0 +1,34 @@
+# ai_service/modules/memstats.py
+# Per-process memory figures from /proc (Linux). USS (unique set size) is the
+# memory that would be freed if the process exited, i.e. what each extra
+# worker really costs; PSS splits shared pages between their users.
+
+import os
+from typing import Dict
+
+_SMAPS_FIELDS = {
+    "Rss": "rss", "Pss": "pss", "Shared_Clean": "shared_clean", "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean", "Private_Dirty": "private_dirty",
+}
+
+def read_memory(pid="self") -> Dict[str, int]:
+    """Memory of a process in bytes: rss, pss, uss (+ raw smaps_rollup fields when available)."""
+    out = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in _SMAPS_FIELDS:
+                    out[_SMAPS_FIELDS[key]] = int(rest.split()[0]) * 1024
+        out["uss"] = out.get("private_clean", 0) + out.get("private_dirty", 0)
+    except (OSError, ValueError):
+        # Older kernels / non-Linux: RSS only
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                out["rss"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            pass
+    return out
+
+def fmt_mib(n) -> str:
+    return f"{n / (1024 * 1024):.1f}" if n is not None else "-"
@@ -0,0 +1,154 @@
+# ai_service/modules/metrics.py
+# Lightweight in-process metrics: per-stage latency histograms, counters and
+# gauges, rendered in the Prometheus text exposition format (see /metrics).
+#
+# Usage:
+#     with span("normalize_text"):
+#         ...
+#     CACHE.inc("prediction", "hit")
+
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+# Seconds. Fine-grained at the low end because most triage stages are sub-millisecond,
+# long tail for OCR.
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_REGISTRY: List["_Metric"] = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+def _fmt(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def get(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = list(self._values.items())
+        for values, v in sorted(items):
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {_fmt(v)}")
+        return lines
+
+class Gauge(_Metric):
+    """Value read from a callback at scrape time (e.g. number of live sessions)."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        return self.header() + [f"{self.name} {_fmt(value)}"]
+
+class Histogram(_Metric):
+    """Histogram with a single label (e.g. stage). Each series is [bucket counts..., sum, count]."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labelname: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, (labelname,))
+        self.buckets = tuple(buckets)
+        self._series: Dict[str, list] = {}
+
+    def observe(self, label, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label)
+            if s is None:
+                s = self._series[label] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def stats(self, label):
+        """(count, sum) for a label; used for quick in-process estimates."""
+        s = self._series.get(label)
+        return (s[-1], s[-2]) if s else (0, 0.0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        labelname = self.labelnames[0]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for label, s in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), s[:-2]):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labelname}="{_escape(label)}",le="{_fmt(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labelname}="{_escape(label)}"}} {_fmt(s[-2])}')
+            lines.append(f'{self.name}_count{{{labelname}="{_escape(label)}"}} {s[-1]}')
+        return lines
+
+class span:
+    """Context manager timing one stage into a histogram (STAGE_SECONDS by default)."""
+    __slots__ = ("label", "hist", "t0")
+
+    def __init__(self, label: str, hist: Histogram = None):
+        self.label = label
+        self.hist = hist or STAGE_SECONDS
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.hist.observe(self.label, perf_counter() - self.t0)
+        return False
+
+def render() -> str:
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ----------------------------
+# Service-wide metrics
+# ----------------------------
+STAGE_SECONDS = Histogram("medicore_stage_duration_seconds", "Time spent in each pipeline stage", "stage")
+SESSIONS = Counter("medicore_sessions_total", "Triage session events", ("event",))
+CACHE = Counter("medicore_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+ERRORS = Counter("medicore_errors_total", "Unhandled errors by endpoint", ("endpoint",))
+FUZZY = Counter("medicore_fuzzy_match_total", "Typo-tolerant symptom matching outcomes", ("result",))
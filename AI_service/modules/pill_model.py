@@ -0,0 +1,75 @@
+# ai_service/modules/pill_model.py
+# Pill identifier (torch model + labels under models/). torch, torchvision and
+# PIL are imported on first use, so only the process that runs the model pays
+# for them: the image workers (modules/image_workers.py), or the API process
+# itself when MEDICORE_IMAGE_WORKERS=0.
+
+import os
+import json
+import importlib
+
+import numpy as np
+
+from .metrics import span
+
+_optional_modules = {}
+
+def _optional(name):
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except Exception:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+class PillModel:
+    def __init__(self, model_dir):
+        # try to load torch model
+        self.model = None
+        self.labels = None
+        # try torch model
+        torch_path = os.path.join(model_dir, "pill_model.pt")
+        labels_path = os.path.join(model_dir, "pill_labels.json")
+        # only pay for importing torch when there is a model to run
+        torch = _optional("torch") if os.path.exists(torch_path) else None
+        if torch:
+            try:
+                self.model = torch.jit.load(torch_path) if torch.jit.isinstance(torch.jit, object) else torch.load(torch_path, map_location='cpu')
+                if os.path.exists(labels_path):
+                    with open(labels_path, "r", encoding="utf-8") as f:
+                        self.labels = json.load(f)
+            except Exception:
+                self.model = None
+        # else leave model None (fallback)
+    def infer(self, image_bytes, deadline=None):
+        """Top pill class for an image; with a deadline (modules/deadline.py) the forward pass
+        is skipped once it has passed."""
+        # return dummy if not available
+        if self.model is None:
+            return {"pill_name": "Unknown - model missing", "confidence": 0.0}
+        torch = _optional("torch")
+        transforms = _optional("torchvision.transforms")
+        Image = _optional("PIL.Image")
+        try:
+            with span("image_decode"):
+                img = Image.open(image_bytes).convert("RGB")
+            with span("pill_transform"):
+                tf = transforms.Compose([
+                    transforms.Resize((224,224)),
+                    transforms.ToTensor(),
+                    transforms.Normalize(mean=[0.485,0.456,0.406], std=[0.229,0.224,0.225])
+                ])
+                x = tf(img).unsqueeze(0)
+            if deadline is not None and deadline.expired():
+                deadline.skip("pill_forward")
+                return {"pill_name": "Unknown", "confidence": 0.0}
+            self.model.eval()
+            with torch.no_grad(), span("pill_forward"):
+                out = self.model(x)
+                probs = torch.softmax(out, dim=1).cpu().numpy()[0]
+                idx = int(np.argmax(probs))
+                conf = float(probs[idx])
+                name = self.labels.get(str(idx), f"class_{idx}") if self.labels else f"class_{idx}"
+                return {"pill_name": name, "confidence": conf}
+        except Exception as e:
+            return {"pill_name":"error","confidence":0.0,"error":str(e)}
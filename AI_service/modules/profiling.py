@@ -0,0 +1,155 @@
+# ai_service/modules/profiling.py
+# Opt-in per-request profiling. A request is profiled when it carries the
+# `X-Profile: 1` header or is picked by the sampling rate; the profile is kept
+# in a bounded ring buffer together with a fingerprint of the request so a
+# slow input can be identified and reproduced. Served by /admin/profiles.
+#
+# The middleware is only installed when profiling is enabled, so there is no
+# per-request cost otherwise.
+#
+# Scope: the profiler runs on the event-loop thread only. Work a handler hands to
+# the threadpool (run_in_threadpool: OCR, pill model, report parsing, lab store)
+# or to worker processes shows up as time waiting in the awaiting coroutine, not
+# as its own calls. With cProfile, whatever else the loop runs while the request
+# is suspended on an await (other requests' handlers) is counted in the profile
+# too; pyinstrument's async mode attributes that time to the await instead.
+# Triage (/predict/*) runs on the loop and is profiled in full.
+
+import io
+import time
+import random
+import marshal
+import hashlib
+import cProfile
+import pstats
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+PROFILE_HEADER = b"x-profile"
+SKIP_PATHS = ("/admin/profiles", "/metrics", "/health", "/ready")
+
+class ProfileStore:
+    """Last `capacity` profiles, oldest evicted first."""
+    def __init__(self, capacity=50):
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def add(self, entry: Dict) -> int:
+        with self._lock:
+            entry["id"] = self._next_id
+            self._next_id += 1
+            self._entries.append(entry)
+        return entry["id"]
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            entries = list(self._entries)
+        return [{k: v for k, v in e.items() if k != "profile"} for e in reversed(entries)]
+
+    def get(self, profile_id: int) -> Optional[Dict]:
+        with self._lock:
+            for e in self._entries:
+                if e["id"] == profile_id:
+                    return e
+        return None
+
+def profile_bytes(entry: Dict) -> bytes:
+    """Raw profile: pstats-compatible .prof for cProfile, HTML for pyinstrument."""
+    if entry["mode"] == "cprofile":
+        return marshal.dumps(entry["profile"].stats)
+    return entry["profile"].output_html().encode("utf-8")
+
+def profile_text(entry: Dict, limit=40) -> str:
+    if entry["mode"] == "cprofile":
+        # a Stats of its own: sorting and the output stream are per render, the stored one is shared
+        out = io.StringIO()
+        stats = pstats.Stats(stream=out)
+        stats.add(entry["profile"])
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+    return entry["profile"].output_text()
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware wrapping selected requests in a profiler (event-loop thread only, see above)."""
+    def __init__(self, app, store: ProfileStore, sample_rate=0.0, mode="cprofile"):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.mode = mode
+        if mode == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401  (statistical, async-aware)
+            except ImportError:
+                print("pyinstrument not installed, falling back to cProfile")
+                self.mode = "cprofile"
+        # cProfile can't nest; one profiled request at a time, others run normally
+        self._busy = threading.Lock()
+
+    def _selected(self, scope) -> bool:
+        if scope["path"].startswith(SKIP_PATHS):
+            return False
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER:
+                return value not in (b"0", b"false", b"")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        body_hash = hashlib.sha256()
+        body_size = 0
+        status = {"code": None}
+
+        async def hashing_receive():
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_hash.update(chunk)
+                body_size += len(chunk)
+            return message
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        if self.mode == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, hashing_receive, capturing_send)
+        finally:
+            duration = time.perf_counter() - t0
+            if self.mode == "pyinstrument":
+                profiler.stop()
+                result = profiler
+            else:
+                profiler.disable()
+                result = pstats.Stats(profiler)
+            self._busy.release()
+            headers = dict(scope.get("headers", ()))
+            self.store.add({
+                "created": time.time(),
+                "mode": self.mode,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "duration_ms": duration * 1000,
+                "fingerprint": {
+                    "query": scope.get("query_string", b"").decode("latin-1"),
+                    "content_type": headers.get(b"content-type", b"").decode("latin-1"),
+                    "body_bytes": body_size,
+                    "body_sha256": body_hash.hexdigest(),
+                },
+                "profile": result,
+            })
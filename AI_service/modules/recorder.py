@@ -0,0 +1,243 @@
+# ai_service/modules/recorder.py
+# Opt-in recording of live traffic into a regression corpus that
+# training_scripts/replay_corpus.py replays against another engine or analyzer
+# version. Triage starts, follow-up answers and report analyses are kept as
+# {kind, input, output summary, latency} records. Anonymization is pattern based:
+# free text is scrubbed of contact details, dates, long identifiers, labelled
+# identity fields (and name lines before an age / sex), self-introductions and
+# relatives ("i'm john smith", "my son Rahul") and names after a title
+# (Mr/Mrs/Ms/Miss/Dr); session and user ids are never stored; timestamps are kept
+# to the hour. Being pattern based, it can miss a name in an unusual phrasing. Report images are not stored, only their OCR text, so a report replay
+# exercises the parsing stage and its latency is that stage's alone.
+#
+# The request path only samples, summarizes the output and does a non-blocking
+# queue put. A background thread scrubs each batch and appends it as one gzip
+# member to the current segment (corpus-<start>-<pid>.jsonl.gz), starting a new
+# segment past segment_bytes. Concatenated members read back as one stream, and
+# a member cut short by a crash only loses its own batch.
+
+import os
+import re
+import glob
+import gzip
+import json
+import time
+import zlib
+import queue
+import random
+import threading
+from typing import Dict, Iterator, List
+
+CORPUS_VERSION = 1
+KINDS = ("triage", "answer", "report")
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_DATE = re.compile(r"\b\d{1,4}[/.-]\d{1,2}[/.-]\d{2,4}\b")
+_LONG_ID = re.compile(r"\b\d{10,}\b")
+# 10+ digits with single spaces or dashes between them (phone numbers); free text only,
+# report tables put lab values next to each other the same way
+_PHONE = re.compile(r"(?<![\w.])\+?\d(?:[ -]?\d){9,}(?![\w.])")
+_NAME = re.compile(r"\b(my name is|i am called|name\s*:)\s*[A-Za-z][\w'-]*(?:\s+(?-i:[A-Z])[\w'-]*)?", re.IGNORECASE)
+# "I am / I'm / this is / call me" and "my son / wife / ..." followed by a name, in any case.
+# Up to three words after the phrase are masked, stopping at the first that is not a
+# name: a _NOT_NAMES word or an -ing / -ly word ("I am feeling dizzy", "this is the third day")
+_INTRO = re.compile(r"\b(?:i\s+am|i['\u2019]m|this\s+is|call\s+me|my\s+(?:son|daughter|wife|husband|mother|"
+                    r"father|mom|mum|dad|brother|sister|child|baby|kid|friend|grandson|granddaughter|"
+                    r"grandmother|grandfather|grandma|grandpa|uncle|aunt|nephew|niece|cousin|patient)\s*,?)[ \t]+",
+                    re.IGNORECASE)
+_NAME_WORD = re.compile(r"([A-Za-z][A-Za-z'\u2019-]*)")
+_NOT_NAMES = frozenset("""
+    a an the this that my his her our their your its it he she they we you i me him them here there now
+    not no very so too really also just still only quite bit little lot always never since for from in on
+    at to of by with without about after before because and or but if when while then has have had is
+    was are were be been being do does did can could will would should may might must got get gets
+    called named known
+    mr mrs ms miss dr doctor patient mother father son daughter wife husband
+    sick ill unwell fine ok okay good bad better worse well tired weak dizzy faint sleepy thirsty hungry
+    pregnant diabetic asthmatic allergic hypertensive anemic anaemic epileptic obese overweight
+    feverish nauseous nauseated breathless worried scared afraid anxious nervous sad depressed stressed
+    unable able alone married single old young male female boy girl man woman child baby adult
+    new sure unsure not suffering urgent serious normal same different first second third last next
+    fever cough cold pain ache headache vomiting diarrhoea diarrhea rash itching bleeding swelling
+    monday tuesday wednesday thursday friday saturday sunday today tomorrow yesterday tonight morning
+    evening night week month year day days weeks months years
+    january february march april june july august september october november december
+    indian american british english hindi hindu muslim christian vegetarian vegan
+""".split())
+# "Mr. Ravi Kumar", "DR MEHTA", "Dr.Mehta": up to three capitalized words after the title;
+# words further than one space away ("Mr. Ravi Kumar  Age 45") are not taken
+_TITLED_NAME = re.compile(r"\b((?i:mrs|mr|ms|miss|dr)(?:\.\s*|\s+))[A-Z][\w'-]*(?: [A-Z][\w'-]*){0,2}")
+# report header lines like "Patient Name : ...", "Patient: ...", "Name of Patient - ...", "UHID: ..."
+_IDENTITY_LINE = re.compile(
+    r"^(\s*(?:patient'?s?\s*name|name\s+of\s+(?:the\s+)?patient|pt\.?\s*name|patient|name|patient\s*id|"
+    r"pt\.?\s*id|mrn|uhid|reg(?:istration)?\.?\s*no\.?|lab\s*no\.?|sample\s*id|dob|date\s*of\s*birth|"
+    r"age\s*/\s*sex|age|sex|gender|address|phone|mobile|contact|e-?mail|ref(?:erred)?\.?\s*by|consultant|"
+    r"doctor)\s*[:\-])[^\n]*",
+    re.IGNORECASE | re.MULTILINE)
+# unlabelled header lines: a capitalized name just before age / sex ("RAVI KUMAR   45Y/M", "Anil Rao 38 yrs / F")
+_NAME_BEFORE_AGE = re.compile(
+    r"^([ \t]*)[A-Z][A-Za-z'.-]+(?: [A-Z][A-Za-z'.-]+){0,3}(?=[ \t,]+(?:\d{1,3}[ \t]*(?:y|yrs?|years?)?[ \t]*/[ \t]*"
+    r"(?:m|f|male|female)|(?:m|f|male|female)[ \t]*/[ \t]*\d{1,3})\b)", re.IGNORECASE | re.MULTILINE)
+
+def _name_word(word: str) -> bool:
+    low = word.lower().replace("\u2019", "'")
+    if low.endswith("'s"):
+        low = low[:-2]
+    return low not in _NOT_NAMES and not low.endswith(("ing", "ly"))
+
+def _mask_intros(text: str) -> str:
+    """Mask the name after each self-introduction or relative ("I'm john smith", "my son Rahul")."""
+    out, pos = [], 0
+    for m in _INTRO.finditer(text):
+        if m.start() < pos:
+            continue
+        end = m.end()
+        for i in range(3):
+            w = _NAME_WORD.match(text, end if i == 0 else end + 1)
+            if (i and text[end:end + 1] != " ") or w is None or not _name_word(w.group(1)):
+                break
+            end = w.end()
+        if end > m.end():
+            out.append(text[pos:m.end()] + "<name>")
+            pos = end
+    return "".join(out) + text[pos:]
+
+def scrub_text(text: str) -> str:
+    """Free triage text with contact details, dates, long ids, titled names and self-introductions masked."""
+    text = _EMAIL.sub("<email>", text)
+    text = _DATE.sub("<date>", text)
+    text = _PHONE.sub("<number>", text)
+    text = _LONG_ID.sub("<number>", text)
+    text = _TITLED_NAME.sub(r"\1<name>", text)
+    text = _mask_intros(text)
+    return _NAME.sub(lambda m: m.group(1) + " <name>", text)
+
+def scrub_report_text(text: str) -> str:
+    """OCR text of a report with its identity lines, titled names, emails, dates and long ids masked (lab values kept)."""
+    text = _IDENTITY_LINE.sub(r"\1 <redacted>", text)
+    text = _NAME_BEFORE_AGE.sub(r"\1<name>", text)
+    text = _TITLED_NAME.sub(r"\1<name>", text)
+    text = _EMAIL.sub("<email>", text)
+    text = _DATE.sub("<date>", text)
+    return _LONG_ID.sub("<number>", text)
+
+def summarize_output(kind: str, result: Dict) -> Dict:
+    """The parts of a response a replay compares (shared by recording and replay)."""
+    if kind == "report":
+        findings = result.get("findings") or result.get("extracted_vitals") or result.get("extracted_data") or []
+        out = {"findings": sorted([str(f.get("test")), str(f.get("status", "")).lower(), f.get("value")]
+                                  for f in findings)}
+    else:
+        out = {"top_disease": result.get("top_disease"), "candidates": list(result.get("candidates") or [])[:5]}
+        if kind == "triage":
+            out["extracted"] = sorted(result.get("extracted_symptoms") or [])
+            out["emergency"] = bool(result.get("emergency"))
+    if result.get("error"):
+        out["error"] = True
+    return out
+
+def read_corpus(path: str) -> Iterator[Dict]:
+    """Records of a corpus directory (segments in order) or of one segment file."""
+    files = sorted(glob.glob(os.path.join(path, "corpus-*.jsonl.gz"))) if os.path.isdir(path) else [path]
+    for name in files:
+        try:
+            with gzip.open(name, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except (EOFError, OSError, zlib.error):
+            # segment still being written, or cut short by a crash: keep what was read
+            continue
+
+class TrafficRecorder:
+    def __init__(self, directory: str, sample_rate=1.0, segment_bytes=64 * 1024 * 1024,
+                 queue_size=10000, batch_size=256, flush_interval=2.0):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.segment_bytes = segment_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._segment = None
+        self._segment_size = 0
+        self.counts = {"sampled": 0, "dropped": 0, "written": 0, "bytes": 0, "segments": 0, "errors": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="traffic-recorder", daemon=True)
+            self._thread.start()
+
+    def record(self, kind: str, inputs: Dict, result: Dict, seconds: float):
+        """Called on the request path; never blocks. `inputs` must not be mutated afterwards."""
+        if random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((kind, inputs, summarize_output(kind, result), seconds, time.time()))
+            self.counts["sampled"] += 1
+        except queue.Full:
+            self.counts["dropped"] += 1
+
+    def close(self, timeout=5.0):
+        """Write what is queued and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        batch, deadline = [], None
+        while True:
+            try:
+                item = self._queue.get(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = ()
+            if item is None:
+                self._write(batch)
+                return
+            if item:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch, deadline = [], None
+
+    def _encode(self, kind, inputs, output, seconds, ts) -> str:
+        inputs = dict(inputs)
+        if "text" in inputs:
+            inputs["text"] = scrub_report_text(inputs["text"]) if kind == "report" else scrub_text(inputs["text"])
+        return json.dumps({"v": CORPUS_VERSION, "kind": kind, "hour": int(ts // 3600 * 3600),
+                           "input": inputs, "output": output, "ms": round(seconds * 1000, 3)},
+                          separators=(",", ":"), ensure_ascii=False)
+
+    def _write(self, batch: List):
+        if not batch:
+            return
+        try:
+            lines = "".join(self._encode(*item) + "\n" for item in batch)
+            member = gzip.compress(lines.encode("utf-8"), compresslevel=6)
+            if self._segment is None or self._segment_size >= self.segment_bytes:
+                stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+                self._segment = os.path.join(self.directory, f"corpus-{stamp}-{os.getpid()}.jsonl.gz")
+                self._segment_size = 0
+                self.counts["segments"] += 1
+            with open(self._segment, "ab") as f:
+                f.write(member)
+            self._segment_size += len(member)
+            with self._lock:
+                self.counts["written"] += len(batch)
+                self.counts["bytes"] += len(member)
+        except Exception as e:
+            self.counts["errors"] += 1
+            print(f"Traffic recorder write failed: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self.counts, "queue_depth": self._queue.qsize(), "sample_rate": self.sample_rate,
+                    "segment": os.path.basename(self._segment) if self._segment else None,
+                    "bytes_per_record": self.counts["bytes"] / self.counts["written"] if self.counts["written"] else None}
@@ -0,0 +1,86 @@
+# ai_service/modules/red_flags.py
+# Precompiled red-flag scanner. red_flags.json is loaded once and its keys are
+# normalised ("chest_pain", "Chest  Pain" and "chest pain" are the same flag),
+# then compiled into a single regex so raw patient text can be screened before
+# any extraction or model work.
+#
+# Only standalone flags pre-empt the model. A flag whose action starts with "With "
+# ("sweating": "With chest pain, ...") only qualifies another flag, and is reported
+# only next to one. Mentions in a negated clause ("no chest pain", "denies
+# sweating") are skipped.
+
+import os
+import re
+import json
+from typing import Dict, List
+
+# a negation cue up to this many words before a mention, in the same clause, cancels it
+NEGATION_WINDOW = 5
+_NEGATION = re.compile(r"(?:\b(?:no|not|denies|denied|deny|without|never|negative for|free of)\b|n't\b)", re.IGNORECASE)
+_CLAUSE_BREAK = re.compile(r"[.,;:!?\n]|\b(?:but|however|although|though)\b", re.IGNORECASE)
+
+def normalize_key(s: str) -> str:
+    return " ".join(s.lower().replace("_", " ").split())
+
+def is_modifier(action: str) -> bool:
+    """Flags whose action qualifies another one ("With chest pain, ...") never stand alone."""
+    return action.lower().startswith("with ")
+
+def negated(text: str, start: int) -> bool:
+    """Whether the mention starting at `start` follows a negation cue in its clause."""
+    clause = _CLAUSE_BREAK.split(text[:start])[-1]
+    words = clause.split()[-NEGATION_WINDOW:]
+    return bool(_NEGATION.search(" ".join(words)))
+
+class RedFlagScanner:
+    def __init__(self, red_flags: Dict[str, str]):
+        self.red_flags = red_flags
+        # normalised key -> (original key, action)
+        self.by_key = {normalize_key(k): (k, v) for k, v in red_flags.items()}
+        self.modifiers = {k for k, (_, action) in self.by_key.items() if is_modifier(action)}
+        self.pattern = None
+        if self.by_key:
+            # Longest first so "chest pain" wins over a shorter overlapping flag;
+            # words may be separated by any run of spaces or underscores
+            terms = sorted(self.by_key, key=len, reverse=True)
+            alternation = "|".join(r"[\s_]+".join(re.escape(w) for w in t.split()) for t in terms)
+            self.pattern = re.compile(r"\b(?:" + alternation + r")\b", re.IGNORECASE)
+
+    @classmethod
+    def from_file(cls, path: str) -> "RedFlagScanner":
+        data = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        return cls(data)
+
+    def _alert(self, key: str) -> Dict:
+        original, action = self.by_key[key]
+        return {"symptom": original, "action": action}
+
+    def scan_text(self, text: str) -> List[Dict]:
+        """Red flags mentioned in free text outside negated clauses, in order of first mention."""
+        if not text or self.pattern is None:
+            return []
+        seen = {}
+        for m in self.pattern.finditer(text):
+            key = normalize_key(m.group(0))
+            if key not in seen and not negated(text, m.start()):
+                seen[key] = self._alert(key)
+        return list(seen.values())
+
+    def standalone(self, alerts: List[Dict]) -> List[Dict]:
+        """The alerts if at least one is a standalone flag (modifiers ride along), else []."""
+        if all(normalize_key(a["symptom"]) in self.modifiers for a in alerts):
+            return []
+        return alerts
+
+    def check(self, symptoms: List[str]) -> List[Dict]:
+        """Red flags among already-extracted symptom ids (underscores or spaces)."""
+        alerts, seen = [], set()
+        for s in symptoms:
+            key = normalize_key(s)
+            if key in self.by_key and key not in seen:
+                seen.add(key)
+                alerts.append(self._alert(key))
+        return alerts
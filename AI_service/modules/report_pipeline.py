@@ -0,0 +1,163 @@
+# ai_service/modules/report_pipeline.py
+# Report analysis (OCR of report images or PDFs + heuristic findings) shared by
+# /analyze_report and the bulk job workers (modules/jobs.py). Heavy OCR
+# dependencies are imported on first use so a spawned worker only pays for what
+# it needs. PDFs are rendered and read one page at a time, so a request deadline
+# (modules/deadline.py) can stop between pages.
+
+import re
+import importlib
+from io import BytesIO
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import numpy as np
+
+from .metrics import span, STAGE_SECONDS
+from .deadline import Deadline
+
+_ocr = None
+
+def _optional(name):
+    try:
+        return importlib.import_module(name)
+    except Exception:
+        return None
+
+def load_ocr_backend() -> SimpleNamespace:
+    """cv2 / pytesseract / PIL.Image, each None when not installed (cached per process)."""
+    global _ocr
+    if _ocr is None:
+        _ocr = SimpleNamespace(cv2=_optional("cv2"), pytesseract=_optional("pytesseract"),
+                               Image=_optional("PIL.Image"))
+    return _ocr
+
+def analyze_report_bytes(contents: bytes, ocr: Optional[SimpleNamespace] = None) -> Dict:
+    """OCR + heuristic parsing of an uploaded report image (blocking)."""
+    return analyze_report_text(extract_report_text(contents, ocr))
+
+def extract_report_text(contents: bytes, ocr: Optional[SimpleNamespace] = None,
+                        deadline: Optional[Deadline] = None) -> str:
+    """OCR text of a report image or PDF; "" when no OCR backend could read it."""
+    return ocr_report(contents, ocr, deadline)["text"]
+
+def ocr_report(contents: bytes, ocr: Optional[SimpleNamespace] = None, deadline: Optional[Deadline] = None) -> Dict:
+    """{"text", "pages", "pages_done"} for a report upload.
+
+    With a deadline, pages not started before it passes are skipped and Tesseract is
+    killed at it; both are recorded on the deadline (deadline.partial).
+    """
+    ocr = ocr or load_ocr_backend()
+    if contents[:5] == b"%PDF-":
+        return _ocr_pdf(contents, ocr, deadline)
+    if deadline is not None and deadline.expired():
+        deadline.skip("ocr")
+        return {"text": "", "pages": 1, "pages_done": 0}
+    bio = BytesIO(contents)
+    text = ""
+    cv2, pytesseract, Image = ocr.cv2, ocr.pytesseract, ocr.Image
+    if pytesseract and cv2 and Image:
+        # attempt to use OpenCV + pytesseract
+        with span("image_decode"):
+            nparr = np.frombuffer(contents, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            gray = _preprocess(cv2, cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+        # Check if pytesseract is executable
+        try:
+            text = _tesseract(pytesseract, gray, deadline)
+        except:
+            text = "" # Fallback
+    else:
+        # fallback: try PIL text extraction (very weak)
+        if Image:
+            with span("image_decode"):
+                img = Image.open(bio)
+            try:
+                text = _tesseract(pytesseract, img, deadline) if pytesseract else ""
+            except Exception:
+                text = ""
+    return {"text": text or "", "pages": 1, "pages_done": int(text is not None)}
+
+def _preprocess(cv2, gray):
+    # simple threshold/denoise
+    return cv2.medianBlur(gray, 3)
+
+def _tesseract(pytesseract, image, deadline: Optional[Deadline]) -> Optional[str]:
+    """Tesseract on one image; None when the deadline stopped it."""
+    if deadline is None:
+        with span("ocr"):
+            return pytesseract.image_to_string(image)
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        deadline.skip("ocr")
+        return None
+    t0 = perf_counter()
+    try:
+        text = pytesseract.image_to_string(image, timeout=remaining)
+    except RuntimeError as e:
+        # pytesseract kills the tesseract process at the timeout and raises RuntimeError
+        if "timeout" not in str(e).lower():
+            raise
+        deadline.skip("ocr", spent=perf_counter() - t0)
+        return None
+    # only complete runs count towards the expected cost of a skipped one
+    STAGE_SECONDS.observe("ocr", perf_counter() - t0)
+    return text
+
+def _ocr_pdf(contents: bytes, ocr: SimpleNamespace, deadline: Optional[Deadline]) -> Dict:
+    """OCR of a PDF report, one page rendered and read at a time."""
+    pdf2image = _optional("pdf2image")
+    if pdf2image is None or ocr.pytesseract is None:
+        return {"text": "", "pages": 0, "pages_done": 0}
+    try:
+        pages = int(pdf2image.pdfinfo_from_bytes(contents)["Pages"])
+    except Exception:
+        return {"text": "", "pages": 0, "pages_done": 0}
+    texts = []
+    for page in range(1, pages + 1):
+        if deadline is not None and deadline.expired():
+            deadline.skip("ocr_page", units=pages - page + 1)
+            break
+        t0 = perf_counter()
+        with span("pdf_render"):
+            img = pdf2image.convert_from_bytes(contents, first_page=page, last_page=page)[0]
+        if ocr.cv2 is not None:
+            img = _preprocess(ocr.cv2, ocr.cv2.cvtColor(np.asarray(img.convert("RGB")), ocr.cv2.COLOR_RGB2GRAY))
+        text = _tesseract(ocr.pytesseract, img, deadline)
+        if text is None:
+            deadline.skip("ocr_page", units=pages - page)
+            break
+        texts.append(text)
+        STAGE_SECONDS.observe("ocr_page", perf_counter() - t0)
+    return {"text": "\n".join(texts), "pages": pages, "pages_done": len(texts)}
+
+def analyze_report_text(text: str, partial: bool = False) -> Dict:
+    """Heuristic findings from report text (also used to replay recorded reports).
+
+    `partial`: the text is what OCR read before the request deadline; marked on the result.
+    """
+    # simple regex examples for Hemoglobin / WBC
+    findings = []
+    with span("report_findings"):
+        hb = re.search(r'(hemoglob(in|in|in\.)|hgb)[^\d\n\r]{0,6}(\d+\.?\d*)', text, flags=re.IGNORECASE)
+        if hb:
+            val = float(hb.group(3))
+            ref = "13.5-17.5"  # placeholder
+            status = "low" if val < 13.5 else "normal"
+            findings.append({"test":"Hemoglobin","value":val,"status":status,"reference":ref})
+    # return
+    if not findings and not text and not partial:
+        # Mock fallback for demonstration if OCR is missing
+        findings = [
+            {"test": "Hemoglobin", "value": 12.5, "status": "low", "reference": "13.5-17.5"},
+            {"test": "WBC", "value": 7.5, "status": "normal", "reference": "4.5-11.0"},
+            {"test": "Platelets", "value": 250, "status": "normal", "reference": "150-450"}
+        ]
+        text = "[SIMULATED OCR] Hemoglobin: 12.5 g/dL (Low), WBC: 7.5, Platelets: 250... (OCR unavailable, showing usage demo)"
+        return {"raw_text": text, "findings": findings, "simulated": True}
+
+    result = {"raw_text": text[:1000], "findings": findings}
+    if partial:
+        result["partial"] = True
+    return result
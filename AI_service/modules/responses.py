@@ -0,0 +1,85 @@
+# ai_service/modules/responses.py
+# Response encoding for the service. Endpoints declare pydantic response models
+# (validated and dumped by FastAPI, which also turns numpy scalars into plain
+# numbers); FastResponse then encodes the result with orjson, or with msgpack
+# when the request sent `Accept: application/msgpack`.
+#
+# The content type is negotiated per request by NegotiatedRoute, which records
+# the Accept header in a context variable the response class reads.
+
+import json
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+_wants_msgpack = ContextVar("medicore_wants_msgpack", default=False)
+
+def _default(o):
+    # numpy scalars / arrays on endpoints without a response model
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    raise TypeError(f"{type(o).__name__} is not serializable")
+
+def wants_msgpack(accept: str) -> bool:
+    """True when the Accept header lists msgpack before (or instead of) JSON."""
+    if msgpack is None or not accept:
+        return False
+    for part in accept.split(","):
+        media = part.split(";", 1)[0].strip().lower()
+        if media in MSGPACK_TYPES:
+            return True
+        if media in ("application/json", "*/*", "application/*"):
+            return False
+    return False
+
+def dumps_json(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+def dumps_msgpack(content) -> bytes:
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+def loads_msgpack(data: bytes):
+    if msgpack is None:
+        raise ValueError("msgpack is not installed")
+    return msgpack.unpackb(data, raw=False)
+
+class FastResponse(JSONResponse):
+    """JSON via orjson, or msgpack when the current request negotiated it."""
+    def __init__(self, content=None, status_code=200, headers=None, media_type=None, background=None):
+        if media_type is None and _wants_msgpack.get():
+            media_type = MSGPACK_TYPES[0]
+        headers = dict(headers or {})
+        headers.setdefault("vary", "Accept")
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content) -> bytes:
+        if self.media_type in MSGPACK_TYPES:
+            return dumps_msgpack(content)
+        return dumps_json(content)
+
+class NegotiatedRoute(APIRoute):
+    """APIRoute that makes the request's Accept header visible to FastResponse."""
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request):
+            token = _wants_msgpack.set(wants_msgpack(request.headers.get("accept", "")))
+            try:
+                return await handler(request)
+            finally:
+                _wants_msgpack.reset(token)
+        return negotiated_handler
@@ -0,0 +1,281 @@
+# ai_service/modules/session_journal.py
+# Append-only journal of triage sessions so a restart doesn't lose live
+# conversations. Sessions are serialised on the request path (a snapshot of the
+# dict at that moment) and handed to a writer thread, so requests never wait on
+# disk. The journal is split into segments; once the closed segments outgrow the
+# current snapshot the writer folds them into a new compacted snapshot (latest
+# record per session, expired sessions dropped). So that a crash never replays
+# more than compact_records records or compact_seconds of traffic, the writer
+# also closes the segment and compacts when either is reached, whatever the sizes.
+#
+# On-disk layout (directory = MEDICORE_SESSION_JOURNAL_DIR):
+#   snapshot.bin          header + compacted records
+#   journal-00000042.log  header + records appended since the snapshot
+# A record is  u32 body length | u32 crc32(body) | body, where body is
+#   u8 op | f64 created | u8 len(session id) | session id | JSON data (puts only)
+# Recovery memory-maps the files and only indexes records; the JSON of a session
+# is decoded when it is first used again.
+
+import os
+import json
+import mmap
+import time
+import zlib
+import queue
+import fcntl
+import struct
+import threading
+from typing import Dict, Optional, Tuple
+
+MAGIC = b"MCSJ"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sBQ")   # magic, version, last segment folded in (snapshot only)
+RECORD_HEADER = struct.Struct("<II")   # body length, crc32(body)
+BODY_HEADER = struct.Struct("<BdB")    # op, created, session id length
+OP_PUT = 1
+OP_DELETE = 2
+
+SNAPSHOT = "snapshot.bin"
+_STOP = object()
+
+def _json_default(o):
+    # numpy scalars / arrays that end up in session data
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    raise TypeError(f"{type(o).__name__} is not JSON serializable")
+
+def encode_record(op: int, sid: str, created: float, payload: bytes = b"") -> bytes:
+    sid_b = sid.encode("utf-8")
+    body = BODY_HEADER.pack(op, created, len(sid_b)) + sid_b + payload
+    return RECORD_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+def encode_put(sid: str, created: float, data: Dict) -> bytes:
+    payload = json.dumps(data, separators=(",", ":"), default=_json_default).encode("utf-8")
+    return encode_record(OP_PUT, sid, created, payload)
+
+def _segment_name(seq: int) -> str:
+    return f"journal-{seq:08d}.log"
+
+def _segment_seq(name: str) -> Optional[int]:
+    if name.startswith("journal-") and name.endswith(".log"):
+        try:
+            return int(name[8:-4])
+        except ValueError:
+            return None
+    return None
+
+def scan_file(path: str, entries: Dict[str, Tuple[float, bytes]]) -> Tuple[int, int]:
+    """Apply the records of one file to `entries` (sid -> (created, raw JSON)).
+
+    Returns (header seq, records read). Stops quietly at a torn or corrupt tail,
+    which is what a crash in the middle of a write leaves behind.
+    """
+    size = os.path.getsize(path)
+    if size < FILE_HEADER.size:
+        return 0, 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, seq = FILE_HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a session journal file")
+        off, n = FILE_HEADER.size, 0
+        while off + RECORD_HEADER.size <= size:
+            length, crc = RECORD_HEADER.unpack_from(mm, off)
+            start = off + RECORD_HEADER.size
+            end = start + length
+            if end > size or zlib.crc32(mm[start:end]) != crc:
+                break
+            op, created, sid_len = BODY_HEADER.unpack_from(mm, start)
+            sid_end = start + BODY_HEADER.size + sid_len
+            sid = mm[start + BODY_HEADER.size:sid_end].decode("utf-8")
+            if op == OP_PUT:
+                entries[sid] = (created, mm[sid_end:end])
+            else:
+                entries.pop(sid, None)
+            off, n = end, n + 1
+    return seq, n
+
+class SessionJournal:
+    def __init__(self, directory: str, ttl_seconds: Optional[float] = None,
+                 segment_bytes=64 * 1024 * 1024, fsync_interval=1.0, compact_seconds=300.0, compact_records=100000):
+        self.directory = directory
+        self.ttl = ttl_seconds
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.compact_seconds = compact_seconds
+        self.compact_records = compact_records
+        self.pending_records = 0  # appended since the last compaction: what a recovery would replay
+        os.makedirs(directory, exist_ok=True)
+        # One writer per directory; a second process (e.g. another worker) must not interleave appends
+        self._lock_file = open(os.path.join(directory, "LOCK"), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise RuntimeError(f"session journal {directory} is in use by another process")
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        # New segments must sort after anything already on disk, including what the snapshot covers
+        self._seq = 1 + max(self._segments() + [self._snapshot_seq()])
+        self.counts = {"records": 0, "bytes": 0, "segments": 0, "compactions": 0, "errors": 0}
+        self.last_compaction_seconds = None
+        self.last_recovery = None
+
+    # -- request path ---------------------------------------------------------
+    def put(self, sid: str, created: float, data: Dict):
+        self._queue.put(encode_put(sid, created, data))
+
+    def delete(self, sid: str):
+        self._queue.put(encode_record(OP_DELETE, sid, time.time()))
+
+    # -- recovery -------------------------------------------------------------
+    def _segments(self):
+        return sorted(s for s in map(_segment_seq, os.listdir(self.directory)) if s is not None)
+
+    def _snapshot_seq(self) -> int:
+        path = os.path.join(self.directory, SNAPSHOT)
+        if not os.path.exists(path) or os.path.getsize(path) < FILE_HEADER.size:
+            return 0
+        with open(path, "rb") as f:
+            return FILE_HEADER.unpack(f.read(FILE_HEADER.size))[2]
+
+    def _load(self, upto: Optional[int] = None) -> Tuple[Dict[str, Tuple[float, bytes]], int, int]:
+        """Snapshot plus segments after it (up to `upto`): (entries, records read, last seq)."""
+        entries, records, covered = {}, 0, 0
+        snapshot = os.path.join(self.directory, SNAPSHOT)
+        if os.path.exists(snapshot):
+            covered, records = scan_file(snapshot, entries)
+        last = covered
+        for seq in self._segments():
+            if seq <= covered or (upto is not None and seq > upto):
+                continue
+            records += scan_file(os.path.join(self.directory, _segment_name(seq)), entries)[1]
+            last = seq
+        return entries, records, last
+
+    def _drop_expired(self, entries):
+        if self.ttl:
+            cutoff = time.time() - self.ttl
+            for sid in [sid for sid, (created, _) in entries.items() if created < cutoff]:
+                del entries[sid]
+
+    def recover(self) -> Dict[str, Tuple[float, bytes]]:
+        """Live sessions as sid -> (created, raw JSON bytes). Call before start()."""
+        t0 = time.perf_counter()
+        entries, records, _ = self._load()
+        self._drop_expired(entries)
+        self.last_recovery = {"records": records, "sessions": len(entries),
+                              "seconds": time.perf_counter() - t0}
+        return entries
+
+    # -- writer thread --------------------------------------------------------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-journal", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=10.0):
+        """Write what is queued, stop the writer and give up the directory lock."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        self._lock_file.close()
+
+    def _open_segment(self):
+        f = open(os.path.join(self.directory, _segment_name(self._seq)), "ab")
+        if f.tell() == 0:
+            f.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self.counts["segments"] += 1
+        return f
+
+    def _run(self):
+        if self._segments():
+            # Fold whatever the previous run left behind before appending anew
+            try:
+                self.compact(self._seq - 1)
+            except Exception as e:
+                self.counts["errors"] += 1
+                print(f"Session journal compaction failed: {e}")
+        f = self._open_segment()
+        last_sync = attempted_at = time.monotonic()
+        since_attempt = 0  # records since the last compaction attempt; a failing one is retried a full period later
+        unsynced = False
+        stop = False
+        while not stop:
+            try:
+                # wakes up when idle too, to sync written records and keep the compaction deadline
+                batch = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            try:
+                while len(batch) < 4096:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if _STOP in batch:
+                stop = True
+                batch = [r for r in batch if r is not _STOP]
+            try:
+                if batch:
+                    data = b"".join(batch)
+                    f.write(data)
+                    f.flush()
+                    unsynced = True
+                    self.counts["records"] += len(batch)
+                    self.counts["bytes"] += len(data)
+                    self.pending_records += len(batch)
+                    since_attempt += len(batch)
+                if unsynced and (stop or time.monotonic() - last_sync >= self.fsync_interval):
+                    os.fsync(f.fileno())
+                    last_sync, unsynced = time.monotonic(), False
+                due = since_attempt and (since_attempt >= self.compact_records or
+                                         time.monotonic() - attempted_at >= self.compact_seconds)
+                if not stop and (due or f.tell() >= self.segment_bytes):
+                    os.fsync(f.fileno())
+                    f.close()
+                    closed = self._seq
+                    self._seq += 1
+                    f = self._open_segment()
+                    if due or self._should_compact(closed):
+                        attempted_at, since_attempt = time.monotonic(), 0
+                        self.compact(closed)
+            except Exception as e:
+                self.counts["errors"] += 1
+                print(f"Session journal write failed: {e}")
+        f.close()
+
+    def _should_compact(self, upto: int) -> bool:
+        # Only once the closed segments outweigh the snapshot, so rewriting a large
+        # snapshot is paid for by at least as many bytes of new records
+        snapshot = os.path.join(self.directory, SNAPSHOT)
+        snapshot_bytes = os.path.getsize(snapshot) if os.path.exists(snapshot) else 0
+        pending = sum(os.path.getsize(os.path.join(self.directory, _segment_name(seq)))
+                      for seq in self._segments() if seq <= upto)
+        return pending >= snapshot_bytes
+
+    def compact(self, upto: int):
+        """Fold the snapshot and segments <= upto into a new snapshot, then drop those segments."""
+        t0 = time.perf_counter()
+        entries, _, last = self._load(upto)
+        self._drop_expired(entries)
+        path = os.path.join(self.directory, SNAPSHOT)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as out:
+            out.write(FILE_HEADER.pack(MAGIC, VERSION, last))
+            for sid, (created, raw) in entries.items():
+                out.write(encode_record(OP_PUT, sid, created, raw))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, path)
+        for seq in self._segments():
+            if seq <= last:
+                os.remove(os.path.join(self.directory, _segment_name(seq)))
+        self.counts["compactions"] += 1
+        self.pending_records = 0
+        self.last_compaction_seconds = time.perf_counter() - t0
+
+    def stats(self) -> Dict:
+        return {**self.counts, "queued": self._queue.qsize(), "segment": self._seq,
+                "records_since_compaction": self.pending_records,
+                "last_compaction_seconds": self.last_compaction_seconds,
+                "last_recovery": self.last_recovery}
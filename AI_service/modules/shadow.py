@@ -0,0 +1,125 @@
+# ai_service/modules/shadow.py
+# Shadow evaluation of a candidate model on live traffic. The request path only
+# does a sampling check and a non-blocking queue put; a background thread
+# re-runs the sampled request on the candidate InferenceEngine and folds the
+# comparison into bounded aggregates (served by /admin/shadow).
+
+import time
+import queue
+import random
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+def rank_correlation(primary: List[str], candidate: List[str]) -> Optional[float]:
+    """Spearman correlation of two ranked candidate lists over their union.
+
+    Diseases missing from one list share the rank just past its end.
+    """
+    union = list(dict.fromkeys(primary + candidate))
+    if len(union) < 2:
+        return 1.0 if primary == candidate else None
+    a = np.array([primary.index(d) if d in primary else len(primary) for d in union], dtype=float)
+    b = np.array([candidate.index(d) if d in candidate else len(candidate) for d in union], dtype=float)
+    if a.std() == 0 or b.std() == 0:
+        return 1.0 if primary == candidate else 0.0
+    return float(np.corrcoef(a, b)[0, 1])
+
+def _percentiles(values) -> Dict:
+    if not values:
+        return {}
+    arr = np.fromiter(values, dtype=float) * 1000
+    return {"mean_ms": float(arr.mean()), "p50_ms": float(np.percentile(arr, 50)),
+            "p95_ms": float(np.percentile(arr, 95))}
+
+class ShadowEvaluator:
+    def __init__(self, candidate_factory: Callable, sample_rate=0.1, queue_size=1000, window=2048):
+        self.candidate_factory = candidate_factory
+        self.sample_rate = sample_rate
+        self.candidate = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        # Running totals, plus fixed-size windows for latency percentiles
+        self.counts = {"sampled": 0, "dropped": 0, "compared": 0, "errors": 0, "agree_top1": 0, "rank_corr_n": 0}
+        self.rank_corr_sum = 0.0
+        self.primary_latency = deque(maxlen=window)
+        self.candidate_latency = deque(maxlen=window)
+        self.latency_delta = deque(maxlen=window)
+        self.disagreements = deque(maxlen=20)
+        self.load_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="shadow-eval", daemon=True)
+            self._thread.start()
+
+    def submit(self, kind: str, args: tuple, primary_candidates: List[str], primary_seconds: float):
+        """Called on the request path; never blocks."""
+        if random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((kind, args, list(primary_candidates), primary_seconds))
+            self.counts["sampled"] += 1
+        except queue.Full:
+            self.counts["dropped"] += 1
+
+    def _run(self):
+        try:
+            self.candidate = self.candidate_factory()
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"Shadow model failed to load: {e}")
+            return
+        while True:
+            kind, args, primary, primary_seconds = self._queue.get()
+            try:
+                t0 = time.perf_counter()
+                if kind == "symptoms":
+                    candidate = self.candidate.start_session(*args)["candidates"]
+                else:
+                    candidate = [r["disease"] for r in self.candidate.predict(*args)]
+                candidate_seconds = time.perf_counter() - t0
+                self._record(kind, primary, candidate, primary_seconds, candidate_seconds)
+            except Exception as e:
+                self.counts["errors"] += 1
+                print(f"Shadow evaluation error: {e}")
+
+    def _record(self, kind, primary, candidate, primary_seconds, candidate_seconds):
+        corr = rank_correlation(primary, candidate)
+        with self._lock:
+            self.counts["compared"] += 1
+            if primary[:1] == candidate[:1]:
+                self.counts["agree_top1"] += 1
+            else:
+                self.disagreements.append({"kind": kind, "primary": primary, "candidate": candidate})
+            if corr is not None:
+                self.counts["rank_corr_n"] += 1
+                self.rank_corr_sum += corr
+            self.primary_latency.append(primary_seconds)
+            self.candidate_latency.append(candidate_seconds)
+            self.latency_delta.append(candidate_seconds - primary_seconds)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            compared = self.counts["compared"]
+            out = {
+                **self.counts,
+                "queue_depth": self._queue.qsize(),
+                "sample_rate": self.sample_rate,
+                "candidate_loaded": self.candidate is not None,
+                "top1_agreement": self.counts["agree_top1"] / compared if compared else None,
+                "mean_rank_correlation": (self.rank_corr_sum / self.counts["rank_corr_n"]
+                                          if self.counts["rank_corr_n"] else None),
+                "latency": {
+                    "primary": _percentiles(self.primary_latency),
+                    "candidate": _percentiles(self.candidate_latency),
+                    "delta": _percentiles(self.latency_delta),
+                },
+                "recent_disagreements": list(self.disagreements),
+            }
+        if self.load_error:
+            out["load_error"] = self.load_error
+        return out
@@ -0,0 +1,210 @@
+# ai_service/modules/text_pipeline.py
+# Several text models (heads) served from one tokenization of a request. The
+# engine's heads are disease triage, which reads the extracted symptoms, and
+# specialty routing (training_scripts/train_specialty_classifier.py), which
+# reads the complaint itself.
+#
+# Every input is preprocessed (accents, lowercase) and split into tokens once.
+# Each head reading that input builds its own feature row from those tokens:
+# stop words, n-grams, vocabulary lookup, then binary / tf-idf weighting. Heads
+# with a linear model are scored straight from the row's non-zero columns.
+# Heads can share a token stream when their vectorizers tokenize the same way.
+# A head whose vectorizer or classifier this can't reproduce falls back to its
+# own transform / predict_proba. When the pipeline is built, every head is
+# checked against its own vectorizer and classifier on probe texts.
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .metrics import span
+
+PROBE_TEXTS = (
+    "Fever and a bad headache for 3 days, can't sleep; stiff_neck? Café au lait spots.",
+    "chest pain chest pain shortness of breath",
+    "",
+)
+
+def tokenizer_key(vect) -> Optional[tuple]:
+    """What decides a vectorizer's token stream: vectorizers with equal keys share one (None: can't share)."""
+    if (getattr(vect, "analyzer", None) != "word" or getattr(vect, "tokenizer", None) is not None
+            or getattr(vect, "preprocessor", None) is not None or not hasattr(vect, "vocabulary_")):
+        return None
+    return (vect.lowercase, vect.strip_accents, vect.token_pattern)
+
+def head_from_artifact(name: str, artifact, source: str = "text", label: Optional[str] = None) -> Optional["TextHead"]:
+    """TextHead from a {"model", "vectorizer"} dict or a (vectorizer, classifier) Pipeline; None otherwise."""
+    if isinstance(artifact, dict):
+        vect, clf = artifact.get("vectorizer"), artifact.get("model") or artifact.get("classifier")
+    elif hasattr(artifact, "steps") and len(artifact.steps) == 2:
+        vect, clf = artifact.steps[0][1], artifact.steps[1][1]
+    else:
+        return None
+    if vect is None or clf is None or not hasattr(clf, "predict_proba"):
+        return None
+    return TextHead(name, vect, clf, source=source, label=label)
+
+class TextHead:
+    """One model on the pipeline: a fitted vectorizer and classifier reading one input (`source`)."""
+    def __init__(self, name: str, vectorizer, classifier, source: str = "text", label: Optional[str] = None):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        self.name = name
+        self.source = source
+        self.vect = vectorizer
+        self.clf = classifier
+        self.classes = getattr(classifier, "classes_", [])
+        # stage labels: "<label>vectorize", "<label>predict_proba"
+        self.label = f"{name}_" if label is None else label
+        self.key = tokenizer_key(vectorizer)
+        self.shared = self.key is not None  # cleared by TextPipeline if the row doesn't match transform()
+        self.linear = None  # (weights, bias, kind) when probabilities are computed from the row directly
+        if self.shared:
+            self.vocabulary = vectorizer.vocabulary_
+            self.n_features = len(self.vocabulary)
+            self.stop_words = vectorizer.get_stop_words()
+            self.ngram_range = tuple(vectorizer.ngram_range)
+            self.binary = vectorizer.binary
+            self.dtype = vectorizer.dtype
+            self.tfidf = isinstance(vectorizer, TfidfVectorizer)
+            self.idf = vectorizer.idf_ if self.tfidf and vectorizer.use_idf else None
+
+    def _grams(self, tokens: List[str]) -> List[str]:
+        """The vectorizer's terms for a token stream (stop words removed, then n-grams)."""
+        if self.stop_words:
+            tokens = [t for t in tokens if t not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            grams += [" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+        return grams
+
+    def row(self, tokens: List[str]):
+        """1 x n_features CSR row, as the vectorizer's transform() would build it."""
+        import scipy.sparse as sp
+        counts = {}
+        vocab = self.vocabulary
+        for g in self._grams(tokens):
+            j = vocab.get(g)
+            if j is not None:
+                counts[j] = counts.get(j, 0) + 1
+        cols = np.array(sorted(counts), dtype=np.int32)
+        if self.binary:
+            vals = np.ones(len(cols), dtype=float if self.tfidf else self.dtype)
+        else:
+            vals = np.array([counts[j] for j in cols], dtype=float if self.tfidf else self.dtype)
+        if self.tfidf and len(cols):
+            vect = self.vect
+            if vect.sublinear_tf:
+                vals = np.log(vals) + 1
+            if self.idf is not None:
+                vals = vals * self.idf[cols]
+            if vect.norm == "l2":
+                vals /= np.sqrt((vals * vals).sum())
+            elif vect.norm == "l1":
+                vals /= np.abs(vals).sum()
+            vals = vals.astype(self.dtype, copy=False)
+        return sp.csr_matrix((vals, cols, np.array([0, len(cols)], dtype=np.int32)), shape=(1, self.n_features))
+
+    def proba(self, X) -> np.ndarray:
+        """Class probabilities for one row; linear heads only touch the row's non-zero columns."""
+        if self.linear is None:
+            return self.clf.predict_proba(X)[0]
+        W, b, kind = self.linear
+        z = W[:, X.indices] @ X.data + b
+        if kind == "sigmoid":
+            p1 = 1.0 / (1.0 + np.exp(-z[0]))
+            return np.array([1.0 - p1, p1])
+        e = np.exp(z - z.max())
+        return e / e.sum()
+
+    def _linear_form(self):
+        """(weights, bias, kind) of a classifier whose probabilities are softmax/sigmoid(W x + b)."""
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.naive_bayes import MultinomialNB
+        clf = self.clf
+        if isinstance(clf, LogisticRegression) and hasattr(clf, "coef_"):
+            # binary models have one row of coefficients
+            return clf.coef_, np.atleast_1d(clf.intercept_), "sigmoid" if clf.coef_.shape[0] == 1 else "softmax"
+        if type(clf) is MultinomialNB:
+            return clf.feature_log_prob_, clf.class_log_prior_, "softmax"
+        return None
+
+class TextPipeline:
+    """Tokenize each input once and run every head that reads it (see the module header)."""
+    def __init__(self, heads: Sequence[TextHead], metrics_prefix: str = "", probe_texts: Iterable[str] = PROBE_TEXTS):
+        self.heads: Dict[str, TextHead] = {h.name: h for h in heads}
+        self.metrics_prefix = metrics_prefix
+        # one (preprocess, tokenize) per distinct tokenizer key, taken from the first head with it
+        self._tokenizers = {}
+        for h in heads:
+            if h.shared and h.key not in self._tokenizers:
+                self._tokenizers[h.key] = (h.vect.build_preprocessor(), h.vect.build_tokenizer())
+        for h in heads:
+            self._verify(h, list(probe_texts))
+
+    def _verify(self, head: TextHead, texts: List[str]):
+        """Keep the shared row and the linear scoring of a head only where they match its own models."""
+        # probes: the given texts plus some of the head's vocabulary (covers n-gram terms)
+        vocab = list(getattr(head.vect, "vocabulary_", {}))
+        texts = texts + [" ".join(vocab[:8]), " ".join(vocab[-8:])]
+        try:
+            reference = head.vect.transform(texts)
+        except Exception:
+            head.shared = False
+            return
+        if head.shared:
+            try:
+                rows = [head.row(self.tokens(head.key, t)) for t in texts]
+                head.shared = all(r.shape == reference[i].shape and np.allclose(r.toarray(), reference[i].toarray())
+                                  for i, r in enumerate(rows))
+            except Exception:
+                head.shared = False
+        if not head.shared:
+            print(f"Text pipeline: head {head.name!r} uses its own vectorizer (not reproducible from shared tokens)")
+        try:
+            head.linear = head._linear_form()
+            if head.linear is not None:
+                expected = head.clf.predict_proba(reference)
+                if not all(np.allclose(head.proba(reference[i].tocsr()), expected[i]) for i in range(len(texts))):
+                    head.linear = None
+        except Exception:
+            head.linear = None
+
+    def tokens(self, key: tuple, text: str) -> List[str]:
+        preprocess, tokenize = self._tokenizers[key]
+        return tokenize(preprocess(text))
+
+    def run(self, inputs: Dict[str, Optional[str]], heads: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """{head: {"X": feature row, "probs": class probabilities}} for the heads (default all) whose input is given.
+
+        Each input is tokenized at most once per tokenizer key, whichever heads read it.
+        """
+        prefix = self.metrics_prefix
+        streams = {}
+        out = {}
+        for name in (self.heads if heads is None else heads):
+            head = self.heads[name]
+            text = inputs.get(head.source)
+            if text is None:
+                continue
+            if head.shared:
+                stream = (head.source, head.key)
+                tokens = streams.get(stream)
+                if tokens is None:
+                    with span(prefix + "tokenize"):
+                        tokens = streams[stream] = self.tokens(head.key, text)
+                with span(prefix + head.label + "vectorize"):
+                    X = head.row(tokens)
+            else:
+                with span(prefix + head.label + "vectorize"):
+                    X = head.vect.transform([text])
+            with span(prefix + head.label + "predict_proba"):
+                probs = head.proba(X)
+            out[name] = {"X": X, "probs": probs}
+        return out
+
+    def describe(self) -> Dict[str, Dict]:
+        return {name: {"source": h.source, "classes": len(h.classes), "shared_tokens": h.shared,
+                       "linear": h.linear is not None} for name, h in self.heads.items()}
@@ -0,0 +1,164 @@
+# ai_service/prefork.py
+# Pre-fork launcher: load the models once in a master process, freeze the GC
+# and fork uvicorn workers that share those pages copy-on-write.
+#
+#   python prefork.py --workers 4 --port 8000                       # shared (default)
+#   python prefork.py --workers 4 --mode independent --report-after 15
+#
+# In "shared" mode the model arrays are re-loaded from a joblib dump with
+# mmap_mode="r", so they live in read-only file-backed pages that reference
+# counting never dirties, and gc.freeze() keeps the collector from touching
+# every object header in the children. "independent" mode loads the models
+# in each worker after the fork (like `uvicorn --workers N`) for comparison.
+# Note: triage sessions stay per-worker, exactly as with `uvicorn --workers`.
+#
+# State that one process must own is set up per worker after the fork: with
+# MEDICORE_SESSION_JOURNAL_DIR each worker journals to <dir>/worker-<slot> (a
+# respawned worker recovers its slot's sessions), and only worker 0 dispatches
+# report jobs; the others queue them in the shared database. Each worker watches
+# current.json (MEDICORE_MODEL_WATCH_SECONDS, 5 s unless set) and swaps in the
+# model it names, so a publish or /admin/model/reload reaches every worker. A
+# model swapped in this way is the worker's own copy, not the master's mmap.
+
+import os
+import gc
+import json
+import time
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+
+# The master does the loading; workers must not start their own warm-up thread
+os.environ["MEDICORE_WARMUP"] = "0"
+# Opened per worker in run_worker(), never by the master
+SESSION_JOURNAL_DIR = os.environ.pop("MEDICORE_SESSION_JOURNAL_DIR", None)
+# /admin/model/reload only reaches the worker that handles it; the others follow current.json
+os.environ.setdefault("MEDICORE_MODEL_WATCH_SECONDS", "5")
+
+import joblib
+import uvicorn
+
+from modules.memstats import read_memory, fmt_mib
+
+def mmap_engine(engine, cache_dir):
+    """Swap the engine's model for a copy whose numpy arrays are memory-mapped read-only."""
+    path = os.path.join(cache_dir, "engine_model.joblib")
+    joblib.dump((engine.model, engine.vectorizer), path)
+    engine.model, engine.vectorizer = joblib.load(path, mmap_mode="r")
+    engine.vect, engine.clf = engine._split_model()
+    engine.pipeline = engine._build_pipeline()
+    engine._cache.clear()
+    return path
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app_module, sock, args, slot):
+    gc.enable()
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if SESSION_JOURNAL_DIR:
+        app_module.open_session_journal(os.path.join(SESSION_JOURNAL_DIR, f"worker-{slot}"))
+    # one dispatcher: several would re-queue each other's running items on start
+    app_module.JOB_DISPATCHER = app_module.JOB_DISPATCHER and slot == 0
+    if args.mode == "independent":
+        app_module.warm_up()
+    config = uvicorn.Config(app_module.app, log_level=args.log_level, access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+    os._exit(0)
+
+def memory_report(master_pid, worker_pids):
+    rows = {"master": read_memory(master_pid)}
+    for i, pid in enumerate(worker_pids):
+        rows[f"worker-{i} ({pid})"] = read_memory(pid)
+    workers = [rows[k] for k in rows if k != "master"]
+    print(f"\n{'process':<24}{'RSS MiB':>10}{'PSS MiB':>10}{'USS MiB':>10}")
+    for name, m in rows.items():
+        print(f"{name:<24}{fmt_mib(m.get('rss')):>10}{fmt_mib(m.get('pss')):>10}{fmt_mib(m.get('uss')):>10}")
+    if workers and all("uss" in m for m in workers):
+        avg_uss = sum(m["uss"] for m in workers) / len(workers)
+        total_pss = sum(m["pss"] for m in workers) + rows["master"].get("pss", 0)
+        print(f"mean worker USS {fmt_mib(avg_uss)} MiB, total PSS {fmt_mib(total_pss)} MiB")
+    return rows
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Pre-fork launcher for the MediCore AI service")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--mode", choices=["shared", "independent"], default="shared")
+    parser.add_argument("--report-after", type=float, default=0, help="print per-worker memory after N seconds")
+    parser.add_argument("--report-json", default=None, help="also write the memory report to this file")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    # Nothing allocated before the fork should be visited by the collector again
+    gc.disable()
+    import main as app_module
+
+    cache_dir = tempfile.mkdtemp(prefix="medicore-prefork-")
+    if args.mode == "shared":
+        t0 = time.perf_counter()
+        app_module.warm_up()
+        mmap_engine(app_module.engine.get(), cache_dir)
+        print(f"Master loaded models in {time.perf_counter() - t0:.2f}s")
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    workers = {}
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(app_module, sock, args, slot)
+        workers[pid] = slot
+        return pid
+
+    for slot in range(args.workers):
+        spawn(slot)
+    print(f"Serving on {args.host}:{args.port} with {args.workers} {args.mode} workers (master {os.getpid()})")
+
+    stopping = False
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    report_at = time.monotonic() + args.report_after if args.report_after else None
+    while workers:
+        if report_at and time.monotonic() >= report_at:
+            rows = memory_report(os.getpid(), sorted(workers, key=workers.get))
+            if args.report_json:
+                with open(args.report_json, "w") as f:
+                    json.dump({"mode": args.mode, "workers": args.workers, "memory": rows}, f, indent=2)
+            report_at = None
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        slot = workers.pop(pid, None)
+        if slot is not None and not stopping:
+            print(f"Worker {pid} exited with status {status}, respawning")
+            spawn(slot)
+    sock.close()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main_cli()
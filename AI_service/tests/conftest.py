@@ -0,0 +1,7 @@
+# ai_service/tests/conftest.py
+# Tests import the service's modules the way main.py does (from the AI_service directory).
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
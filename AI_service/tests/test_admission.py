@@ -0,0 +1,94 @@
+# ai_service/tests/test_admission.py
+# Admission control (modules/admission.py): slot accounting, token buckets, client keys.
+
+import asyncio
+
+from modules.admission import AdmissionMiddleware, EndpointClass, Slots, TokenBuckets, _client_key
+
+def test_slots_wake_waiters_by_priority():
+    async def run():
+        slots = Slots(1)
+        assert await slots.acquire()
+        order = []
+
+        async def waiter(name, priority):
+            assert await slots.acquire(priority, timeout=1)
+            order.append(name)
+            slots.release()
+
+        tasks = [asyncio.create_task(waiter("ocr", 2)), asyncio.create_task(waiter("triage", 0))]
+        await asyncio.sleep(0)
+        slots.release()
+        await asyncio.gather(*tasks)
+        return order, slots.active, slots.waiting
+
+    assert asyncio.run(run()) == (["triage", "ocr"], 0, 0)
+
+def test_slots_timeout_and_cancel_give_nothing_away():
+    async def run():
+        slots = Slots(1)
+        assert await slots.acquire()
+        assert not await slots.acquire(timeout=0.01)
+        task = asyncio.create_task(slots.acquire(timeout=5))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        slots.release()
+        return slots.active, slots.waiting
+
+    assert asyncio.run(run()) == (0, 0)
+
+def _request(path="/analyze_report", client=("10.0.0.9", 1234), headers=()):
+    return {"type": "http", "method": "POST", "path": path, "client": client, "headers": list(headers)}
+
+async def _noop_receive():
+    return {"type": "http.request", "body": b""}
+
+def test_class_slot_released_when_cancelled_waiting_for_pool():
+    async def run():
+        gate = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await gate.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            pass
+
+        ocr = EndpointClass("ocr", priority=2, concurrency=2, max_wait=5)
+        mw = AdmissionMiddleware(app, classes={"ocr": ocr}, routes=(("/analyze_report", "ocr"),), pool_size=1, rate=0)
+        holder = asyncio.create_task(mw(_request(), _noop_receive, send))  # takes the only pool slot
+        await asyncio.sleep(0.01)
+        waiting = asyncio.create_task(mw(_request(), _noop_receive, send))  # class slot, then waits for the pool
+        await asyncio.sleep(0.01)
+        assert (ocr.slots.active, mw.pool.waiting) == (2, 1)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        gate.set()
+        await holder
+        return ocr.slots.active, mw.pool.active, mw.pool.waiting
+
+    assert asyncio.run(run()) == (0, 0, 0)
+
+def test_token_bucket_refills_at_rate():
+    buckets = TokenBuckets(rate=10.0, burst=5.0)
+    assert buckets.take("a", 5)[0]
+    allowed, left, retry_after = buckets.take("a", 1)
+    assert not allowed and retry_after > 0
+    assert buckets.take("b", 5)[0]  # buckets are per client
+    buckets._buckets["a"][1] -= 0.5  # half a second later: 5 tokens back
+    assert buckets.take("a", 5)[0]
+
+def test_token_buckets_evict_least_recent_client():
+    buckets = TokenBuckets(rate=1.0, burst=2.0, max_clients=2)
+    for client in ("a", "b", "a", "c"):
+        buckets.take(client, 1)
+    assert list(buckets._buckets) == ["a", "c"]
+
+def test_client_key_trusts_user_header_from_proxy_only():
+    header = [(b"x-user-id", b"u42")]
+    trusted = frozenset({"127.0.0.1"})
+    assert _client_key(_request(client=("127.0.0.1", 1), headers=header), trusted) == "user:u42"
+    assert _client_key(_request(client=("10.0.0.9", 1), headers=header), trusted) == "addr:10.0.0.9"
+    assert _client_key(_request(client=("127.0.0.1", 1)), trusted) == "addr:127.0.0.1"
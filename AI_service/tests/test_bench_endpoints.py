@@ -0,0 +1,35 @@
+# ai_service/tests/test_bench_endpoints.py
+# Endpoint benchmark helpers (benchmarks/): latency summaries and baseline regression checks.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_endpoints import compare  # noqa: E402
+from common import summarize  # noqa: E402
+
+def test_summarize_percentiles_and_throughput():
+    stats = summarize([i / 1000 for i in range(1, 101)], wall_s=2.0, errors=3)
+    assert stats["count"] == 100 and stats["errors"] == 3
+    assert (stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["max_ms"]) == pytest.approx((50, 95, 99, 100))
+    assert stats["throughput_rps"] == 50.0
+    assert summarize([], errors=2) == {"count": 0, "errors": 2}
+
+def test_compare_flags_only_slowdowns_past_the_tolerance():
+    baseline = {"endpoints": {
+        "predict_symptoms": {"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "throughput_rps": 100.0},
+        "identify_pill": {"p50_ms": 50.0},
+    }}
+    results = {
+        "predict_symptoms": {"p50_ms": 11.0, "p95_ms": 25.0, "p99_ms": 30.0, "throughput_rps": 80.0},
+        "identify_pill": {"p50_ms": 40.0},
+        "analyze_report": {"p50_ms": 999.0},  # not in the baseline
+    }
+    assert compare(results, baseline, 0.15) == [
+        ("predict_symptoms", "p95_ms", 20.0, 25.0),
+        ("predict_symptoms", "throughput_rps", 100.0, 80.0),
+    ]
+    assert compare(results, baseline, 0.3) == []
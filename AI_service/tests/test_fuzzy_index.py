@@ -0,0 +1,56 @@
+# ai_service/tests/test_fuzzy_index.py
+# Typo-tolerant symptom lookup (modules/fuzzy_index.py): edit budgets, windows and the time budget.
+
+from modules.fuzzy_index import FuzzyIndex, bounded_distance, parse_max_edits, vocabulary_phrases
+
+SYMPTOMS = ["headache", "nausea", "stiff_neck", "chest_pain", "vomiting", "fatigue"]
+SYNONYMS = {"vomiting": ["throwing up"]}
+
+def make_index(**kwargs):
+    return FuzzyIndex.from_vocabulary(SYMPTOMS, SYNONYMS, **kwargs)
+
+def test_parse_max_edits():
+    assert parse_max_edits("4:1,7:2") == ((4, 1), (7, 2))
+    assert parse_max_edits("5:1, ") == ((5, 1),)
+
+def test_bounded_distance_counts_transpositions_and_stops_early():
+    assert bounded_distance("headahce", "headache", 2) == 1
+    assert bounded_distance("nausia", "nausea", 1) == 1
+    assert bounded_distance("fever", "vomiting", 2) == 3
+
+def test_vocabulary_phrases_normalises_ids_and_synonyms():
+    phrases = vocabulary_phrases(SYMPTOMS, SYNONYMS)
+    assert phrases["stiff neck"] == "stiff_neck"
+    assert phrases["throwing up"] == "vomiting"
+
+def test_match_repairs_single_words_and_phrases():
+    matches, exhausted = make_index().match("bad headahce and nausia, also a stif neck")
+    assert not exhausted
+    assert {m["symptom"]: m["distance"] for m in matches} == {"headache": 1, "nausea": 1, "stiff_neck": 1}
+
+def test_match_leaves_correct_words_and_short_tokens_alone():
+    index = make_index()
+    assert index.match("headache with nausea since morning")[0] == []
+    # below the 4-character minimum nothing is tried
+    assert index.match("abc")[0] == []
+
+def test_edit_budget_grows_with_length():
+    index = make_index()
+    assert index.allowed_edits("naus") == 1
+    assert index.allowed_edits("headahc") == 2
+    assert index.lookup("hedahce") == ("headache", 2)
+    # two edits on a six-letter word exceed its one-edit budget
+    assert index.lookup("nuasia") is None
+
+def test_match_stops_at_the_time_budget():
+    text = "headahce " + "stif nek " * 2000
+    matches, exhausted = make_index().match(text, budget_s=1e-9)
+    assert exhausted
+    assert len(matches) <= 1
+    assert make_index().match(text)[1] is False
+
+def test_memo_is_bounded():
+    index = make_index(memo_size=3)
+    for q in ("aaaa", "bbbb", "cccc", "dddd"):
+        index.lookup(q)
+    assert len(index._memo) <= 3
@@ -0,0 +1,68 @@
+# ai_service/tests/test_knowledge_bundle.py
+# Precompiled knowledge bundle (modules/knowledge_bundle.py): round trip, stale detection.
+
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from modules.knowledge_bundle import KnowledgeBundle, _file_checksum, build_bundle, match_terms, write_bundle
+
+KNOWLEDGE = {
+    "symptom_list.json": ["fever", "stiff_neck", "chest_pain"],
+    "synonyms.json": {"fever": ["high temperature", "pyrexia"], "chest_pain": []},
+    "red_flags.json": {"chest_pain": "Possible heart attack"},
+    "medicine_rules.json": {"Flu": ["Rest", "Hydration"], "Migraine": []},
+}
+
+@pytest.fixture
+def knowledge_dir(tmp_path):
+    for name, content in KNOWLEDGE.items():
+        (tmp_path / name).write_text(json.dumps(content), encoding="utf-8")
+    return tmp_path
+
+def _bundle(knowledge_dir, *args):
+    path = str(knowledge_dir / "knowledge.bundle")
+    write_bundle(path, build_bundle(str(knowledge_dir), *args))
+    return path
+
+def test_round_trip(knowledge_dir):
+    bundle = KnowledgeBundle.load(_bundle(knowledge_dir))
+    assert bundle.symptom_list == KNOWLEDGE["symptom_list.json"]
+    assert bundle.synonyms == KNOWLEDGE["synonyms.json"]
+    assert bundle.red_flags == KNOWLEDGE["red_flags.json"]
+    assert bundle.medicine_rules == KNOWLEDGE["medicine_rules.json"]
+    assert bundle.match_terms == match_terms(KNOWLEDGE["symptom_list.json"], KNOWLEDGE["synonyms.json"])
+    assert bundle.fuzzy_phrases["stiff neck"] == "stiff_neck"
+    assert bundle.stale_sources(str(knowledge_dir)) == []
+
+def test_stale_sources_and_corruption(knowledge_dir):
+    path = _bundle(knowledge_dir)
+    (knowledge_dir / "red_flags.json").write_text(json.dumps({"seizure": "Call an ambulance"}), encoding="utf-8")
+    assert KnowledgeBundle.load(path).stale_sources(str(knowledge_dir)) == ["red_flags.json"]
+
+    with open(path, "r+b") as f:
+        f.seek(os.path.getsize(path) - 3)
+        f.write(b"\xff")
+    with pytest.raises(ValueError, match="checksum"):
+        KnowledgeBundle.load(path)
+
+def test_features_only_for_the_model_they_were_built_from(knowledge_dir):
+    model = knowledge_dir / "model.pkl"
+    model.write_bytes(b"model-v1")
+    names = ["fever", "headache", "stiff neck"]
+    fingerprint = {"size": 8, "checksum": _file_checksum(str(model)), "n_features": 3}
+    bundle = KnowledgeBundle.load(_bundle(knowledge_dir, names, fingerprint))
+    vect = SimpleNamespace(vocabulary_={n: i for i, n in enumerate(names)})
+    assert bundle.features_for(str(model), vect) == names
+
+    model.write_bytes(b"model-v2")  # retrained: same size, different columns
+    assert bundle.features_for(str(model), vect) is None
+    no_checksum = KnowledgeBundle.load(_bundle(knowledge_dir, names, {"size": 8}))
+    assert no_checksum.features_for(str(model), vect) is None
+
+def test_rejects_what_it_cannot_represent(knowledge_dir):
+    (knowledge_dir / "medicine_rules.json").write_text(json.dumps({"Flu": {"advice": "Rest"}}), encoding="utf-8")
+    with pytest.raises(ValueError, match="Flu"):
+        build_bundle(str(knowledge_dir))
@@ -0,0 +1,78 @@
+# ai_service/tests/test_lab_store.py
+# Longitudinal lab values (modules/lab_store.py): trend statistics, report replacement and range parsing.
+
+import numpy as np
+import pytest
+
+from modules.lab_store import DAY, LabStore, findings_of, parse_reference, series_stats
+
+T0 = 1_700_000_000.0
+
+def hb(value, reference="13.5-17.5", status=None):
+    finding = {"test": "Hemoglobin", "value": value, "unit": "g/dL", "reference": reference}
+    if status:
+        finding["status"] = status
+    return finding
+
+@pytest.fixture
+def store(tmp_path):
+    s = LabStore(str(tmp_path / "labs.db"))
+    yield s
+    s.close()
+
+def test_parse_reference_and_findings_of():
+    assert parse_reference("13.5-17.5") == (13.5, 17.5)
+    assert parse_reference("150 to 450") == (150.0, 450.0)
+    assert parse_reference("< 200") == (None, None)
+    assert findings_of({"findings": [1]}) == [1]
+    assert findings_of({"extracted_vitals": [2]}) == [2]
+    assert findings_of({}) == []
+
+def test_series_stats_slope_deltas_and_streaks():
+    taken_at = T0 + np.array([0, 30, 60, 90, 120]) * DAY
+    values = np.array([10.0, 11.0, 12.0, 13.0, 14.0])
+    flags = np.array([1, 1, 0, 1, 1], dtype=float)
+    stats = series_stats(taken_at, values, flags)
+    assert stats["slope_per_30d"] == pytest.approx(1.0)
+    assert stats["delta"] == 1.0 and stats["delta_from_first"] == 4.0
+    assert stats["out_of_range"] == 4
+    assert stats["current_streak"] == 2 and stats["longest_streak"] == 2
+    assert stats["last_flag"] == 1
+    one = series_stats(taken_at[:1], values[:1], np.array([np.nan]))
+    assert one["slope_per_30d"] is None and one["delta"] is None and one["last_flag"] is None
+
+def test_trends_flags_values_against_their_reference(store):
+    for i, value in enumerate([12.0, 12.5, 14.0, 18.0]):
+        store.add_report("p1", [hb(value)], taken_at=T0 + i * 30 * DAY)
+    store.add_report("p2", [hb(15.0)], taken_at=T0)
+    trend = store.trends("p1", points=2)["Hemoglobin"]
+    assert trend["count"] == 4 and trend["last_value"] == 18.0
+    assert trend["out_of_range"] == 3 and trend["longest_streak"] == 2 and trend["last_flag"] == 1
+    assert trend["reference"] == [13.5, 17.5] and trend["unit"] == "g/dL"
+    assert [p["value"] for p in trend["points"]] == [14.0, 18.0]
+    assert store.trends("p1", since=T0 + 45 * DAY)["Hemoglobin"]["count"] == 2
+    assert store.trends("p1", tests=["Glucose"]) == {}
+
+def test_status_is_used_without_a_range_and_bad_values_are_skipped(store):
+    stored = store.add_report("p1", [
+        {"test": "TSH", "value": "6.1", "status": "High"},
+        {"test": "Glucose", "value": "n/a"},
+        {"test": "Urea", "value": 30},
+    ], taken_at=T0)
+    assert stored == 2
+    trends = store.trends("p1")
+    assert trends["TSH"]["last_flag"] == 1 and trends["TSH"]["reference"] is None
+    assert trends["Urea"]["last_flag"] is None and trends["Urea"]["out_of_range"] == 0
+
+def test_re_adding_a_report_replaces_it(store):
+    store.add_report("p1", [hb(12.0), {"test": "Platelets", "value": 100, "reference": "150-450"}],
+                     taken_at=T0, report_id="r1")
+    store.add_report("p1", [hb(14.0)], taken_at=T0 + DAY, report_id="r2")
+    # a corrected r1 with a different date and without the platelet line
+    store.add_report("p1", [hb(13.0)], taken_at=T0 + 2 * DAY, report_id="r1")
+    trends = store.trends("p1", points=5)
+    assert set(trends) == {"Hemoglobin"}
+    assert [p["value"] for p in trends["Hemoglobin"]["points"]] == [14.0, 13.0]
+    assert store.stats() == {"values": 2, "patients": 1, "reports": 2}
+    assert store.delete_patient("p1") == 2
+    assert store.trends("p1") == {}
@@ -0,0 +1,43 @@
+# ai_service/tests/test_metrics.py
+# In-process metrics (modules/metrics.py): Prometheus text rendering of counters, gauges and histograms.
+
+from modules.metrics import Counter, Gauge, Histogram, span
+
+def test_counter_renders_sorted_escaped_series():
+    c = Counter("test_requests_total", "Requests", ("endpoint",))
+    c.inc("b")
+    c.inc("a", amount=2)
+    c.inc('we"ird\n')
+    assert c.get("a") == 2 and c.get("missing") == 0
+    assert c.render() == [
+        "# HELP test_requests_total Requests",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{endpoint="a"} 2',
+        'test_requests_total{endpoint="b"} 1',
+        'test_requests_total{endpoint="we\\"ird\\n"} 1',
+    ]
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("test_stage_seconds", "Stages", "stage", buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe("ocr", v)
+    lines = h.render()[2:]
+    assert lines == [
+        'test_stage_seconds_bucket{stage="ocr",le="0.1"} 2',
+        'test_stage_seconds_bucket{stage="ocr",le="1.0"} 3',
+        'test_stage_seconds_bucket{stage="ocr",le="+Inf"} 4',
+        'test_stage_seconds_sum{stage="ocr"} 3.65',
+        'test_stage_seconds_count{stage="ocr"} 4',
+    ]
+    assert h.stats("ocr") == (4, 3.65) and h.stats("none") == (0, 0.0)
+
+def test_span_times_into_the_given_histogram():
+    h = Histogram("test_span_seconds", "Spans", "stage")
+    with span("tokenize", h):
+        pass
+    count, total = h.stats("tokenize")
+    assert count == 1 and 0 <= total < 1
+
+def test_gauge_skips_a_failing_callback():
+    assert Gauge("test_live", "Live", lambda: 3).render()[-1] == "test_live 3"
+    assert Gauge("test_broken", "Broken", lambda: 1 / 0).render() == []
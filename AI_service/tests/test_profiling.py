@@ -0,0 +1,56 @@
+# ai_service/tests/test_profiling.py
+# Per-request profiling (modules/profiling.py): request selection, the ring buffer and captured entries.
+
+import asyncio
+import marshal
+
+from modules.profiling import ProfileStore, ProfilingMiddleware, profile_bytes, profile_text
+
+def http_scope(path="/predict/symptoms", headers=()):
+    return {"type": "http", "method": "POST", "path": path, "query_string": b"lang=en",
+            "headers": [(b"content-type", b"application/json")] + list(headers)}
+
+async def echo_app(scope, receive, send):
+    message = await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": message["body"]})
+
+def call(middleware, scope, body=b'{"text": "fever"}'):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+def test_only_requested_or_sampled_requests_are_profiled():
+    store = ProfileStore()
+    middleware = ProfilingMiddleware(echo_app, store)
+    call(middleware, http_scope())
+    call(middleware, http_scope(headers=[(b"x-profile", b"0")]))
+    call(middleware, http_scope("/metrics", headers=[(b"x-profile", b"1")]))
+    assert store.list() == []
+    call(ProfilingMiddleware(echo_app, store, sample_rate=1.0), http_scope())
+    assert len(store.list()) == 1
+
+def test_profiled_request_is_fingerprinted_and_readable():
+    store = ProfileStore()
+    sent = call(ProfilingMiddleware(echo_app, store), http_scope(headers=[(b"x-profile", b"1")]))
+    assert sent[-1]["body"] == b'{"text": "fever"}'
+    [summary] = store.list()
+    assert "profile" not in summary
+    assert summary["status"] == 200 and summary["path"] == "/predict/symptoms"
+    assert summary["fingerprint"]["body_bytes"] == 17 and summary["fingerprint"]["query"] == "lang=en"
+    entry = store.get(summary["id"])
+    assert "function calls" in profile_text(entry)
+    assert isinstance(marshal.loads(profile_bytes(entry)), dict)
+
+def test_store_evicts_oldest_first():
+    store = ProfileStore(capacity=2)
+    ids = [store.add({"mode": "cprofile", "profile": None}) for _ in range(3)]
+    assert [e["id"] for e in store.list()] == [ids[2], ids[1]]
+    assert store.get(ids[0]) is None
@@ -0,0 +1,74 @@
+# ai_service/tests/test_recorder.py
+# Anonymization of recorded traffic (modules/recorder.py).
+
+import pytest
+
+from modules.recorder import scrub_report_text, scrub_text
+
+@pytest.mark.parametrize("text, expected", [
+    ("Hi I am John Smith, I have fever", "Hi I am <name>, I have fever"),
+    ("I'm Priya and my head hurts", "I'm <name> and my head hurts"),
+    ("I’m Sara", "I’m <name>"),
+    ("this is Ravi Kumar here", "this is <name> here"),
+    ("my name is anil", "my name is <name>"),
+    ("i am called Neha Rao", "i am called <name>"),
+    ("Dr. Mehta told me to rest", "Dr. <name> told me to rest"),
+    ("seen by dr Mehta yesterday", "seen by dr <name> yesterday"),
+    ("This is Dr Mehta", "This is Dr <name>"),
+    ("Mrs. Sunita Devi has a cough", "Mrs. <name> has a cough"),
+    ("hi i'm john smith", "hi i'm <name>"),
+    ("my son Rahul has fever", "my son <name> has fever"),
+    ("my wife, priya is sick", "my wife, <name> is sick"),
+    ("i am ashish, fever since 2 days", "i am <name>, fever since 2 days"),
+])
+def test_scrub_text_masks_names(text, expected):
+    assert scrub_text(text) == expected
+
+@pytest.mark.parametrize("text", [
+    "I am feeling dizzy and I'm tired",
+    "this is the third day of fever",
+    "I have MS symptoms",
+    "I am Feeling dizzy",
+    "I am Indian",
+    "This is Sunday",
+    "i am 45 years old and diabetic",
+    "I am having chest pain since Monday",
+    "given IM injection yesterday",
+])
+def test_scrub_text_keeps_symptoms(text):
+    assert scrub_text(text) == text
+
+def test_scrub_text_masks_contact_details():
+    text = "mail me at a.b@example.com or call +91 98765 43210 since 12/03/2024"
+    assert scrub_text(text) == "mail me at <email> or call <number> since <date>"
+
+@pytest.mark.parametrize("line", [
+    "Patient : Ravi Kumar",
+    "Patient: Anil Sharma  Age: 45",
+    "Pt Name: Ravi",
+    "Name of Patient: Ravi Kumar",
+    "RAVI KUMAR   45Y/M",
+])
+def test_scrub_report_text_masks_name_lines(line):
+    scrubbed = scrub_report_text(line + "\nHemoglobin 13.5 g/dL 13-17\n")
+    for leaked in ("Ravi", "RAVI", "Kumar", "KUMAR", "Anil", "Sharma"):
+        assert leaked not in scrubbed
+    assert scrubbed.endswith("Hemoglobin 13.5 g/dL 13-17\n")
+
+def test_scrub_report_text_keeps_lab_lines():
+    table = "PLATELET COUNT 150/MM3\nTSH 4.5 mIU/mL 0.4-4.0\nHEMOGLOBIN 13.5 g/dL 13-17\n"
+    assert scrub_report_text(table) == table
+
+def test_scrub_report_text():
+    report = ("CITY LAB\n"
+              "Mr. Ravi Kumar  Age 45\n"
+              "Ref. By Dr.Mehta\n"
+              "MRS SUNITA DEVI   F/38\n"
+              "Patient Name : Ravi\n"
+              "UHID - 12345\n"
+              "Hemoglobin 13.5 g/dL 13-17\n")
+    scrubbed = scrub_report_text(report)
+    for leaked in ("Ravi", "Kumar", "Mehta", "SUNITA", "DEVI", "12345"):
+        assert leaked not in scrubbed
+    assert "Mr. <name>  Age 45" in scrubbed
+    assert "Hemoglobin 13.5 g/dL 13-17" in scrubbed
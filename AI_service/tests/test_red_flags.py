@@ -0,0 +1,49 @@
+# ai_service/tests/test_red_flags.py
+# Red-flag screening (modules/red_flags.py): key normalisation, negated clauses and modifier flags.
+
+from modules.red_flags import RedFlagScanner, is_modifier, negated
+
+FLAGS = {
+    "chest pain": "Possible heart attack",
+    "breath shortness": "Respiratory distress",
+    "vision_blur": "Neurological warning",
+    "sweating": "With chest pain, possible cardiac event",
+}
+
+def symptoms(alerts):
+    return [a["symptom"] for a in alerts]
+
+def test_scan_matches_spaced_underscored_and_cased_keys():
+    scanner = RedFlagScanner(FLAGS)
+    assert symptoms(scanner.scan_text("Sudden CHEST   PAIN and vision blur")) == ["chest pain", "vision_blur"]
+    assert symptoms(scanner.scan_text("chest_pain again, chest pain")) == ["chest pain"]
+    assert scanner.scan_text("") == []
+    assert RedFlagScanner({}).scan_text("chest pain") == []
+
+def test_negated_mentions_are_skipped():
+    scanner = RedFlagScanner(FLAGS)
+    for text in ("no chest pain", "denies chest pain or sweating", "I don't have chest pain",
+                 "negative for chest pain", "never had any real chest pain"):
+        assert scanner.scan_text(text) == [], text
+
+def test_negation_stops_at_the_clause_or_the_window():
+    scanner = RedFlagScanner(FLAGS)
+    assert symptoms(scanner.scan_text("no fever, but chest pain since morning")) == ["chest pain"]
+    assert symptoms(scanner.scan_text("no cough. Chest pain now")) == ["chest pain"]
+    # the cue is more than five words before the mention
+    text = "no fever for the last three days then chest pain"
+    assert not negated(text, text.index("chest"))
+    assert symptoms(scanner.scan_text(text)) == ["chest pain"]
+
+def test_modifiers_only_ride_along_with_a_standalone_flag():
+    scanner = RedFlagScanner(FLAGS)
+    assert is_modifier(FLAGS["sweating"]) and not is_modifier(FLAGS["chest pain"])
+    alone = scanner.scan_text("heavy sweating at night")
+    assert symptoms(alone) == ["sweating"]
+    assert scanner.standalone(alone) == []
+    both = scanner.scan_text("sweating with chest pain")
+    assert symptoms(scanner.standalone(both)) == ["sweating", "chest pain"]
+
+def test_check_normalises_extracted_symptom_ids():
+    scanner = RedFlagScanner(FLAGS)
+    assert symptoms(scanner.check(["chest_pain", "fever", "Vision Blur", "chest pain"])) == ["chest pain", "vision_blur"]
@@ -0,0 +1,40 @@
+# ai_service/tests/test_responses.py
+# Response encoding (modules/responses.py): Accept negotiation and the JSON / msgpack encoders.
+
+import json
+
+import numpy as np
+import pytest
+
+from modules import responses
+from modules.responses import FastResponse, _wants_msgpack, dumps_json, wants_msgpack
+
+@pytest.mark.skipif(responses.msgpack is None, reason="msgpack not installed")
+@pytest.mark.parametrize("accept, expected", [
+    ("application/msgpack", True),
+    ("application/x-msgpack;q=0.9, application/json", True),
+    ("application/json, application/msgpack", False),
+    ("*/*", False),
+    ("text/html", False),
+    ("", False),
+])
+def test_wants_msgpack_takes_the_first_listed_type(accept, expected):
+    assert wants_msgpack(accept) is expected
+
+def test_dumps_json_handles_numpy_values():
+    content = {"score": np.float32(0.5), "ids": np.array([1, 2]), "ok": True}
+    assert json.loads(dumps_json(content)) == {"score": 0.5, "ids": [1, 2], "ok": True}
+
+@pytest.mark.skipif(responses.msgpack is None, reason="msgpack not installed")
+def test_fast_response_encodes_what_the_request_negotiated():
+    content = {"success": True, "probs": [0.25, 0.75]}
+    plain = FastResponse(content)
+    assert plain.media_type == "application/json" and json.loads(plain.body) == content
+    token = _wants_msgpack.set(True)
+    try:
+        packed = FastResponse(content)
+    finally:
+        _wants_msgpack.reset(token)
+    assert packed.media_type == "application/msgpack"
+    assert packed.headers["vary"] == "Accept"
+    assert responses.loads_msgpack(packed.body) == content
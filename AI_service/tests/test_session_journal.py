@@ -0,0 +1,86 @@
+# ai_service/tests/test_session_journal.py
+# Session journal (modules/session_journal.py): recovery, torn / corrupt tails, compaction.
+
+import json
+import os
+import time
+
+from modules.session_journal import SNAPSHOT, SessionJournal, _segment_seq
+
+def _sessions(directory, **kwargs):
+    journal = SessionJournal(str(directory), **kwargs)
+    try:
+        return {sid: json.loads(raw) for sid, (_, raw) in journal.recover().items()}, journal.last_recovery
+    finally:
+        journal.close()
+
+def _write(directory, ops, **kwargs):
+    journal = SessionJournal(str(directory), **kwargs)
+    journal.recover()
+    journal.start()
+    for op in ops:
+        op(journal)
+    return journal
+
+def _segments(directory):
+    return sorted(s for s in map(_segment_seq, os.listdir(directory)) if s is not None)
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_recover_latest_state(tmp_path):
+    now = time.time()
+    _write(tmp_path, [
+        lambda j: j.put("a", now, {"extracted": ["fever"]}),
+        lambda j: j.put("b", now, {"extracted": ["cough"]}),
+        lambda j: j.put("a", now, {"extracted": ["fever", "headache"]}),
+        lambda j: j.delete("b"),
+    ]).close()
+    sessions, recovery = _sessions(tmp_path)
+    assert sessions == {"a": {"extracted": ["fever", "headache"]}}
+    assert recovery["records"] == 4
+
+def test_recovery_stops_at_torn_and_corrupt_records(tmp_path):
+    now = time.time()
+    _write(tmp_path, [lambda j, i=i: j.put(f"s{i}", now, {"i": i}) for i in range(3)]).close()
+    segment = os.path.join(tmp_path, f"journal-{_segments(tmp_path)[-1]:08d}.log")
+    with open(segment, "ab") as f:
+        f.write(b"\x40\x00\x00\x00partial")  # a crash in the middle of a record
+    assert _sessions(tmp_path)[0] == {f"s{i}": {"i": i} for i in range(3)}
+
+    with open(segment, "r+b") as f:
+        data = f.read()
+        last = data.rindex(b'{"i":2}')
+        f.seek(last + 5)
+        f.write(b"9")  # flip a byte of the last complete record: its crc no longer matches
+    assert _sessions(tmp_path)[0] == {"s0": {"i": 0}, "s1": {"i": 1}}
+
+def test_record_count_compaction_bounds_recovery(tmp_path):
+    now = time.time()
+    journal = _write(tmp_path, [lambda j, i=i: j.put(f"s{i % 5}", now, {"i": i}) for i in range(40)],
+                     compact_records=10, fsync_interval=0.01)
+    _wait(lambda: journal.counts["compactions"] >= 1 and journal.pending_records == 0)
+    journal.put("s0", now, {"i": "last"})
+    journal.close()
+
+    assert os.path.exists(os.path.join(tmp_path, SNAPSHOT))
+    assert len(_segments(tmp_path)) == 1  # compacted segments are removed
+    sessions, recovery = _sessions(tmp_path)
+    assert sessions == {"s0": {"i": "last"}, **{f"s{k}": {"i": 35 + k} for k in range(1, 5)}}
+    # five snapshot records plus the one appended after compaction, not all 41
+    assert recovery["records"] == 6
+
+def test_time_based_compaction_when_idle(tmp_path):
+    now = time.time()
+    journal = _write(tmp_path, [lambda j: j.put("a", now, {"x": 1})], compact_seconds=0.05, fsync_interval=0.01)
+    _wait(lambda: journal.counts["compactions"] >= 1)
+    journal.close()
+    sessions, recovery = _sessions(tmp_path)
+    assert sessions == {"a": {"x": 1}} and recovery["records"] == 1
+
+def test_expired_sessions_dropped(tmp_path):
+    _write(tmp_path, [lambda j: j.put("old", time.time() - 120, {}), lambda j: j.put("new", time.time(), {})]).close()
+    assert _sessions(tmp_path, ttl_seconds=60)[0] == {"new": {}}
@@ -0,0 +1,82 @@
+# ai_service/tests/test_text_pipeline.py
+# Shared-tokenization heads (modules/text_pipeline.py): rows and probabilities match the heads' own models.
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import MultinomialNB
+
+from modules.text_pipeline import TextHead, TextPipeline
+
+CORPUS = [
+    "fever and headache with body ache", "high fever chills and sweating", "headache and stiff neck",
+    "chest pain and shortness of breath", "pain in chest while walking", "shortness of breath at night",
+    "itching skin rash and redness", "skin rash with itching on arms", "red patches on the skin",
+]
+LABELS = ["fever", "fever", "fever", "cardio", "cardio", "cardio", "skin", "skin", "skin"]
+TEXTS = [
+    "Fever, headache and a stiff neck since Monday",
+    "pain in chest pain in chest; shortness of breath",
+    "Itching!! skin rash",
+    "nothing the model has seen",
+    "",
+]
+
+VECTORIZERS = [
+    lambda: CountVectorizer(),
+    lambda: CountVectorizer(binary=True, ngram_range=(1, 2), stop_words="english"),
+    lambda: TfidfVectorizer(ngram_range=(1, 3)),
+    lambda: TfidfVectorizer(stop_words="english", binary=True, min_df=1),
+    lambda: TfidfVectorizer(sublinear_tf=True, norm="l1", strip_accents="unicode"),
+    lambda: TfidfVectorizer(vocabulary=["pain in chest", "skin rash", "fever", "stiff neck"], ngram_range=(1, 3)),
+]
+CLASSIFIERS = [lambda: LogisticRegression(max_iter=1000), MultinomialNB]
+
+def fit_head(name, make_vect, make_clf, labels=LABELS, source="text"):
+    vect = make_vect()
+    X = vect.fit_transform(CORPUS)
+    return TextHead(name, vect, make_clf().fit(X, labels), source=source)
+
+@pytest.mark.parametrize("make_clf", CLASSIFIERS)
+@pytest.mark.parametrize("make_vect", VECTORIZERS)
+def test_rows_and_probabilities_match_the_heads_own_models(make_vect, make_clf):
+    head = fit_head("triage", make_vect, make_clf)
+    pipeline = TextPipeline([head])
+    assert head.shared and head.linear is not None
+    for text in TEXTS:
+        out = pipeline.run({"text": text})["triage"]
+        expected = head.vect.transform([text])
+        assert out["X"].shape == expected.shape
+        assert np.allclose(out["X"].toarray(), expected.toarray())
+        assert np.allclose(out["probs"], head.clf.predict_proba(expected)[0])
+
+def test_binary_logistic_head_uses_sigmoid():
+    head = fit_head("urgent", TfidfVectorizer, lambda: LogisticRegression(max_iter=1000),
+                    labels=[l == "cardio" for l in LABELS])
+    TextPipeline([head])
+    assert head.linear[2] == "sigmoid"
+    X = head.vect.transform(TEXTS)
+    for i in range(len(TEXTS)):
+        assert np.allclose(head.proba(X[i].tocsr()), head.clf.predict_proba(X[i])[0])
+
+def test_heads_with_the_same_tokenizer_share_one_token_stream(monkeypatch):
+    a = fit_head("a", CountVectorizer, MultinomialNB)
+    b = fit_head("b", lambda: TfidfVectorizer(ngram_range=(1, 2)), lambda: LogisticRegression(max_iter=1000))
+    c = fit_head("c", CountVectorizer, MultinomialNB, source="symptoms")
+    pipeline = TextPipeline([a, b, c])
+    calls = []
+    tokens = pipeline.tokens
+    monkeypatch.setattr(pipeline, "tokens", lambda key, text: calls.append(text) or tokens(key, text))
+    out = pipeline.run({"text": "fever and headache", "symptoms": "fever headache"})
+    assert sorted(out) == ["a", "b", "c"]
+    assert calls == ["fever and headache", "fever headache"]
+    assert pipeline.run({"text": "fever"}, heads=["c"]) == {}
+
+def test_unreproducible_vectorizer_falls_back_to_transform():
+    head = fit_head("chars", lambda: TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 3)), MultinomialNB)
+    pipeline = TextPipeline([head])
+    assert not head.shared
+    out = pipeline.run({"text": TEXTS[0]})["chars"]
+    assert np.allclose(out["probs"], head.clf.predict_proba(head.vect.transform([TEXTS[0]]))[0])
+    assert pipeline.describe()["chars"]["shared_tokens"] is False
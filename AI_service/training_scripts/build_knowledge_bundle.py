@@ -0,0 +1,65 @@
+"""
+Compile the service's knowledge files into one precompiled bundle.
+
+symptom_list.json, synonyms.json, red_flags.json, medicine_rules.json and the
+feature columns of the served model are written to knowledge/knowledge.bundle
+(see modules/knowledge_bundle.py for the format). The service loads it at
+startup instead of the JSON files; rebuild after editing any of them or
+retraining the model (a stale bundle is ignored, with a warning).
+
+    python training_scripts/build_knowledge_bundle.py [--model path.pkl] [--output path]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+BASE_DIR = os.path.dirname(__file__)
+SERVICE_DIR = os.path.abspath(os.path.join(BASE_DIR, '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+KNOWLEDGE_DIR = os.path.join(SERVICE_DIR, 'knowledge')
+
+def model_features(model_path):
+    """(feature column names, fingerprint) of a model artifact, or (None, None) without a vectorizer."""
+    from main import InferenceEngine
+    from modules.knowledge_bundle import _file_checksum
+    engine = InferenceEngine(model_path=model_path, fuzzy_budget_ms=0)
+    if engine.vect is None or not engine.symptom_cols:
+        return None, None
+    names = [str(f) for f in engine.symptom_cols]
+    return names, {"path": os.path.basename(model_path), "size": os.path.getsize(model_path),
+                   "checksum": _file_checksum(model_path), "n_features": len(names)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precompiled knowledge bundle")
+    parser.add_argument("--knowledge-dir", default=KNOWLEDGE_DIR, help="directory with the knowledge JSON files")
+    parser.add_argument("--model", default=os.path.join(KNOWLEDGE_DIR, 'medicore_model_v4.pkl'),
+                        help="served model artifact whose feature columns are bundled")
+    parser.add_argument("--no-model", action="store_true", help="bundle the knowledge files only")
+    parser.add_argument("--output", default=None, help="bundle path (default: <knowledge-dir>/knowledge.bundle)")
+    args = parser.parse_args()
+
+    from modules.knowledge_bundle import KnowledgeBundle, build_bundle, write_bundle
+    output = args.output or os.path.join(args.knowledge_dir, 'knowledge.bundle')
+
+    features, fingerprint = None, None
+    if not args.no_model:
+        if not os.path.exists(args.model):
+            parser.error(f"model not found: {args.model} (use --no-model to skip feature columns)")
+        features, fingerprint = model_features(args.model)
+
+    t0 = time.perf_counter()
+    data = build_bundle(args.knowledge_dir, features, fingerprint)
+    write_bundle(output, data)
+    build_s = time.perf_counter() - t0
+
+    # Read it back the way the service does
+    bundle = KnowledgeBundle.load(output)
+    print(json.dumps({"output": output, "bytes": len(data), "build_seconds": round(build_s, 4),
+                      "load_seconds": round(bundle.load_seconds, 4), **bundle.meta["counts"]}, indent=2))
+
+if __name__ == "__main__":
+    main()
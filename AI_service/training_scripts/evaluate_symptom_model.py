@@ -0,0 +1,261 @@
+"""
+Evaluate the symptom model through the serving path on a labelled dataset.
+
+The CSV (label, text columns) is streamed in --batch-size chunks to a pool of
+--workers processes, each holding the service's engine as main.py builds it
+(knowledge bundle, red-flag guard, fuzzy matching; --model swaps the artifact).
+Per chunk, every text goes through normalize_text as a request would, then the
+extracted symptoms of the whole chunk are vectorized and scored in one
+predict_proba call, which gives the same probabilities as one call per request.
+
+Reported:
+  - top-1 / top-3 accuracy of what the service would show (classes under 1% are
+    never shown, as in rank_classes), a per-class confusion matrix and per-class
+    precision / recall,
+  - extraction recall against the symptom list: a symptom counts as mentioned
+    when all its words occur in the text (plural "s" ignored, any order), or,
+    with --reference-column, when the dataset lists it,
+  - per-sample latency percentiles of extraction, of the batched scoring
+    (amortized per row) and of the full start_session call on every
+    --latency-every-th row (prediction cache cleared first), plus the rows the
+    red-flag fast path would have answered without the model.
+
+    python training_scripts/evaluate_symptom_model.py --dataset path/to/Symptom2Disease.csv --workers 4
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(__file__)
+SERVICE_DIR = os.path.abspath(os.path.join(BASE_DIR, '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+DATASET_PATH = os.path.join(SERVICE_DIR, 'datasets/Symptomdisease-NLP/Symptom2Disease.csv')
+MIN_SHOWN = 0.01  # rank_classes drops classes at or below this probability
+_WORD = re.compile(r"[a-z]+")
+
+# ----------------------------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------------------------
+_main = None
+_engine = None
+_symptom_words = None
+
+def _init_worker(model_path):
+    global _main, _engine, _symptom_words
+    for var in ("MEDICORE_RECORD_DIR", "MEDICORE_SESSION_JOURNAL_DIR", "MEDICORE_SHADOW_MODEL"):
+        os.environ.pop(var, None)
+    os.environ["MEDICORE_WARMUP"] = "0"
+    import main
+    if model_path:
+        main.engine.factory = lambda: main.build_engine(model_path)
+    _main, _engine = main, main.engine.get()
+    vocab = _engine.symptom_list if isinstance(_engine.symptom_list, list) else []
+    _symptom_words = [(s, {_stem(w) for w in s.split("_") if w}) for s in vocab]
+
+def _stem(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+def mentioned_symptoms(text):
+    """Symptom list entries all of whose words occur in the text."""
+    words = {_stem(w) for w in _WORD.findall(text.lower())}
+    return {s for s, parts in _symptom_words if parts and parts <= words}
+
+def _evaluate_chunk(rows, latency_every, offset):
+    """rows: [(label, text, reference symptoms or None)]; `offset` is the chunk's first row number."""
+    engine, vect, clf = _engine, _engine.vect, _engine.clf
+    extracted, extract_ms, serve_ms = [], [], []
+    ref_total = ref_hit = n_extracted = empty = red_flag = 0
+    missed = Counter()
+    for i, (label, text, reference) in enumerate(rows):
+        t0 = time.perf_counter()
+        found = engine.normalize_text(text)
+        extract_ms.append((time.perf_counter() - t0) * 1000)
+        extracted.append(found)
+        reference = set(reference) if reference is not None else mentioned_symptoms(text)
+        hits = reference.intersection(found)
+        ref_total += len(reference)
+        ref_hit += len(hits)
+        missed.update(reference - hits)
+        n_extracted += len(found)
+        empty += not found
+        if _main.guard.get().scan(text, []):
+            red_flag += 1
+        if latency_every and (offset + i) % latency_every == 0:
+            with engine._cache_lock:
+                engine._cache.clear()
+            t0 = time.perf_counter()
+            engine.start_session(text)
+            serve_ms.append((time.perf_counter() - t0) * 1000)
+
+    # the text the model sees for each request (predict joins the extracted symptoms)
+    t0 = time.perf_counter()
+    texts = [" ".join(found) for found in extracted]
+    probs = clf.predict_proba(vect.transform(texts) if vect is not None else texts)
+    batch_ms = (time.perf_counter() - t0) * 1000
+    order = np.argsort(-probs, axis=1)[:, :3]
+    top3 = [[clf.classes_[j] for j in row if p[j] > MIN_SHOWN] for row, p in zip(order, probs)]
+    return {
+        "labels": [label for label, _, _ in rows],
+        "top3": top3,
+        "extract_ms": extract_ms,
+        "serve_ms": serve_ms,
+        "batch_ms": batch_ms,
+        "reference": ref_total,
+        "reference_found": ref_hit,
+        "extracted": n_extracted,
+        "empty": empty,
+        "red_flag": red_flag,
+        "missed": missed,
+    }
+
+# ----------------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------------
+def read_chunks(path, batch_size, limit, reference_column):
+    """[(label, text, reference)] chunks streamed from the CSV."""
+    seen = 0
+    for df in pd.read_csv(path, chunksize=batch_size):
+        if limit:
+            df = df.iloc[:max(limit - seen, 0)]
+        if df.empty:
+            return
+        refs = [None] * len(df)
+        if reference_column:
+            refs = [[s.strip().replace(" ", "_") for s in re.split(r"[;,|]", str(v)) if s.strip()]
+                    if isinstance(v, str) else [] for v in df[reference_column]]
+        yield list(zip(df["label"].astype(str), df["text"].fillna("").astype(str), refs))
+        seen += len(df)
+
+def percentiles(values):
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=float)
+    return {"p50_ms": float(np.percentile(arr, 50)), "p95_ms": float(np.percentile(arr, 95)),
+            "p99_ms": float(np.percentile(arr, 99)), "mean_ms": float(arr.mean()), "count": len(arr)}
+
+def confusion(labels, predicted):
+    """(class names, matrix[true][predicted]); rows with nothing shown count under "(none)"."""
+    names = sorted(set(labels) | {p for p in predicted if p is not None})
+    if None in predicted:
+        names.append("(none)")
+    index = {n: i for i, n in enumerate(names)}
+    matrix = np.zeros((len(names), len(names)), dtype=np.int64)
+    np.add.at(matrix, ([index[l] for l in labels], [index[p if p is not None else "(none)"] for p in predicted]), 1)
+    return names, matrix
+
+def per_class(names, matrix):
+    tp = np.diag(matrix).astype(float)
+    support = matrix.sum(axis=1)
+    predicted = matrix.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {n: {"precision": float(precision[i]), "recall": float(recall[i]), "f1": float(f1[i]),
+                "support": int(support[i])} for i, n in enumerate(names) if support[i] or predicted[i]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the symptom model through the serving path")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="CSV with 'label' and 'text' columns")
+    parser.add_argument("--model", default=None, help="model artifact (default: the served model)")
+    parser.add_argument("--reference-column", default=None,
+                        help="column listing each row's symptoms (';' or ',' separated) for extraction recall")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per chunk sent to a worker")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument("--limit", type=int, default=0, help="evaluate at most this many rows")
+    parser.add_argument("--latency-every", type=int, default=10,
+                        help="time the full start_session call on every n-th row (0: never)")
+    parser.add_argument("--json", default="symptom_model_eval.json", help="write the report to this file")
+    args = parser.parse_args()
+
+    labels, predicted, top3_hits = [], [], []
+    extract_ms, serve_ms, batch_ms_per_row = [], [], []
+    totals, missed = Counter(), Counter()
+    t0 = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(args.model,)) as pool:
+        # at most two chunks in flight per worker, so memory stays flat on any dataset size
+        pending, offset = deque(), 0
+
+        def collect(future):
+            r = future.result()
+            labels.extend(r["labels"])
+            predicted.extend(t[0] if t else None for t in r["top3"])
+            top3_hits.extend(l in t for l, t in zip(r["labels"], r["top3"]))
+            extract_ms.extend(r["extract_ms"])
+            serve_ms.extend(r["serve_ms"])
+            batch_ms_per_row.append(r["batch_ms"] / max(len(r["labels"]), 1))
+            for k in ("reference", "reference_found", "extracted", "empty", "red_flag"):
+                totals[k] += r[k]
+            missed.update(r["missed"])
+
+        for chunk in read_chunks(args.dataset, args.batch_size, args.limit, args.reference_column):
+            pending.append(pool.submit(_evaluate_chunk, chunk, args.latency_every, offset))
+            offset += len(chunk)
+            if len(pending) >= 2 * args.workers:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+    wall = time.perf_counter() - t0
+    if not labels:
+        sys.exit(f"No rows in {args.dataset}")
+
+    n = len(labels)
+    top1 = float(np.mean([l == p for l, p in zip(labels, predicted)]))
+    top3 = float(np.mean(top3_hits))
+    names, matrix = confusion(labels, predicted)
+    classes = per_class(names, matrix)
+    extraction = {
+        "reference": "dataset column " + args.reference_column if args.reference_column else "symptom list words in text",
+        "recall": totals["reference_found"] / totals["reference"] if totals["reference"] else None,
+        "mentioned_per_row": totals["reference"] / n,
+        "extracted_per_row": totals["extracted"] / n,
+        "rows_without_symptoms": totals["empty"] / n,
+        "most_missed": missed.most_common(20),
+    }
+    latency = {"extraction": percentiles(extract_ms), "batched_scoring_per_row": percentiles(batch_ms_per_row),
+               "start_session": percentiles(serve_ms)}
+
+    print(f"Evaluated {n} rows in {wall:.1f}s with {args.workers} workers ({n / wall:.0f} rows/s)")
+    print(f"top-1 accuracy {top1:.4f}   top-3 accuracy {top3:.4f}   "
+          f"red-flag fast path {totals['red_flag']} rows ({totals['red_flag'] / n:.1%})")
+    recall = extraction["recall"]
+    print(f"extraction recall {'-' if recall is None else format(recall, '.4f')} ({extraction['reference']}), "
+          f"{extraction['extracted_per_row']:.2f} symptoms/row, {extraction['rows_without_symptoms']:.1%} rows with none")
+    if missed:
+        print("most missed: " + ", ".join(f"{s} {c}" for s, c in missed.most_common(8)))
+    print(f"{'latency':<26}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}{'count':>8}")
+    for stage, s in latency.items():
+        if s:
+            print(f"{stage:<26}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['count']:>8}")
+    print(f"{'class':<34}{'precision':>10}{'recall':>10}{'f1':>8}{'support':>9}")
+    for name, c in sorted(classes.items(), key=lambda kv: kv[1]["f1"]):
+        print(f"{name[:33]:<34}{c['precision']:>10.3f}{c['recall']:>10.3f}{c['f1']:>8.3f}{c['support']:>9}")
+    off = matrix.copy()
+    np.fill_diagonal(off, 0)
+    worst = [(names[i], names[j], int(off[i, j])) for i, j in zip(*np.unravel_index(np.argsort(-off, axis=None)[:5], off.shape))
+             if off[i, j]]
+    if worst:
+        print("top confusions: " + ", ".join(f"{t} -> {p} ({c})" for t, p, c in worst))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "rows": n, "seconds": wall, "top1_accuracy": top1, "top3_accuracy": top3,
+                       "red_flag_rows": totals["red_flag"], "extraction": extraction, "latency_ms": latency,
+                       "per_class": classes, "confusion": {"labels": names, "matrix": matrix.tolist()}}, f, indent=2)
+        print(f"Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
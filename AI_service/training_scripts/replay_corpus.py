@@ -0,0 +1,240 @@
+"""
+Replay a recorded traffic corpus against a version of the triage engine and
+report analyzer, and report what moved.
+
+The corpus is what the service appends under MEDICORE_RECORD_DIR (see
+modules/recorder.py). Each record is replayed through the same entry points
+the service uses: begin_triage for triage starts, apply_answer for follow-up
+answers (from the recorded symptom state, no session needed) and the findings
+stage for reports (recorded OCR text).
+
+The version under test is the service code in --service-dir (default: this
+checkout; point it at a git worktree of another revision, from the one that
+added the recorder on) serving --model, with --report-analyzer picking the
+report parser. By default its outputs are compared with the recorded ones; give
+--baseline-service-dir and/or --baseline-model to replay two versions side by
+side instead. Each version runs in its own pool of --workers processes.
+
+Reported per record kind: output changes (top disease, candidate ranking,
+extracted symptoms, emergency routing, report findings), top-1 agreement, rank
+correlation of the candidates and latency percentiles of both sides. Recorded
+latencies come from production (other hardware and load), so compare them
+loosely; two replayed versions are measured under the same conditions.
+
+    python training_scripts/replay_corpus.py --corpus data/corpus [--model candidate.pkl] [--workers 4]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(__file__)
+SERVICE_DIR = os.path.abspath(os.path.join(BASE_DIR, '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+from modules.recorder import KINDS, read_corpus, summarize_output
+from modules.shadow import rank_correlation
+
+REPORT_ANALYZERS = ("service", "rules")
+CHUNK = 64
+
+# ----------------------------------------------------------------------------
+# Worker side: one replay target per process
+# ----------------------------------------------------------------------------
+_service = None
+_report = None
+
+def _init_worker(service_dir, model_path, report_analyzer):
+    global _service, _report
+    # replays must not record, journal or shadow themselves
+    for var in ("MEDICORE_RECORD_DIR", "MEDICORE_SESSION_JOURNAL_DIR", "MEDICORE_SHADOW_MODEL"):
+        os.environ.pop(var, None)
+    os.environ["MEDICORE_WARMUP"] = "0"
+    # this script imported modules/ from its own checkout; the target's must win
+    for name in [m for m in sys.modules if m == "modules" or m.startswith("modules.")]:
+        del sys.modules[name]
+    sys.path.insert(0, service_dir)
+    import main
+    if model_path:
+        main.engine.factory = lambda: main.InferenceEngine(model_path=model_path,
+                                                           red_flag_scanner=main.guard.get().scanner)
+    main.engine.get()
+    main.begin_triage("headache", [])  # first prediction outside the timings
+    main.sessions.sessions.clear()
+    _service = main
+    try:
+        if report_analyzer == "rules":
+            from modules.medical_report_analyzer import MedicalReportAnalyzer
+            _report = MedicalReportAnalyzer().analyze_text
+        else:
+            from modules.report_pipeline import analyze_report_text
+            _report = analyze_report_text
+    except ImportError as e:
+        # e.g. the OCR dependencies MedicalReportAnalyzer imports; only report records fail
+        _report = _unavailable(e)
+
+def _unavailable(error):
+    def analyze(text):
+        raise RuntimeError(f"report analyzer unavailable: {error}")
+    return analyze
+
+def _replay_one(kind, inp):
+    main = _service
+    if kind == "triage":
+        result = main.begin_triage(inp["text"], list(inp.get("confirmed") or []))
+        main.sessions.sessions.pop(result["session_id"], None)
+        return result
+    if kind == "answer":
+        sdata = {"extracted": list(inp["extracted"]), "asked": list(inp["asked"])}
+        sid = main.sessions.create(sdata)
+        try:
+            return main.apply_answer(sid, sdata, inp["symptom"], bool(inp["answer"]))
+        finally:
+            main.sessions.sessions.pop(sid, None)
+    return _report(inp["text"])
+
+def _replay_chunk(records):
+    """(raw result or None, seconds, error) per record."""
+    out = []
+    for kind, inp in records:
+        t0 = time.perf_counter()
+        try:
+            result, error = _replay_one(kind, inp), None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        out.append((result, time.perf_counter() - t0, error))
+    return out
+
+def replay(records, service_dir, model_path, report_analyzer, workers):
+    """Summaries, latencies and errors of one version over the records, in order."""
+    ctx = multiprocessing.get_context("spawn")  # fresh interpreter per version
+    chunks = [[(r["kind"], r["input"]) for r in records[i:i + CHUNK]] for i in range(0, len(records), CHUNK)]
+    summaries, seconds, errors = [], [], []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(service_dir, model_path, report_analyzer)) as pool:
+        results = (item for chunk in pool.map(_replay_chunk, chunks) for item in chunk)
+        for r, (result, secs, error) in zip(records, results):
+            summaries.append(None if result is None else summarize_output(r["kind"], result))
+            seconds.append(secs)
+            errors.append(error)
+    return summaries, seconds, errors
+
+# ----------------------------------------------------------------------------
+# Comparison
+# ----------------------------------------------------------------------------
+def changed_fields(a, b):
+    return [k for k in sorted(set(a) | set(b)) if a.get(k) != b.get(k)]
+
+def _latency(values):
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=float) * 1000
+    return {"p50_ms": float(np.percentile(arr, 50)), "p95_ms": float(np.percentile(arr, 95)),
+            "p99_ms": float(np.percentile(arr, 99)), "mean_ms": float(arr.mean())}
+
+def compare(records, baseline, candidate, examples):
+    base_out, base_s, base_err = baseline
+    cand_out, cand_s, cand_err = candidate
+    summary, diffs = {}, []
+    for kind in KINDS:
+        idx = [i for i, r in enumerate(records) if r["kind"] == kind]
+        if not idx:
+            continue
+        fields, changed, agree, corrs, errors = Counter(), 0, 0, [], 0
+        for i in idx:
+            if base_out[i] is None or cand_out[i] is None:
+                errors += 1
+                continue
+            moved = changed_fields(base_out[i], cand_out[i])
+            fields.update(moved)
+            if moved:
+                changed += 1
+                if len(diffs) < examples:
+                    diffs.append({"kind": kind, "fields": moved, "input": records[i]["input"],
+                                  "baseline": base_out[i], "candidate": cand_out[i]})
+            if kind != "report":
+                agree += base_out[i]["top_disease"] == cand_out[i]["top_disease"]
+                corr = rank_correlation(base_out[i]["candidates"], cand_out[i]["candidates"])
+                if corr is not None:
+                    corrs.append(corr)
+        compared = len(idx) - errors
+        summary[kind] = {
+            "records": len(idx),
+            "errors": errors,
+            "changed": changed,
+            "changed_rate": changed / compared if compared else None,
+            "changed_fields": dict(fields),
+            "top1_agreement": agree / compared if compared and kind != "report" else None,
+            "mean_rank_correlation": float(np.mean(corrs)) if corrs else None,
+            "latency": {"baseline": _latency([base_s[i] for i in idx]),
+                        "candidate": _latency([cand_s[i] for i in idx])},
+        }
+    error_samples = [e for e in base_err + cand_err if e][:5]
+    return summary, diffs, error_samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded traffic corpus and diff the outputs")
+    parser.add_argument("--corpus", required=True, help="corpus directory (MEDICORE_RECORD_DIR) or one segment")
+    parser.add_argument("--service-dir", default=SERVICE_DIR, help="service checkout under test")
+    parser.add_argument("--model", default=None, help="model artifact under test (default: the checkout's served model)")
+    parser.add_argument("--report-analyzer", choices=REPORT_ANALYZERS, default="service",
+                        help="service: report_pipeline (what /analyze_report runs); rules: MedicalReportAnalyzer")
+    parser.add_argument("--baseline-service-dir", default=None, help="replay this checkout as the baseline")
+    parser.add_argument("--baseline-model", default=None, help="replay this model artifact as the baseline")
+    parser.add_argument("--baseline-report-analyzer", choices=REPORT_ANALYZERS, default=None)
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many records")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument("--examples", type=int, default=10, help="changed records to include in the report")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    records = [r for r in read_corpus(args.corpus) if r.get("kind") in args.kinds]
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        sys.exit(f"No records in {args.corpus}")
+    print(f"Replaying {len(records)} records ({', '.join(f'{k}: {n}' for k, n in Counter(r['kind'] for r in records).items())})")
+
+    t0 = time.perf_counter()
+    candidate = replay(records, os.path.abspath(args.service_dir), args.model, args.report_analyzer, args.workers)
+    baseline_label = "recorded"
+    if args.baseline_service_dir or args.baseline_model or args.baseline_report_analyzer:
+        baseline_label = "baseline"
+        baseline = replay(records, os.path.abspath(args.baseline_service_dir or args.service_dir),
+                          args.baseline_model, args.baseline_report_analyzer or args.report_analyzer, args.workers)
+    else:
+        baseline = ([r["output"] for r in records], [r.get("ms", 0) / 1000 for r in records],
+                    [None] * len(records))
+    wall = time.perf_counter() - t0
+
+    summary, diffs, error_samples = compare(records, baseline, candidate, args.examples)
+    print(f"Replayed in {wall:.1f}s with {args.workers} workers per version; baseline: {baseline_label}")
+    print(f"{'kind':<8}{'records':>9}{'errors':>8}{'changed':>9}{'top1':>8}{'rank_r':>8}"
+          f"{'base_p50':>10}{'cand_p50':>10}{'base_p99':>10}{'cand_p99':>10}")
+    fmt = lambda v: "-" if v is None else format(v, ".3f")
+    for kind, s in summary.items():
+        lat = s["latency"]
+        print(f"{kind:<8}{s['records']:>9}{s['errors']:>8}{s['changed']:>9}{fmt(s['top1_agreement']):>8}"
+              f"{fmt(s['mean_rank_correlation']):>8}{fmt(lat['baseline'].get('p50_ms')):>10}"
+              f"{fmt(lat['candidate'].get('p50_ms')):>10}{fmt(lat['baseline'].get('p99_ms')):>10}"
+              f"{fmt(lat['candidate'].get('p99_ms')):>10}")
+        if s["changed_fields"]:
+            print(f"{'':<8}changed: " + ", ".join(f"{f} {n}" for f, n in sorted(s["changed_fields"].items())))
+    for e in error_samples:
+        print(f"error: {e}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "baseline": baseline_label, "summary": summary,
+                       "examples": diffs, "errors": error_samples}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
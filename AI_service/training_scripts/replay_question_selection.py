@@ -0,0 +1,129 @@
+"""
+Offline replay of the follow-up question loop on a labelled dataset.
+
+Each row plays a patient whose "true" symptoms are the model features present
+in its text. The patient volunteers the first --initial of them, then the
+engine asks one question at a time (answered truthfully) until the top
+candidate reaches --threshold or --max-questions is hit, mirroring the
+backend's symptomChecker loop (AIConfig defaults: 0.8 and 10).
+
+    python training_scripts/replay_question_selection.py --dataset path/to/Symptom2Disease.csv
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import argparse
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(__file__)
+SERVICE_DIR = os.path.abspath(os.path.join(BASE_DIR, '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+DATASET_PATH = os.path.join(SERVICE_DIR, 'datasets/Symptomdisease-NLP/Symptom2Disease.csv')
+STRATEGIES = ("coefficient", "information_gain")
+
+def true_symptoms(engine, text):
+    """Model features present in the text, in order of first mention."""
+    X = engine.vect.transform([text])
+    present = [engine.symptom_cols[j] for j in X.indices]
+    low = text.lower()
+
+    def position(f):
+        pos = low.find(f.replace('_', ' '))
+        return (pos if pos >= 0 else len(low), f)
+    return sorted(present, key=position)
+
+def replay_case(engine, strategy, label, truth, initial, threshold, max_questions):
+    known = list(truth[:initial])
+    asked = []
+    truth_set = set(truth)
+    seconds = 0.0
+    while True:
+        results = engine.predict(known, top_k=1)
+        top = results[0] if results else {"disease": None, "confidence": 0.0}
+        if top["confidence"] >= threshold or len(asked) >= max_questions:
+            break
+        t0 = time.perf_counter()
+        questions = engine.next_questions(known, asked=asked, n=1, strategy=strategy)
+        seconds += time.perf_counter() - t0
+        if not questions:
+            break
+        q = questions[0]
+        asked.append(q)
+        if q in truth_set:
+            known.append(q)
+    return {
+        "questions": len(asked),
+        "confident": top["confidence"] >= threshold,
+        "correct": top["disease"] == label,
+        "positive_answers": len(known) - min(initial, len(truth)),
+        "select_ms": seconds * 1000 / max(len(asked), 1),
+    }
+
+def summarize(cases):
+    arr = lambda k: np.array([c[k] for c in cases], dtype=float)
+    questions, confident = arr("questions"), arr("confident").astype(bool)
+    return {
+        "cases": len(cases),
+        "mean_questions": float(questions.mean()),
+        "p90_questions": float(np.percentile(questions, 90)),
+        "reached_threshold": float(confident.mean()),
+        "mean_questions_when_confident": float(questions[confident].mean()) if confident.any() else None,
+        "top1_accuracy_at_stop": float(arr("correct").mean()),
+        "positive_answer_rate": float(arr("positive_answers").sum() / max(questions.sum(), 1)),
+        "mean_select_ms": float(arr("select_ms").mean()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay follow-up question selection offline")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="CSV with 'label' and 'text' columns")
+    parser.add_argument("--model", default=None, help="model artifact (default: the served model)")
+    parser.add_argument("--threshold", type=float, default=0.8, help="AIConfig confidenceThreshold")
+    parser.add_argument("--max-questions", type=int, default=10, help="AIConfig maxQuestions")
+    parser.add_argument("--initial", type=int, default=1, help="symptoms the patient volunteers up front")
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=STRATEGIES)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    from main import InferenceEngine
+    engine = InferenceEngine(model_path=args.model)
+    if engine.vect is None or not hasattr(engine.clf, 'coef_'):
+        sys.exit("Replay needs a linear model with a fitted vectorizer")
+
+    df = pd.read_csv(args.dataset)
+    rows = list(zip(df['label'], df['text']))
+    if args.limit:
+        random.Random(args.seed).shuffle(rows)
+        rows = rows[:args.limit]
+
+    cases = [(label, true_symptoms(engine, text)) for label, text in rows]
+    cases = [(label, truth) for label, truth in cases if truth]
+    print(f"Replaying {len(cases)} of {len(rows)} rows (rows with no model features skipped)")
+
+    summary = {}
+    for strategy in args.strategies:
+        results = [replay_case(engine, strategy, label, truth, args.initial, args.threshold, args.max_questions)
+                   for label, truth in cases]
+        summary[strategy] = summarize(results)
+
+    cols = {"mean_questions": "mean_q", "p90_questions": "p90_q", "reached_threshold": "confident",
+            "mean_questions_when_confident": "q_if_conf", "top1_accuracy_at_stop": "top1",
+            "positive_answer_rate": "yes_rate", "mean_select_ms": "select_ms"}
+    print(f"{'strategy':<18}" + "".join(f"{h:>11}" for h in cols.values()))
+    for strategy, s in summary.items():
+        cells = "".join(f"{'-' if s[c] is None else format(s[c], '.3f'):>11}" for c in cols)
+        print(f"{strategy:<18}{cells}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "summary": summary}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
-
 import pandas as pd
 import pickle
 import os
+import argparse
+from datetime import datetime, timezone
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.naive_bayes import MultinomialNB
@@ -9,21 +10,34 @@ from sklearn.metrics import classification_report, accuracy_score
 
 # Configuration
 DATASET_PATH = os.path.join(os.path.dirname(__file__), '../datasets/MedicalTranscriptions/mtsamples.csv')
-MODEL_SAVE_PATH = os.path.join(os.path.dirname(__file__), '../specialty_classifier.pkl')
-VECTORIZER_SAVE_PATH = os.path.join(os.path.dirname(__file__), '../specialty_vectorizer.pkl')
+# Loaded by the AI service (MEDICORE_SPECIALTY_MODEL) as the specialty head of its text pipeline
+MODEL_SAVE_PATH = os.path.join(os.path.dirname(__file__), '../knowledge/specialty_model.pkl')
+
+# mtsamples categories that are document types, not specialties a patient can book
+NON_SPECIALTIES = {
+    'Consult - History and Phy.', 'SOAP / Chart / Progress Notes', 'Discharge Summary', 'Letters',
+    'Office Notes', 'IME-QME-Work Comp etc.', 'Emergency Room Reports', 'Radiology', 'Autopsy',
+    'Lab Medicine - Pathology', 'Speech - Language', 'Diets and Nutritions', 'Hospice - Palliative Care',
+}
+MIN_SAMPLES = 20  # smaller specialties are dropped rather than recommended off a handful of notes
 
-def train_model():
-    print(f"Loading dataset from {DATASET_PATH}...")
+def train_model(dataset_path=DATASET_PATH, output_path=MODEL_SAVE_PATH):
+    print(f"Loading dataset from {dataset_path}...")
     try:
-        df = pd.read_csv(DATASET_PATH)
+        df = pd.read_csv(dataset_path)
     except FileNotFoundError:
-        print(f"Error: File not found at {DATASET_PATH}")
+        print(f"Error: File not found at {dataset_path}")
         return
 
     # Data Cleaning
     print(f"Initial shape: {df.shape}")
     df = df.dropna(subset=['transcription', 'medical_specialty'])
     print(f"Shape after dropping NaNs: {df.shape}")
+    df['medical_specialty'] = df['medical_specialty'].str.strip()
+    df = df[~df['medical_specialty'].isin(NON_SPECIALTIES)]
+    counts = df['medical_specialty'].value_counts()
+    df = df[df['medical_specialty'].isin(counts[counts >= MIN_SAMPLES].index)]
+    print(f"Shape after keeping bookable specialties with >= {MIN_SAMPLES} samples: {df.shape}")
 
     # Inspect class distribution
     print("Top 5 Specialties:")
@@ -34,7 +48,8 @@ def train_model():
 
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    # Vectorization
+    # Vectorization. Default tokenization (lowercase, token_pattern), so the service scores it on
+    # the same token stream as the triage model (modules/text_pipeline.py)
     print("Vectorizing text...")
     vectorizer = CountVectorizer(stop_words='english', max_features=10000)
     X_train_vec = vectorizer.fit_transform(X_train)
@@ -47,20 +62,33 @@ def train_model():
 
     # Evaluation
     predictions = model.predict(X_test_vec)
+    accuracy = accuracy_score(y_test, predictions)
     print("Training complete.")
-    print(f"Accuracy: {accuracy_score(y_test, predictions)}")
+    print(f"Accuracy: {accuracy}")
     # print(classification_report(y_test, predictions)) # Can be very long if many classes
 
-    # Save
-    print(f"Saving model to {MODEL_SAVE_PATH}...")
-    with open(MODEL_SAVE_PATH, 'wb') as f:
-        pickle.dump(model, f)
-    
-    print(f"Saving vectorizer to {VECTORIZER_SAVE_PATH}...")
-    with open(VECTORIZER_SAVE_PATH, 'wb') as f:
-        pickle.dump(vectorizer, f)
+    # Same dict layout as the symptom model
+    model_data = {
+        'model': model,
+        'vectorizer': vectorizer,
+        'metadata': {
+            'trained_at': datetime.now(timezone.utc).isoformat(),
+            'dataset': os.path.basename(dataset_path),
+            'samples': int(len(df)),
+            'classes': [str(c) for c in model.classes_],
+            'test_accuracy': float(accuracy),
+        }
+    }
+
+    print(f"Saving model to {output_path}...")
+    with open(output_path, 'wb') as f:
+        pickle.dump(model_data, f)
 
     print("Done.")
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the MediCore specialty routing model")
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--output', default=MODEL_SAVE_PATH)
+    args = parser.parse_args()
+    train_model(args.dataset, args.output)
@@ -1,12 +1,18 @@
 
 import pandas as pd
+import numpy as np
 import pickle
 import os
 import json
-from sklearn.model_selection import train_test_split
+import time
+import argparse
+import itertools
+from datetime import datetime, timezone
+from joblib import Parallel, delayed
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.metrics import classification_report, accuracy_score, top_k_accuracy_score
 
 # Configuration
 BASE_DIR = os.path.dirname(__file__)
@@ -14,6 +20,19 @@ DATASET_PATH = os.path.join(BASE_DIR, '../datasets/Symptomdisease-NLP/Symptom2Di
 MODEL_SAVE_PATH = os.path.join(BASE_DIR, '../models/medicore_model_v4.pkl') # Aligning with main.py
 SYMPTOM_LIST_PATH = os.path.join(BASE_DIR, '../knowledge/symptom_list.json')
 
+# Search mode configuration (see search_model)
+LATENCY_BUDGET_MS = 5.0  # p95 single-request predict latency the chosen model must meet
+# When no candidate meets the budget, the most accurate one within budget * (1 + tolerance)
+# is taken (with a warning); past that the search fails rather than save a slow model
+LATENCY_TOLERANCE = 0.25
+SEARCH_GRID = {
+    'C': [0.1, 1.0, 10.0],
+    'solver': ['lbfgs', 'newton-cg', 'saga'],
+    # 'controlled': symptom_list.json as-is, 'readable': underscores replaced by spaces
+    # so multi-word symptoms match as n-grams, 'full': vocabulary learned from the data
+    'vocabulary': ['controlled', 'readable', 'full'],
+}
+
 def load_data(path):
     print(f"Loading dataset from {path}...")
     try:
@@ -27,8 +46,8 @@ def load_data(path):
         print(f"Error: File not found at {path}")
         return None
 
-def train_model():
-    df = load_data(DATASET_PATH)
+def train_model(dataset_path=DATASET_PATH, output_path=MODEL_SAVE_PATH):
+    df = load_data(dataset_path)
     if df is None:
         return
 
@@ -53,8 +72,9 @@ def train_model():
     print("Vectorizing text with controlled vocabulary...")
     # Using ngram_range=(1,3) to capture "stiff neck", "high fever", etc.
     # vocabulary argument forces the vectorizer to ONLY consider these terms.
+    # No stop word removal with a fixed vocabulary: terms like "loss of appetite" could never match
     vectorizer = TfidfVectorizer(
-        stop_words='english', 
+        stop_words=None if vocab else 'english',
         vocabulary=vocab, 
         ngram_range=(1, 3),
         binary=True # Presence/Absence is more important than TF-IDF frequency for this
@@ -79,11 +99,161 @@ def train_model():
         'label_encoder': None # Not needed as Sklearn handles strings directly
     }
 
-    print(f"Saving model to {MODEL_SAVE_PATH}...")
-    with open(MODEL_SAVE_PATH, 'wb') as f:
+    print(f"Saving model to {output_path}...")
+    with open(output_path, 'wb') as f:
         pickle.dump(model_data, f)
     
     print("Done.")
 
+def load_vocab(path=SYMPTOM_LIST_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def build_vectorizer(vocabulary, vocab):
+    if vocabulary == 'full' or vocab is None:
+        return TfidfVectorizer(stop_words='english', ngram_range=(1, 3), min_df=2, binary=True)
+    terms = vocab
+    if vocabulary == 'readable':
+        # Keep first occurrence; "cold_hands_and_feets" and friends must stay unique
+        terms = list(dict.fromkeys(t.replace('_', ' ') for t in vocab))
+    # No stop word removal: a term containing one ("pain in chest") would never match its column
+    return TfidfVectorizer(vocabulary=terms, ngram_range=(1, 3), binary=True)
+
+def build_classifier(C, solver):
+    return LogisticRegression(C=C, solver=solver, max_iter=1000, class_weight='balanced')
+
+def evaluate_candidate(params, X_train, y_train, vocab, cv):
+    """Cross-validate one grid point and refit it on the full training split."""
+    try:
+        accs, top3s = [], []
+        folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=42)
+        for fit_idx, val_idx in folds.split(X_train, y_train):
+            vect = build_vectorizer(params['vocabulary'], vocab)
+            clf = build_classifier(params['C'], params['solver'])
+            clf.fit(vect.fit_transform(X_train.iloc[fit_idx]), y_train.iloc[fit_idx])
+            probs = clf.predict_proba(vect.transform(X_train.iloc[val_idx]))
+            y_val = y_train.iloc[val_idx]
+            accs.append(accuracy_score(y_val, clf.classes_[probs.argmax(axis=1)]))
+            top3s.append(top_k_accuracy_score(y_val, probs, k=min(3, len(clf.classes_)), labels=clf.classes_))
+
+        vect = build_vectorizer(params['vocabulary'], vocab)
+        clf = build_classifier(params['C'], params['solver'])
+        clf.fit(vect.fit_transform(X_train), y_train)
+        return {'params': params, 'cv_accuracy': float(np.mean(accs)), 'cv_top3_accuracy': float(np.mean(top3s)),
+                'model': clf, 'vectorizer': vect}
+    except Exception as e:
+        return {'params': params, 'error': str(e)}
+
+def measure_latency(clf, vect, texts, repeat=200):
+    """Single-request latency (one text per call), as the service sees it."""
+    timings = []
+    for text in itertools.islice(itertools.cycle(texts), repeat):
+        t0 = time.perf_counter()
+        clf.predict_proba(vect.transform([text]))
+        timings.append((time.perf_counter() - t0) * 1000)
+    return {'p50': float(np.percentile(timings, 50)), 'p95': float(np.percentile(timings, 95))}
+
+def select_candidate(candidates, latency_budget_ms, tolerance=LATENCY_TOLERANCE):
+    """Most accurate candidate meeting the p95 budget, else within budget * (1 + tolerance).
+
+    Returns (candidate, within budget); SystemExit when none is even within the tolerance.
+    """
+    accuracy = lambda c: (c[0]['cv_accuracy'], c[0]['cv_top3_accuracy'], -c[0]['latency_ms']['p95'])
+    within_budget = [c for c in candidates if c[0]['latency_ms']['p95'] <= latency_budget_ms]
+    if within_budget:
+        return max(within_budget, key=accuracy), True
+    limit = latency_budget_ms * (1 + tolerance)
+    near = [c for c in candidates if c[0]['latency_ms']['p95'] <= limit]
+    fastest = min(c[0]['latency_ms']['p95'] for c in candidates)
+    if not near:
+        raise SystemExit(f"Error: no candidate meets the {latency_budget_ms}ms p95 budget or {limit:.2f}ms with "
+                         f"{tolerance:.0%} tolerance (fastest: {fastest:.3f}ms); nothing saved. "
+                         "Raise --latency-budget-ms or --latency-tolerance.")
+    print(f"Warning: no candidate meets the {latency_budget_ms}ms budget; picking the most accurate "
+          f"within {limit:.2f}ms ({tolerance:.0%} tolerance).")
+    return max(near, key=accuracy), False
+
+def search_model(dataset_path=DATASET_PATH, output_path=MODEL_SAVE_PATH,
+                 latency_budget_ms=LATENCY_BUDGET_MS, n_jobs=-1, cv=5, latency_tolerance=LATENCY_TOLERANCE):
+    df = load_data(dataset_path)
+    if df is None:
+        return
+
+    vocab = load_vocab()
+    X = df['text']
+    y = df['label']
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+    grid = [dict(zip(SEARCH_GRID, values)) for values in itertools.product(*SEARCH_GRID.values())]
+    print(f"Searching {len(grid)} candidates with {cv}-fold CV (n_jobs={n_jobs})...")
+    t0 = time.time()
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_candidate)(params, X_train, y_train, vocab, cv) for params in grid
+    )
+    print(f"Search finished in {time.time() - t0:.1f}s")
+
+    # Latency and size are measured sequentially in this process, so workers
+    # competing for cores during the search don't skew the numbers.
+    sample_texts = list(X_test[:50])
+    candidates = []
+    for r in results:
+        if 'error' in r:
+            print(f"  {r['params']} failed: {r['error']}")
+            continue
+        clf, vect = r.pop('model'), r.pop('vectorizer')
+        probs = clf.predict_proba(vect.transform(X_test))
+        r['test_accuracy'] = float(accuracy_score(y_test, clf.classes_[probs.argmax(axis=1)]))
+        r['test_top3_accuracy'] = float(top_k_accuracy_score(y_test, probs, k=min(3, len(clf.classes_)), labels=clf.classes_))
+        r['latency_ms'] = measure_latency(clf, vect, sample_texts)
+        r['artifact_bytes'] = len(pickle.dumps({'model': clf, 'vectorizer': vect, 'label_encoder': None}))
+        print(f"  {r['params']} acc={r['cv_accuracy']:.4f} top3={r['cv_top3_accuracy']:.4f} "
+              f"p95={r['latency_ms']['p95']:.3f}ms size={r['artifact_bytes']}B")
+        candidates.append((r, clf, vect))
+
+    if not candidates:
+        print("Error: every candidate failed.")
+        return
+
+    best, within_budget = select_candidate(candidates, latency_budget_ms, latency_tolerance)
+    summary, clf, vect = best
+    print(f"Selected {summary['params']} (cv accuracy {summary['cv_accuracy']:.4f})")
+
+    model_data = {
+        'model': clf,
+        'vectorizer': vect,
+        'label_encoder': None,
+        'metadata': {
+            'trained_at': datetime.now(timezone.utc).isoformat(),
+            'dataset': os.path.basename(dataset_path),
+            'latency_budget_ms': latency_budget_ms,
+            'latency_tolerance': latency_tolerance,
+            'within_budget': within_budget,
+            'selected': summary,
+            'search': [c[0] for c in candidates],
+        }
+    }
+
+    print(f"Saving model to {output_path}...")
+    with open(output_path, 'wb') as f:
+        pickle.dump(model_data, f)
+
+    print("Done.")
+
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the MediCore symptom model")
+    parser.add_argument('--search', action='store_true', help="run the parallel hyperparameter search")
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--output', default=MODEL_SAVE_PATH)
+    parser.add_argument('--latency-budget-ms', type=float, default=LATENCY_BUDGET_MS)
+    parser.add_argument('--latency-tolerance', type=float, default=LATENCY_TOLERANCE,
+                        help="fraction over the budget accepted when no candidate meets it")
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--cv', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.search:
+        search_model(args.dataset, args.output, args.latency_budget_ms, args.n_jobs, args.cv, args.latency_tolerance)
+    else:
+        train_model(args.dataset, args.output)
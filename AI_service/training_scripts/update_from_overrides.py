@@ -0,0 +1,262 @@
+"""
+Apply doctor corrections to the serving symptom model without a full retrain.
+
+Corrections are (symptoms, diagnosis) pairs: the backend's DoctorOverride
+records (the session's confirmed symptoms and the doctor's diagnosis) and
+Feedback records, exported by GET /api/doctor/training-pairs. --overrides takes
+that response, a JSON list of pairs or one pair per line.
+
+The corrections are applied in batches of --batch-size to the classifier of the
+current model; the vectorizer (controlled vocabulary) is kept as is.
+  - LogisticRegression: warm-started refit starting from the current
+    coefficients, for at most --max-iter iterations, on the batch (weighted
+    --weight) plus a replay set: --replay rows per class from the dataset's
+    training split and the corrections of earlier batches, so the model moves
+    towards the corrections without forgetting the rest. Diagnoses the model has
+    never seen get a class initialised at zero.
+  - classifiers with partial_fit (e.g. SGDClassifier): partial_fit on the same
+    data; corrections naming unknown classes are skipped.
+Corrections are fed to the model as the service does: the symptoms joined by
+spaces.
+
+The update is checked on the dataset's holdout split (the split of
+train_symptom_model.py) and on --correction-holdout of the corrections, kept out
+of the update. It is published only when holdout accuracy drops by at most
+--max-drop and accuracy on the held-out corrections does not fall: a versioned
+artifact in --publish-dir plus current.json naming it. The service serves the
+model current.json names (MEDICORE_MODEL_VERSIONS_DIR) from start-up, and
+POST /admin/model/reload swaps it in without a restart.
+
+Update time per batch is reported next to a full retrain on the same data.
+
+    python training_scripts/update_from_overrides.py --overrides pairs.json --dataset path/to/Symptom2Disease.csv
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import pickle
+import random
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+
+BASE_DIR = os.path.dirname(__file__)
+SERVICE_DIR = os.path.abspath(os.path.join(BASE_DIR, '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+DATASET_PATH = os.path.join(SERVICE_DIR, 'datasets/Symptomdisease-NLP/Symptom2Disease.csv')
+MODEL_PATH = os.path.join(SERVICE_DIR, 'knowledge/medicore_model_v4.pkl')  # what main.py serves
+PUBLISH_DIR = os.path.join(SERVICE_DIR, 'data/model_versions')
+
+def load_corrections(path):
+    """[(symptoms, diagnosis)] from an export response, a JSON list or JSON lines."""
+    with open(path, encoding="utf-8") as f:
+        raw = f.read()
+    try:
+        data = json.loads(raw)
+        records = data.get("pairs", []) if isinstance(data, dict) else data
+    except json.JSONDecodeError:
+        records = [json.loads(line) for line in raw.splitlines() if line.strip()]
+    pairs = []
+    for r in records:
+        symptoms = r.get("symptoms") or r.get("symptomsConfirmed") or []
+        diagnosis = r.get("diagnosis") or r.get("doctorDiagnosis") or r.get("correctDiagnosis")
+        symptoms = [str(s).strip().lower().replace(" ", "_") for s in symptoms if str(s).strip()]
+        if symptoms and diagnosis:
+            pairs.append((symptoms, str(diagnosis)))
+    return pairs
+
+def load_artifact(path):
+    import joblib
+    data = joblib.load(path)
+    if isinstance(data, dict):
+        return data
+    if hasattr(data, "steps"):
+        return {"model": data.steps[-1][1], "vectorizer": data[:-1] if len(data.steps) > 2 else data.steps[0][1],
+                "label_encoder": None}
+    sys.exit(f"{path}: expected a model dict or pipeline, got {type(data).__name__}")
+
+def replay_sample(X, y, per_class, rng):
+    """Up to per_class rows of every class, so a refit keeps all of them."""
+    idx = []
+    for label in sorted(set(y)):
+        rows = [i for i, v in enumerate(y) if v == label]
+        idx += rng.sample(rows, min(per_class, len(rows)))
+    return [X[i] for i in idx], [y[i] for i in idx]
+
+def expand_classes(clf, classes):
+    """Warm-start coefficients for `classes` (sorted): known rows copied, new classes at zero."""
+    old = list(clf.classes_)
+    if old == list(classes):
+        return
+    if clf.coef_.shape[0] != len(old):
+        raise ValueError("binary models can't gain classes by warm start; retrain with train_symptom_model.py")
+    coef = np.zeros((len(classes), clf.coef_.shape[1]))
+    intercept = np.zeros(len(classes))
+    for i, c in enumerate(classes):
+        if c in old:
+            coef[i] = clf.coef_[old.index(c)]
+            intercept[i] = clf.intercept_[old.index(c)]
+    clf.coef_, clf.intercept_ = coef, intercept
+
+def apply_batch(clf, vect, batch, replay_X, replay_y, weight, max_iter):
+    """Update clf in place with one batch; returns seconds spent."""
+    t0 = time.perf_counter()
+    X_text = replay_X + [" ".join(s) for s, _ in batch]
+    y = replay_y + [d for _, d in batch]
+    w = np.concatenate([np.ones(len(replay_y)), np.full(len(batch), weight)])
+    X = vect.transform(X_text)
+    if hasattr(clf, "partial_fit"):
+        known = set(clf.classes_)
+        keep = [i for i, label in enumerate(y) if label in known]
+        clf.partial_fit(X[keep], [y[i] for i in keep], sample_weight=w[keep])
+    else:
+        expand_classes(clf, sorted(set(y)))
+        clf.set_params(warm_start=True, max_iter=max_iter)
+        clf.fit(X, y, sample_weight=w)
+    return time.perf_counter() - t0
+
+def accuracy(clf, vect, texts, labels):
+    if not texts:
+        return None
+    probs = clf.predict_proba(vect.transform(texts))
+    order = np.argsort(-probs, axis=1)
+    top1 = clf.classes_[order[:, 0]]
+    top3 = clf.classes_[order[:, :3]]
+    labels = np.asarray(labels)
+    return {"top1": float(np.mean(top1 == labels)), "top3": float(np.mean((top3 == labels[:, None]).any(axis=1)))}
+
+def publish(artifact, directory, parent, report):
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    name = f"symptom_model-{stamp}.pkl"
+    with open(os.path.join(directory, name), "wb") as f:
+        pickle.dump(artifact, f)
+    current = {"version": name, "path": name, "parent": parent, "published_at": time.time(),
+               "holdout": report["holdout"]["after"], "corrections": report["corrections"]["applied"]}
+    tmp = os.path.join(directory, "current.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(current, f, indent=2)
+    os.replace(tmp, os.path.join(directory, "current.json"))
+    return name
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply doctor corrections to the symptom model incrementally")
+    parser.add_argument("--overrides", required=True, help="exported (symptoms, diagnosis) pairs")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="CSV with 'label' and 'text' columns")
+    parser.add_argument("--model", default=None,
+                        help="model to update (default: the published version in --publish-dir, else the served model)")
+    parser.add_argument("--publish-dir", default=PUBLISH_DIR)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--replay", type=int, default=20, help="training rows per class replayed with each batch")
+    parser.add_argument("--weight", type=float, default=3.0, help="sample weight of corrections")
+    parser.add_argument("--max-iter", type=int, default=50, help="solver iterations per warm-started batch")
+    parser.add_argument("--correction-holdout", type=float, default=0.2)
+    parser.add_argument("--max-drop", type=float, default=0.01, help="largest allowed drop in holdout top-1 accuracy")
+    parser.add_argument("--no-full-retrain", action="store_true", help="skip timing a full retrain")
+    parser.add_argument("--dry-run", action="store_true", help="report without publishing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    model_path = args.model
+    current = os.path.join(args.publish_dir, "current.json")
+    if model_path is None and os.path.exists(current):
+        with open(current) as f:
+            model_path = os.path.join(args.publish_dir, json.load(f)["path"])
+    model_path = model_path or MODEL_PATH
+    artifact = load_artifact(model_path)
+    clf, vect = artifact.get("model"), artifact.get("vectorizer")
+    if vect is None or not hasattr(clf, "predict_proba"):
+        sys.exit("Incremental updates need a model dict with a fitted vectorizer and a probabilistic classifier")
+    if not hasattr(clf, "partial_fit") and not hasattr(clf, "coef_"):
+        sys.exit(f"{type(clf).__name__} supports neither partial_fit nor warm-started coefficients")
+
+    rng = random.Random(args.seed)
+    pairs = load_corrections(args.overrides)
+    if not pairs:
+        sys.exit(f"No usable corrections in {args.overrides}")
+    rng.shuffle(pairs)
+    n_hold = int(len(pairs) * args.correction_holdout)
+    held, train = pairs[:n_hold], pairs[n_hold:]
+
+    df = pd.read_csv(args.dataset)
+    X_train, X_test, y_train, y_test = train_test_split(df['text'], df['label'], test_size=0.2, random_state=42)
+    X_train, y_train, X_test, y_test = list(X_train), list(y_train), list(X_test), list(y_test)
+    held_X, held_y = [" ".join(s) for s, _ in held], [d for _, d in held]
+
+    before = {"holdout": accuracy(clf, vect, X_test, y_test), "corrections": accuracy(clf, vect, held_X, held_y)}
+    print(f"Model {os.path.basename(model_path)}: {len(train)} corrections to apply, {len(held)} held out")
+
+    updated = copy.deepcopy(clf)
+    batches, applied = [], []
+    base_X, base_y = replay_sample(X_train, y_train, args.replay, rng)
+    for i in range(0, len(train), args.batch_size):
+        batch = train[i:i + args.batch_size]
+        seconds = apply_batch(updated, vect, batch, base_X + [" ".join(s) for s, _ in applied],
+                              base_y + [d for _, d in applied], args.weight, args.max_iter)
+        applied += batch
+        batches.append({"size": len(batch), "seconds": seconds})
+        print(f"  batch {len(batches)}: {len(batch)} corrections in {seconds * 1000:.1f} ms")
+    after = {"holdout": accuracy(updated, vect, X_test, y_test), "corrections": accuracy(updated, vect, held_X, held_y)}
+
+    full_seconds = None
+    if not args.no_full_retrain:
+        # what train_symptom_model.py does, on the training split plus every correction
+        full = clone(clf).set_params(warm_start=False) if not hasattr(clf, "partial_fit") else clone(clf)
+        t0 = time.perf_counter()
+        X_full = vect.transform(X_train + [" ".join(s) for s, _ in train])
+        full.fit(X_full, y_train + [d for _, d in train])
+        full_seconds = time.perf_counter() - t0
+
+    drop = before["holdout"]["top1"] - after["holdout"]["top1"]
+    corr_ok = before["corrections"] is None or after["corrections"]["top1"] >= before["corrections"]["top1"]
+    accepted = drop <= args.max_drop and corr_ok
+    mean_batch = float(np.mean([b["seconds"] for b in batches]))
+    report = {
+        "model": model_path,
+        "corrections": {"total": len(pairs), "applied": len(train), "held_out": len(held)},
+        "holdout": {"before": before["holdout"], "after": after["holdout"], "top1_drop": drop},
+        "held_out_corrections": {"before": before["corrections"], "after": after["corrections"]},
+        "batches": batches,
+        "mean_batch_seconds": mean_batch,
+        "full_retrain_seconds": full_seconds,
+        "accepted": accepted,
+    }
+    fmt = lambda a: "-" if a is None else f"{a['top1']:.4f} / {a['top3']:.4f}"
+    print(f"{'top-1 / top-3':<22}{'before':>18}{'after':>18}")
+    print(f"{'dataset holdout':<22}{fmt(before['holdout']):>18}{fmt(after['holdout']):>18}")
+    print(f"{'held-out corrections':<22}{fmt(before['corrections']):>18}{fmt(after['corrections']):>18}")
+    line = f"Update: {mean_batch * 1000:.1f} ms per batch, {sum(b['seconds'] for b in batches):.2f}s total"
+    if full_seconds is not None:
+        line += f"; full retrain {full_seconds:.2f}s ({full_seconds / max(mean_batch, 1e-9):.0f}x one batch)"
+    print(line)
+
+    if not accepted:
+        print(f"Not published: holdout top-1 drop {drop:.4f} (max {args.max_drop})"
+              + ("" if corr_ok else ", held-out corrections got worse"))
+    elif args.dry_run:
+        print("Dry run: not published")
+    else:
+        metadata = dict(artifact.get("metadata") or {})
+        metadata["incremental_update"] = {"parent": os.path.basename(model_path),
+                                          "updated_at": datetime.now(timezone.utc).isoformat(),
+                                          **{k: report[k] for k in ("corrections", "holdout", "mean_batch_seconds")}}
+        name = publish({**artifact, "model": updated, "metadata": metadata}, args.publish_dir,
+                       os.path.basename(model_path), report)
+        report["published"] = name
+        print(f"Published {name}; POST /admin/model/reload to serve it")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), **report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,11 @@ const FormData = require('form-data');
 const fs = require('fs');
 const path = require('path');
 
+// How long a report upload waits for the AI service. The service gets the same budget
+// (X-Request-Timeout-Ms) and answers with whatever OCR finished in time (partial: true);
+// axios allows a little longer so that partial answer can still arrive.
+const AI_REPORT_TIMEOUT_MS = parseInt(process.env.AI_REPORT_TIMEOUT_MS || '60000', 10);
+
 // @desc    Upload and Analyze Report
 // @route   POST /api/reports/upload
 // @access  Private
@@ -34,12 +39,19 @@ exports.uploadReport = async (req, res) => {
         // We need to send the file to the AI service
         const formData = new FormData();
         formData.append('file', fs.createReadStream(filePath));
+        // lab values are kept per patient for the trends view (re-uploads of a report replace it)
+        formData.append('patient_id', String(req.user.id));
+        formData.append('report_id', String(report._id));
+        formData.append('taken_at', String(report.createdAt.getTime() / 1000));
 
         // Fix for Axios headers with FormData
         const aiResponse = await axios.post(`${process.env.AI_SERVICE_URL}/analyze_report`, formData, {
             headers: {
-                ...formData.getHeaders()
-            }
+                ...formData.getHeaders(),
+                'X-User-Id': req.user.id, // per-user rate limiting in the AI service
+                'X-Request-Timeout-Ms': String(AI_REPORT_TIMEOUT_MS)
+            },
+            timeout: AI_REPORT_TIMEOUT_MS + 5000
         });
 
         // 3. Transform Data for Frontend
@@ -89,7 +101,8 @@ exports.uploadReport = async (req, res) => {
             normalValues: normalValues,
             recommendations: recommendations,
             extracted: extracted, // <--- New Data-Driven Contract
-            raw_text: aiData.raw_text
+            raw_text: aiData.raw_text,
+            partial: !!aiData.partial // OCR stopped at the time limit; findings cover part of the report
         };
 
         report.analysis = formattedAnalysis;
@@ -135,3 +148,28 @@ exports.getReports = async (req, res) => {
         res.status(500).json({ message: error.message });
     }
 };
+
+// @desc    Lab value trends across a patient's reports
+// @route   GET /api/reports/trends/:patientId
+// @access  Private (the patient, or a doctor)
+exports.getLabTrends = async (req, res) => {
+    try {
+        if (req.params.patientId !== req.user.id && req.user.role !== 'doctor') {
+            return res.status(401).json({ message: 'Not authorized' });
+        }
+        const aiResponse = await axios.get(
+            `${process.env.AI_SERVICE_URL}/labs/${encodeURIComponent(req.params.patientId)}/trends`, {
+                params: { tests: req.query.tests, since: req.query.since, until: req.query.until, points: req.query.points },
+                paramsSerializer: { indexes: null }, // tests=a&tests=b
+                headers: { 'X-User-Id': req.user.id },
+                timeout: 10000
+            });
+        const body = aiResponse.data;
+        if (!body.success) {
+            return res.status(502).json({ message: body.error || 'Lab trends unavailable' });
+        }
+        res.status(200).json(body.data);
+    } catch (error) {
+        res.status(500).json({ message: error.message });
+    }
+};
@@ -111,7 +111,9 @@ exports.submitSymptoms = async (req, res) => {
             session_id: sessionId
         };
 
-        const aiResponse = await axios.post(`${process.env.AI_SERVICE_URL}/predict/symptoms`, payload);
+        const aiResponse = await axios.post(`${process.env.AI_SERVICE_URL}/predict/symptoms`, payload, {
+            headers: { 'X-User-Id': req.user.id } // per-user rate limiting in the AI service
+        });
 
         if (!aiResponse.data.success) {
             throw new Error(aiResponse.data.error || "AI Service Failed");
@@ -135,6 +137,11 @@ exports.submitSymptoms = async (req, res) => {
         session.aiPredictions = preds;
         session.questionCount += 1;
 
+        // Specialty for booking, read from the complaint: keep the first turn's (later turns only send a symptom id)
+        if (aiData.recommended_specialty && !session.recommendedSpecialty?.specialty) {
+            session.recommendedSpecialty = aiData.recommended_specialty;
+        }
+
         // 3. Determine Next Step
         const topCandidate = preds[0];
         const isConfident = topCandidate && topCandidate.confidence >= config.symptomChecker.confidenceThreshold;
@@ -166,7 +173,8 @@ exports.submitSymptoms = async (req, res) => {
             responsePayload.final_results = {
                 triage_level: "Consultation Recommended",
                 diagnosis: preds,
-                advice: "Based on your symptoms, we recommend a consultation."
+                advice: "Based on your symptoms, we recommend a consultation.",
+                recommended_specialty: session.recommendedSpecialty?.specialty || null
             };
         } else {
             // CONTINUE - NEXT QUESTION
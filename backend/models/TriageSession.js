@@ -29,6 +29,12 @@ const TriageSessionSchema = new mongoose.Schema({
         }
     ],
 
+    // from the AI service's specialty model, for appointment booking
+    recommendedSpecialty: {
+        specialty: String,
+        confidence: Number
+    },
+
     severity: {
         type: String,
         enum: ["low", "moderate", "high", "critical"]
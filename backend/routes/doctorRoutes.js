@@ -1,6 +1,7 @@
 const express = require("express");
 const router = express.Router();
 const DoctorOverride = require("../models/DoctorOverride");
+const Feedback = require("../models/Feedback");
 const { protect, authorize } = require("../middleware/authMiddleware");
 
 // @desc    Submit Doctor Override
@@ -40,4 +41,32 @@ router.post("/override", protect, authorize('doctor'), async (req, res) => {
     }
 });
 
+// @desc    Export corrected (symptoms, diagnosis) pairs from overrides and feedback, for
+//          incremental model updates (AI_service/training_scripts/update_from_overrides.py)
+// @route   GET /api/doctor/training-pairs?since=<ISO date>
+// @access  Private (Admin only)
+router.get("/training-pairs", protect, authorize('admin'), async (req, res) => {
+    try {
+        const since = req.query.since ? new Date(req.query.since) : new Date(0);
+        const [overrides, feedback] = await Promise.all([
+            DoctorOverride.find({ createdAt: { $gt: since } }).populate("sessionId", "symptomsConfirmed").lean(),
+            Feedback.find({ createdAt: { $gt: since } }).lean()
+        ]);
+
+        const pairs = [
+            ...overrides
+                .filter(o => o.sessionId && (o.sessionId.symptomsConfirmed || []).length)
+                .map(o => ({ symptoms: o.sessionId.symptomsConfirmed, diagnosis: o.doctorDiagnosis, source: "override", createdAt: o.createdAt })),
+            ...feedback
+                .filter(f => (f.symptoms || []).length)
+                .map(f => ({ symptoms: f.symptoms, diagnosis: f.correctDiagnosis, source: "feedback", createdAt: f.createdAt }))
+        ].sort((a, b) => a.createdAt - b.createdAt);
+
+        res.json({ success: true, count: pairs.length, pairs });
+    } catch (error) {
+        console.error("Training Pairs Export Error:", error);
+        res.status(500).json({ message: "Server Error" });
+    }
+});
+
 module.exports = router;
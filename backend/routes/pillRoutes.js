@@ -4,14 +4,19 @@ const axios = require('axios');
 const multer = require('multer');
 const FormData = require('form-data');
 const fs = require('fs');
+const { protect } = require('../middleware/authMiddleware');
 
 // Configure Multer for temp storage
 const upload = multer({ dest: 'uploads/' });
 
+// How long pill identification waits for the AI service, which gets the same budget
+// (X-Request-Timeout-Ms) and stops the model once it has passed
+const AI_PILL_TIMEOUT_MS = parseInt(process.env.AI_PILL_TIMEOUT_MS || '20000', 10);
+
 // @desc    Identify Pill
 // @route   POST /api/pill-identifier/identify
 // @access  Private
-router.post('/identify', upload.single('image'), async (req, res) => {
+router.post('/identify', protect, upload.single('image'), async (req, res) => {
     try {
         if (!req.file) {
             return res.status(400).json({ message: 'No image uploaded' });
@@ -22,8 +27,11 @@ router.post('/identify', upload.single('image'), async (req, res) => {
 
         const aiResponse = await axios.post(`${process.env.AI_SERVICE_URL}/identify_pill`, formData, {
             headers: {
-                ...formData.getHeaders()
-            }
+                ...formData.getHeaders(),
+                'X-User-Id': req.user.id, // per-user rate limiting in the AI service
+                'X-Request-Timeout-Ms': String(AI_PILL_TIMEOUT_MS)
+            },
+            timeout: AI_PILL_TIMEOUT_MS + 5000
         });
 
         // Cleanup
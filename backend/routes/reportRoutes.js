@@ -1,7 +1,7 @@
 const express = require('express');
 const router = express.Router();
 const multer = require('multer');
-const { uploadReport, getReport, getReports } = require('../controllers/reportController');
+const { uploadReport, getReport, getReports, getLabTrends } = require('../controllers/reportController');
 const { protect } = require('../middleware/authMiddleware');
 
 // Multer Config
@@ -17,6 +17,7 @@ const storage = multer.diskStorage({
 const upload = multer({ storage });
 
 router.post('/upload', protect, upload.single('report'), uploadReport);
+router.get('/trends/:patientId', protect, getLabTrends);
 router.get('/:id', protect, getReport);
 router.get('/', protect, getReports);
 